@@ -6,10 +6,22 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date, datetime
-from src.models import Base, get_engine, get_session, Snapshot, Transfer, PriceHistory
+from src.models import get_engine, get_session, Snapshot, Transfer, PriceHistory
 from sqlalchemy import and_
 import os
 from src import price_service
+from src import valuation
+from src import upsert
+from src import migrations
+from src import price_cache
+from src import cash_flows
+from src import price_refresher
+from src import symbol_registry
+from src import summary
+from src import returns
+from src import benchmark
+from src.instrumentation import monitor as sql_monitor
+from src.data_cache import cache as data_cache
 from src import lang as L
 from src import styles as S
 
@@ -21,19 +33,72 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def get_secret(key, default=None):
+    """st.secrets lookup that falls back to `default` when no secrets.toml exists"""
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError:
+        return default
+
 # Database Configuration - Cached for Speed
 @st.cache_resource
 def init_connection():
     # Priority: Streamlit Secrets -> Environment Variable -> Local SQLite
-    db_url = st.secrets.get("DB_URL") or os.getenv("DB_URL") or 'local_ledger.db'
+    db_url = get_secret("DB_URL") or os.getenv("DB_URL") or 'local_ledger.db'
     _engine = get_engine(db_url)
     
-    # Only create tables once per server session
-    Base.metadata.create_all(_engine)
+    # Only create tables and run schema migrations once per server session
+    migrations.upgrade(_engine)
+    
+    session = get_session(_engine)
+    try:
+        valuation.ensure_daily_valuation(session)
+    finally:
+        session.close()
     return _engine
 
 engine = init_connection()
 
+
+@st.cache_resource
+def get_price_service():
+    """Shared PriceService: exchange clients are built once per process, quotes go through the quote cache,
+    symbols are routed through the persisted symbol registry"""
+    return price_service.PriceService(registry=symbol_registry.SymbolRegistry(engine))
+
+@st.cache_resource
+def get_price_matrix():
+    """Process-wide date x symbol price matrix, invalidated per symbol on price writes"""
+    return price_cache.PriceMatrix(engine)
+
+@st.cache_resource
+def get_cash_flow_index():
+    """Process-wide transfer prefix sums, updated in place by save_transfer"""
+    return cash_flows.CashFlowIndex(engine)
+
+@st.cache_resource
+def get_price_refresher():
+    """Background price refresh, enabled by PRICE_REFRESH_MINUTES (secret) / MYLEDGER_PRICE_REFRESH_MINUTES (env)"""
+    minutes = float(get_secret("PRICE_REFRESH_MINUTES") or os.getenv("MYLEDGER_PRICE_REFRESH_MINUTES") or 0)
+    if minutes <= 0:
+        return None
+    
+    matrix = get_price_matrix()
+    
+    def on_update(symbols):
+        # update_price_history_db already refreshed today's daily_valuation rows
+        matrix.invalidate(symbols)
+        data_cache.invalidate('price_history', since=date.today(), keys=symbols)
+        data_cache.invalidate('daily_valuation', since=date.today())
+    
+    refresher = price_refresher.PriceRefresher(
+        engine, interval_minutes=minutes, service=get_price_service(), on_update=on_update
+    )
+    refresher.start()
+    return refresher
+
+get_price_refresher()
+
 # ============ Currency Helper ============
 @st.cache_data(ttl=3600)  # Cache FX rates for 1 hour
 def get_fx_rate(to_currency):
@@ -43,8 +108,7 @@ def get_fx_rate(to_currency):
     symbols = {"CNY": "¥", "EUR": "€", "JPY": "¥", "GBP": "£", "HKD": "HK$", "AUD": "A$"}
     symbol = symbols.get(to_currency, to_currency + " ")
     
-    service = price_service.PriceService()
-    rate = service.fetch_fx_rate(to_currency)
+    rate = get_price_service().fetch_fx_rate(to_currency)
     return rate, symbol
 
 def format_val(val, rate, symbol, privacy_on=False):
@@ -54,19 +118,34 @@ def format_val(val, rate, symbol, privacy_on=False):
 
 # ============ Cache Management ============
 
-def clear_data_cache():
-    """Clear all cached calculations after data changes"""
-    # Clear all st.cache_data functions
-    st.cache_data.clear()
+# Writes call data_cache.invalidate(table, since, symbols) so that only cached
+# results depending on the touched dates / symbols are recomputed.
+
+def refresh_valuations(since, symbols=None):
+    """Recompute daily_valuation rows from `since` onward after a write"""
+    matrix = get_price_matrix()
+    if symbols is not None:
+        matrix.invalidate(symbols)  # Only price writes pass symbols
+    
+    session = get_session(engine)
+    try:
+        valuation.refresh_daily_valuation(session, since=since, symbols=symbols, price_matrix=matrix)
+        session.commit()
+        data_cache.invalidate('daily_valuation', since=since)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
 # ============ Database Functions ============
 
 def save_snapshots_batch(snapshot_date, account_name, snapshot_data):
     """Save batch snapshots"""
     session = get_session(engine)
-    saved_count = 0
     
     try:
+        rows = []
         for _, row in snapshot_data.iterrows():
             symbol = str(row['Symbol']).strip().upper()
             quantity = float(row['Quantity'])
@@ -74,30 +153,23 @@ def save_snapshots_batch(snapshot_date, account_name, snapshot_data):
             if not symbol or symbol == '' or quantity <= 0:
                 continue
             
-            existing = session.query(Snapshot).filter(
-                and_(
-                    Snapshot.date == snapshot_date,
-                    Snapshot.account_name == account_name,
-                    Snapshot.symbol == symbol
-                )
-            ).first()
-            
-            if existing:
-                existing.quantity = quantity
-                existing.created_at = datetime.utcnow()
-            else:
-                new_snapshot = Snapshot(
-                    date=snapshot_date,
-                    account_name=account_name,
-                    symbol=symbol,
-                    quantity=quantity
-                )
-                session.add(new_snapshot)
-            
-            saved_count += 1
+            rows.append({
+                'date': snapshot_date,
+                'account_name': account_name,
+                'symbol': symbol,
+                'quantity': quantity
+            })
         
+        # The account's snapshot for this date is replaced as a whole: symbols left out are no longer held
+        session.query(Snapshot).filter(
+            Snapshot.date == snapshot_date,
+            Snapshot.account_name == account_name,
+            Snapshot.symbol.notin_([r['symbol'] for r in rows])
+        ).delete(synchronize_session=False)
+        saved_count = upsert.upsert_snapshots(session, rows)
         session.commit()
-        clear_data_cache()  # Invalidate cache after saving
+        data_cache.invalidate('snapshots', since=snapshot_date)
+        refresh_valuations(snapshot_date)
         return saved_count
         
     except Exception as e:
@@ -120,7 +192,8 @@ def save_transfer(transfer_date, transfer_type, amount_usd, note=None):
         )
         session.add(new_transfer)
         session.commit()
-        clear_data_cache()  # Invalidate cache after saving
+        get_cash_flow_index().add(transfer_date, transfer_type, amount_usd)
+        data_cache.invalidate('transfers', since=transfer_date)
         return True
     except Exception as e:
         session.rollback()
@@ -165,7 +238,7 @@ def get_unique_accounts():
 
 # ============ Calculation Functions ============
 
-@st.cache_data(ttl=300)
+@data_cache.cached(['snapshots'], ttl=300)
 def get_latest_snapshot_date():
     """Get latest snapshot date"""
     session = get_session(engine)
@@ -176,63 +249,22 @@ def get_latest_snapshot_date():
         session.close()
 
 
-@st.cache_data(ttl=600)
 def get_price_for_date(symbol, target_date):
     """Get price for date, use latest if not available"""
-    session = get_session(engine)
-    try:
-        price_record = session.query(PriceHistory).filter(
-            and_(
-                PriceHistory.symbol == symbol,
-                PriceHistory.date == target_date
-            )
-        ).first()
-        
-        if price_record:
-            return price_record.price_usd
-        
-        price_record = session.query(PriceHistory).filter(
-            and_(
-                PriceHistory.symbol == symbol,
-                PriceHistory.date <= target_date
-            )
-        ).order_by(PriceHistory.date.desc()).first()
-        
-        return price_record.price_usd if price_record else None
-        
-    finally:
-        session.close()
+    return get_price_matrix().get(symbol, target_date)
 
 
-@st.cache_data(ttl=600)
+@data_cache.cached(['daily_valuation'], ttl=600, upto=lambda target_date: target_date)
 def calculate_net_worth_for_date(target_date):
     """Calculate net worth for date"""
     session = get_session(engine)
     try:
-        snapshots = session.query(Snapshot).filter(Snapshot.date == target_date).all()
-        
-        if not snapshots:
-            return pd.DataFrame()
-        
-        data = []
-        for s in snapshots:
-            price = get_price_for_date(s.symbol, target_date)
-            value = s.quantity * price if price else 0
-            data.append({
-                'account_name': s.account_name,
-                'symbol': s.symbol,
-                'quantity': s.quantity,
-                'price': price or 0,
-                'value': value
-            })
-        
-        return pd.DataFrame(data)
-        
+        return valuation.load_daily_valuation(session, target_date)
     finally:
         session.close()
 
 
-@st.cache_data(ttl=600)
+@data_cache.cached(['snapshots', 'daily_valuation'], ttl=600)
 def calculate_current_net_worth():
     """Calculate current net worth"""
     latest_date = get_latest_snapshot_date()
@@ -277,28 +309,19 @@ def calculate_current_net_worth():
     }
 
 
-@st.cache_data(ttl=300)
+@data_cache.cached(['transfers'], ttl=300)
 def calculate_transfers_summary():
     """Calculate transfers summary"""
-    session = get_session(engine)
+    total_deposits, total_withdrawals = get_cash_flow_index().totals()
     
-    try:
-        transfers = session.query(Transfer).all()
-        
-        total_deposits = sum(t.amount_usd for t in transfers if t.type == 'deposit')
-        total_withdrawals = sum(t.amount_usd for t in transfers if t.type == 'withdrawal')
-        
-        return {
-            'total_deposits': total_deposits,
-            'total_withdrawals': total_withdrawals,
-            'net_investment': total_deposits - total_withdrawals
-        }
-        
-    finally:
-        session.close()
+    return {
+        'total_deposits': total_deposits,
+        'total_withdrawals': total_withdrawals,
+        'net_investment': total_deposits - total_withdrawals
+    }
 
 
-@st.cache_data(ttl=300)
+@data_cache.cached(['snapshots', 'daily_valuation', 'transfers'], ttl=300)
 def calculate_pnl():
     """Calculate PnL"""
     net_worth_data = calculate_current_net_worth()
@@ -322,106 +345,23 @@ def calculate_pnl():
     }
 
 
-@st.cache_data(ttl=300)
-def calculate_time_based_returns():
-    """Calculate time-based returns and APY"""
-    session = get_session(engine)
+@data_cache.cached(['daily_valuation', 'transfers'], ttl=600)
+def calculate_returns():
+    """TWR / IRR / rolling APY for all periods (cached history + cash-flow index, no transfers query)"""
+    history_df = get_net_worth_history()
+    if history_df.empty:
+        return None
     
-    try:
-        snapshots = session.query(Snapshot.date, Snapshot.created_at).order_by(
-            Snapshot.date, Snapshot.created_at
-        ).all()
-        
-        if len(snapshots) < 2:
-            return {'has_data': False, 'roi': 0, 'apy': 0, 'days': 0, 'hours': 0}
-        
-        first_snapshot = snapshots[0]
-        last_snapshot = snapshots[-1]
-        
-        start_date = first_snapshot[0]
-        end_date = last_snapshot[0]
-        
-        start_datetime = datetime.combine(first_snapshot[0], datetime.min.time())
-        end_datetime = datetime.combine(last_snapshot[0], datetime.min.time())
-        
-        if first_snapshot[1] and last_snapshot[1]:
-            if isinstance(first_snapshot[1], datetime):
-                start_datetime = first_snapshot[1]
-            if isinstance(last_snapshot[1], datetime):
-                end_datetime = last_snapshot[1]
-        
-        time_delta = end_datetime - start_datetime
-        total_hours = time_delta.total_seconds() / 3600
-        total_days = time_delta.total_seconds() / 86400
-        
-        if total_hours < 1:
-            return {'has_data': False, 'roi': 0, 'apy': 0, 'days': 0, 'hours': 0}
-        
-        start_net_worth_df = calculate_net_worth_for_date(start_date)
-        end_net_worth_df = calculate_net_worth_for_date(end_date)
-        
-        start_net_worth = start_net_worth_df['value'].sum() if not start_net_worth_df.empty else 0
-        end_net_worth = end_net_worth_df['value'].sum() if not end_net_worth_df.empty else 0
-        
-        transfers = session.query(Transfer).filter(
-            and_(Transfer.date > start_date, Transfer.date <= end_date)
-        ).all()
-        
-        period_deposits = sum(t.amount_usd for t in transfers if t.type == 'deposit')
-        period_withdrawals = sum(t.amount_usd for t in transfers if t.type == 'withdrawal')
-        net_cash_flow = period_deposits - period_withdrawals
-        
-        if start_net_worth > 0:
-            roi = ((end_net_worth - start_net_worth - net_cash_flow) / start_net_worth) * 100
-        else:
-            roi = 0
-        
-        hours_per_year = 365.25 * 24
-        
-        if total_hours > 0 and roi > -100:
-            apy = (((1 + roi/100) ** (hours_per_year / total_hours)) - 1) * 100
-        else:
-            apy = 0
-        
-        return {
-            'has_data': True,
-            'roi': roi,
-            'apy': apy,
-            'days': total_days,
-            'hours': total_hours,
-            'start_date': start_date,
-            'end_date': end_date,
-            'start_net_worth': start_net_worth,
-            'end_net_worth': end_net_worth,
-            'net_cash_flow': net_cash_flow,
-            'period_deposits': period_deposits,
-            'period_withdrawals': period_withdrawals
-        }
-        
-    finally:
-        session.close()
+    cum_deposits, cum_withdrawals = get_cash_flow_index().cumulative(history_df['date'])
+    return returns.analyze(history_df['date'], history_df['net_worth'], cum_deposits, cum_withdrawals)
 
 
-@st.cache_data(ttl=600)
+@data_cache.cached(['daily_valuation'], ttl=600)
 def get_net_worth_history():
     """Get net worth history"""
     session = get_session(engine)
-    
     try:
-        dates = session.query(Snapshot.date).distinct().order_by(Snapshot.date).all()
-        dates = [d[0] for d in dates]
-        
-        if not dates:
-            return pd.DataFrame()
-        
-        history = []
-        for d in dates:
-            net_worth_df = calculate_net_worth_for_date(d)
-            total = net_worth_df['value'].sum() if not net_worth_df.empty else 0
-            history.append({'date': d, 'net_worth': total})
-        
-        return pd.DataFrame(history)
-        
+        return valuation.load_net_worth_history(session)
     finally:
         session.close()
 
@@ -433,7 +373,7 @@ def check_password():
 
     def password_entered():
         """Checks whether a password entered by the user is correct."""
-        if st.session_state["password"] == st.secrets.get("PASSWORD", "admin123"):
+        if st.session_state["password"] == get_secret("PASSWORD", "admin123"):
             st.session_state["password_correct"] = True
             del st.session_state["password"]
         else:
@@ -479,35 +419,47 @@ def check_password():
 
 # ============ Global Cache Helpers ============
 
-@st.cache_data(ttl=600)
+@data_cache.cached(['snapshots', 'transfers', 'price_history'], ttl=600)
 def get_sidebar_stats(engine_trigger): # Trigger is just to ensure it's tied to engine state if needed
     session = get_session(engine)
     try:
-        snapshot_count = session.query(Snapshot).count()
-        transfer_count = session.query(Transfer).count()
-        price_count = session.query(PriceHistory).count()
-        return snapshot_count, transfer_count, price_count
+        return summary.table_counts(session)
     finally:
         session.close()
 
-@st.cache_data(ttl=600)
-def get_benchmark_roi(engine_trigger):
-    """Quick Benchmark (BTC ROI since first snapshot)"""
-    try:
-        session = get_session(engine)
-        first_snapshot = session.query(Snapshot.date).order_by(Snapshot.date.asc()).first()
-        if first_snapshot:
-            # Get latest BTC and BTC at first snapshot date
-            btc_current = session.query(PriceHistory.price_usd).filter(PriceHistory.symbol=='BTC').order_by(PriceHistory.date.desc()).first()
-            btc_start = session.query(PriceHistory.price_usd).filter(PriceHistory.symbol=='BTC', PriceHistory.date <= first_snapshot[0]).order_by(PriceHistory.date.desc()).first()
-            if btc_current and btc_start and btc_start[0] > 0:
-                roi = ((btc_current[0] / btc_start[0]) - 1) * 100
-                session.close()
-                return roi
-        session.close()
-    except:
-        pass
-    return 0.0
+@data_cache.cached(
+    ['daily_valuation', 'price_history'], ttl=600,
+    upto=lambda symbols, start_date=None, end_date=None: end_date,
+    keys=lambda symbols, start_date=None, end_date=None: symbols
+)
+def get_benchmark_series(symbols, start_date=None, end_date=None):
+    """Benchmark prices / returns aligned to the portfolio's valuation dates (symbols: normalized tuple)"""
+    history_df = get_net_worth_history()
+    dates = [] if history_df.empty else [
+        d for d in history_df['date']
+        if (start_date is None or d >= start_date) and (end_date is None or d <= end_date)
+    ]
+    return benchmark.benchmark_series(get_price_matrix(), symbols, dates)
+
+def backfill_prices(symbols=None, benchmarks=()):
+    """Backfill missing historical prices (held symbols and/or benchmarks) and invalidate what they feed"""
+    result = price_service.backfill_price_history(
+        symbols, engine=engine, service=get_price_service(), benchmarks=benchmarks
+    )
+    # backfill_price_history already refreshed the affected daily_valuation rows
+    if result['rows']:
+        get_price_matrix().invalidate(result['symbols'])
+        data_cache.invalidate('price_history', since=result['since'], keys=result['symbols'])
+        data_cache.invalidate('daily_valuation', since=result['since'])
+    return result
+
+def backfill_benchmarks(symbols):
+    """Fetch benchmark history from the first valuation date (benchmarks need not be held)"""
+    return backfill_prices(symbols=[], benchmarks=symbols)
+
+def get_benchmark_roi():
+    """Quick Benchmark (BTC ROI over the portfolio's valuation dates)"""
+    return get_benchmark_series(('BTC',))['returns'].get('BTC', 0.0)
 
 # ============ Main Application ============
 
@@ -519,6 +471,8 @@ def main():
     if not check_password():
         st.stop()  # Do not run the rest of the app
     
+    sql_monitor.start_run()
+    
     # --- Sidebar Configuration & Tools ---
     with st.sidebar:
         st.markdown(f'<div style="padding: 10px 16px 20px 16px;"><h2 style="font-size:1.1rem; margin:0;">Account</h2></div>', unsafe_allow_html=True)
@@ -547,9 +501,18 @@ def main():
         st.markdown(f'<div style="font-size:0.65rem; font-weight:700; color:#9CA3AF; text-transform:uppercase; margin-bottom:12px;">{L.SIDEBAR_STATS}</div>', unsafe_allow_html=True)
         
         counts = get_sidebar_stats(str(engine.url))
-        for lab, val in [(L.STAT_SNAPSHOTS, counts[0]), (L.STAT_TRANSFERS, counts[1]), (L.STAT_PRICES, counts[2])]:
+        for lab, val in [(L.STAT_SNAPSHOTS, counts[0]), (L.STAT_TRANSFERS, counts[1]), (L.STAT_PRICES, counts[2]),
+                         (L.STAT_CACHE_HIT, f"{data_cache.hit_rate():.0%}")]:
             st.markdown(f'<div style="display:flex; justify-content:space-between; margin-bottom:6px;"><span style="color:#6B7280; font-size:0.75rem;">{lab}</span><span style="font-weight:700; font-size:0.75rem;">{val}</span></div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
+        
+        refresher = get_price_refresher()
+        if refresher is not None:
+            status = refresher.status()
+            last_run = status['last_run'].strftime('%H:%M') if status['last_run'] else L.REFRESH_PENDING
+            st.caption(L.REFRESH_STATUS.format(status['interval_minutes'], last_run))
+            if status['last_error']:
+                st.caption(f"⚠️ {status['last_error'][:80]}")
     
     # Page Routing
     if page == L.NAV_DASHBOARD:
@@ -560,6 +523,29 @@ def main():
         show_price_page()
     elif page == L.NAV_DATA_VIEW:
         show_data_view_page()
+    
+    if get_secret("DEBUG_SQL") or os.getenv("MYLEDGER_DEBUG_SQL"):
+        show_sql_debug_panel()
+
+
+def show_sql_debug_panel():
+    """Sidebar panel listing this rerun's SQL statements grouped by call site, slowest first"""
+    records = sql_monitor.stop_run()
+    summary = sql_monitor.summarize(records)
+    
+    with st.sidebar.expander(L.SQL_DEBUG_TITLE, expanded=False):
+        st.caption(L.SQL_DEBUG_SUMMARY.format(len(records), sum(r.duration_ms for r in records)))
+        if sql_monitor.log_path:
+            st.caption(L.SQL_DEBUG_SLOW.format(sql_monitor.slow_ms, sql_monitor.log_path))
+        if summary:
+            st.dataframe(pd.DataFrame([{
+                L.SQL_CALL_SITE: g['call_site'],
+                L.SQL_COUNT: g['count'],
+                L.SQL_TOTAL_MS: round(g['total_ms'], 2),
+                L.SQL_MAX_MS: round(g['max_ms'], 2),
+                L.SQL_ROWS: g['rows'],
+                L.SQL_STATEMENT: g['statement'],
+            } for g in summary]), use_container_width=True, hide_index=True)
 
 
 def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
@@ -569,8 +555,8 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
     net_worth_data = calculate_current_net_worth()
     transfers_data = calculate_transfers_summary()
     pnl_data = calculate_pnl()
-    time_returns = calculate_time_based_returns()
-    benchmark_roi = get_benchmark_roi(str(engine.url))
+    returns_data = calculate_returns()
+    benchmark_roi = get_benchmark_roi()
 
     # Data date - Enhanced Typography
     st.markdown(f"""
@@ -619,11 +605,21 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
             delta_up=roi_pct >= 0
         )
     
-    # Time-based returns
-    if time_returns['has_data']:
+    # Time-based returns (every period is precomputed, switching needs no queries)
+    if returns_data:
         st.markdown("---")
         st.subheader(L.TIME_RETURNS)
         
+        periods = returns_data['periods']
+        period_key = st.radio(
+            L.TIME_SELECT_PERIOD,
+            list(periods),
+            format_func=lambda k: L.TIME_PERIODS[k],
+            horizontal=True,
+            key="returns_period"
+        )
+        time_returns = periods[period_key]
+        
         # Privacy helper
         def mask(val):
             return "••••••" if privacy_on else val
@@ -674,18 +670,35 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
             </div>
             """, unsafe_allow_html=True)
         
-        col_apy1, col_apy2 = st.columns(2)
+        col_apy1, col_apy2, col_apy3, col_apy4 = st.columns(4)
         
         with col_apy1:
             roi_val = f"{time_returns['roi']:.2f}%"
             S.metric_card(
                 label=L.TIME_PERIOD_ROI,
                 value=roi_val,
-                delta=f"{time_returns['days']:.1f} 天",
+                delta=f"{time_returns['days']:.0f} 天",
                 delta_up=time_returns['roi'] >= 0
             )
         
         with col_apy2:
+            S.metric_card(
+                label=L.TIME_TWR,
+                value=f"{time_returns['twr']:.2f}%",
+                delta=L.TIME_TWR_HELP,
+                delta_up=time_returns['twr'] >= 0
+            )
+        
+        with col_apy3:
+            irr_ok = pd.notna(time_returns['irr'])
+            S.metric_card(
+                label=L.TIME_IRR,
+                value=f"{time_returns['irr']:,.2f}%" if irr_ok else L.TIME_NA,
+                delta=L.TIME_IRR_HELP,
+                delta_up=time_returns['irr'] >= 0 if irr_ok else "neutral"
+            )
+        
+        with col_apy4:
             apy_val = f"{time_returns['apy']:,.2f}%"
             S.metric_card(
                 label=L.TIME_APY,
@@ -693,6 +706,31 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
                 delta=L.TIME_ANNUALIZED if abs(time_returns['apy']) < 1000 else L.TIME_HIGH_VOL,
                 delta_up=time_returns['apy'] >= 0
             )
+        
+        # Rolling APY for the selected window
+        if period_key in returns_data['rolling_apy']:
+            rolling_df = pd.DataFrame({
+                'date': returns_data['dates'],
+                'apy': returns_data['rolling_apy'][period_key]
+            }).dropna()
+            if len(rolling_df) > 1:
+                fig_rolling = go.Figure(go.Scatter(
+                    x=rolling_df['date'],
+                    y=rolling_df['apy'],
+                    mode='lines',
+                    name=L.TIME_ROLLING_APY,
+                    line=dict(color='#0EA5E9', width=2)
+                ))
+                fig_rolling.update_layout(
+                    title=dict(text=f"{L.TIME_ROLLING_APY} ({L.TIME_PERIODS[period_key]})", font=dict(size=16, family='Outfit')),
+                    height=280,
+                    margin=dict(l=0, r=0, t=50, b=0),
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    xaxis=dict(showgrid=False, linecolor='#E5E7EB'),
+                    yaxis=dict(showgrid=True, gridcolor='#F3F4F6', zeroline=True, ticksuffix='%')
+                )
+                st.plotly_chart(fig_rolling, use_container_width=True)
     
     st.markdown("---")
     
@@ -763,6 +801,14 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
     
     history_df = get_net_worth_history()
     
+    held_symbols = net_worth_data['by_symbol']['symbol'].tolist() if not net_worth_data['by_symbol'].empty else []
+    benchmark_symbols = st.multiselect(
+        L.BENCH_SELECT,
+        options=list(dict.fromkeys(benchmark.DEFAULT_BENCHMARKS + sorted(held_symbols))),
+        default=['BTC'],
+        key="benchmark_symbols"
+    )
+    
     if not history_df.empty and len(history_df) > 1:
         # Check if all values are the same (indicating missing historical prices)
         unique_values = history_df['net_worth'].nunique()
@@ -783,6 +829,30 @@ def show_dashboard(privacy_on=False, fx_rate=1.0, cur_sym="$"):
             fillcolor='rgba(0, 0, 0, 0.03)'
         ))
         
+        # Benchmark overlays: each curve starts at the portfolio's net worth on its first priced date
+        bench = get_benchmark_series(benchmark.normalize_symbols(benchmark_symbols))
+        net_worth_values = history_df['net_worth'].to_numpy()
+        for i, (symbol, index) in enumerate(bench['index'].items()):
+            base = int(pd.Series(index).first_valid_index())
+            fig_history.add_trace(go.Scatter(
+                x=history_df['date'],
+                y=net_worth_values[base] * index,
+                mode='lines',
+                name=f"{symbol} ({bench['returns'][symbol]:+.1f}%)",
+                line=dict(color=MODERN_COLORS[i % len(MODERN_COLORS)], width=2, dash='dot')
+            ))
+        if bench['missing']:
+            st.caption(L.BENCH_MISSING.format(", ".join(bench['missing'])))
+            if st.button(L.BENCH_BACKFILL, key="benchmark_backfill"):
+                with st.spinner(L.PRICE_BACKFILLING):
+                    try:
+                        result = backfill_benchmarks(bench['missing'])
+                        if result['rows']:
+                            st.rerun()
+                        st.warning(L.BENCH_BACKFILL_NONE.format(", ".join(bench['missing'])))
+                    except Exception as e:
+                        st.error(f"{L.PRICE_FETCH_FAILED}: {e}")
+        
         fig_history.update_layout(
             title=dict(text=L.CHART_NW_OVER_TIME, font=dict(size=18, family='Outfit')),
             xaxis_title=None,
@@ -989,59 +1059,9 @@ def show_data_entry_page():
                     st.warning(L.ENTRY_NO_VALID)
                 else:
                     try:
-                        # 1. Save current account's snapshot
+                        # Other accounts are not copied: valuation uses each account's latest snapshot as of the date
                         count = save_snapshots_batch(snapshot_date, account_name, valid_rows)
-                        
-                        # 2. Auto carry-forward other accounts from previous date
-                        session = get_session(engine)
-                        try:
-                            # Find accounts that exist on previous dates but not on current date
-                            prev_date = session.query(Snapshot.date).filter(
-                                Snapshot.date < snapshot_date
-                            ).order_by(Snapshot.date.desc()).first()
-                            
-                            carried_count = 0
-                            if prev_date:
-                                # Get all accounts from previous date
-                                prev_snapshots = session.query(Snapshot).filter(
-                                    Snapshot.date == prev_date[0]
-                                ).all()
-                                
-                                for old_snap in prev_snapshots:
-                                    # Skip if it's the account we just saved
-                                    if old_snap.account_name == account_name:
-                                        continue
-                                    
-                                    # Check if already exists for new date
-                                    existing = session.query(Snapshot).filter(
-                                        and_(
-                                            Snapshot.date == snapshot_date,
-                                            Snapshot.account_name == old_snap.account_name,
-                                            Snapshot.symbol == old_snap.symbol
-                                        )
-                                    ).first()
-                                    
-                                    if not existing:
-                                        new_snap = Snapshot(
-                                            date=snapshot_date,
-                                            account_name=old_snap.account_name,
-                                            symbol=old_snap.symbol,
-                                            quantity=old_snap.quantity
-                                        )
-                                        session.add(new_snap)
-                                        carried_count += 1
-                                
-                                if carried_count > 0:
-                                    session.commit()
-                                    clear_data_cache()
-                        finally:
-                            session.close()
-                        
-                        # Show success message
-                        msg = L.ENTRY_SAVED_N.format(count)
-                        if carried_count > 0:
-                            msg += f" (自动继承其他账户 {carried_count} 条)"
-                        st.success(msg)
+                        st.success(L.ENTRY_SAVED_N.format(count))
                         st.balloons()
                         st.session_state.snapshot_data = edited_data
                         
@@ -1109,12 +1129,13 @@ def show_price_page():
     with tab1:
         st.subheader(L.PRICE_AUTO)
         
+        # Only symbols still held as of the latest valuation date whose price is older than the max age
         session_db = get_session(engine)
         try:
-            snapshots = session_db.query(Snapshot.symbol).distinct().order_by(Snapshot.symbol).all()
-            symbols_from_snapshots = [s[0] for s in snapshots]
+            plan = price_refresher.plan_refresh(session_db)
         finally:
             session_db.close()
+        symbols_from_snapshots = sorted(plan.held + plan.not_held)
         
         if not symbols_from_snapshots:
             st.warning(L.PRICE_NO_SNAPSHOTS)
@@ -1128,12 +1149,28 @@ def show_price_page():
             )
             
             if input_method == L.PRICE_FROM_SNAPSHOTS:
-                symbols_to_fetch = symbols_from_snapshots
-                st.success(L.PRICE_WILL_FETCH.format(len(symbols_to_fetch)))
+                symbols_to_fetch = plan.fetch
+                st.success(L.PRICE_PLAN.format(
+                    len(plan.fetch), plan.skipped, f"{plan.max_age_minutes:g}", len(plan.fresh), len(plan.not_held)
+                ))
+                with st.expander(L.PRICE_PLAN_DETAILS):
+                    now = datetime.utcnow()
+                    plan_rows = []
+                    for status, symbols in (('fetch', plan.fetch), ('fresh', plan.fresh), ('not_held', plan.not_held)):
+                        for symbol in symbols:
+                            latest_date, updated_at = plan.latest.get(symbol, (None, None))
+                            plan_rows.append({
+                                L.PRICE_SYMBOL: symbol,
+                                L.PRICE_PLAN_COL_STATUS: L.PRICE_PLAN_STATUS[status],
+                                L.PRICE_PLAN_COL_LATEST: latest_date,
+                                L.PRICE_PLAN_COL_AGE: round((now - updated_at).total_seconds() / 60)
+                                if updated_at is not None and latest_date >= date.today() else None,
+                            })
+                    st.dataframe(pd.DataFrame(plan_rows), use_container_width=True, hide_index=True)
             else:
                 symbols_input = st.text_area(
                     L.PRICE_SYMBOLS_HINT,
-                    value="\n".join(symbols_from_snapshots),
+                    value="\n".join(plan.held or symbols_from_snapshots),
                     height=150
                 )
                 symbols_to_fetch = [s.strip().upper() for s in symbols_input.split('\n') if s.strip()]
@@ -1144,8 +1181,13 @@ def show_price_page():
                 else:
                     with st.spinner(L.PRICE_FETCHING.format(len(symbols_to_fetch))):
                         try:
-                            count = price_service.update_price_history_db(symbols_to_fetch)
-                            clear_data_cache()  # Invalidate cache after price update
+                            count = price_service.update_price_history_db(
+                                symbols_to_fetch, engine=engine, service=get_price_service()
+                            )
+                            # update_price_history_db already refreshed today's daily_valuation rows
+                            get_price_matrix().invalidate(symbols_to_fetch)
+                            data_cache.invalidate('price_history', since=date.today(), keys=symbols_to_fetch)
+                            data_cache.invalidate('daily_valuation', since=date.today())
                             st.success(L.PRICE_UPDATED_N.format(count))
                             st.balloons()
                             
@@ -1168,6 +1210,25 @@ def show_price_page():
                             
                         except Exception as e:
                             st.error(f"{L.PRICE_FETCH_FAILED}: {e}")
+            
+            st.markdown("---")
+            st.caption(L.PRICE_BACKFILL_HINT)
+            if st.button(L.PRICE_BACKFILL, use_container_width=True):
+                with st.spinner(L.PRICE_BACKFILLING):
+                    try:
+                        result = backfill_prices(
+                            benchmarks=st.session_state.get('benchmark_symbols', ['BTC'])
+                        )
+                        if result['rows']:
+                            st.success(L.PRICE_BACKFILLED_N.format(result['rows'], len(result['symbols'])))
+                        else:
+                            st.info(L.PRICE_BACKFILL_NONE)
+                        if result['unfilled']:
+                            st.warning(L.PRICE_BACKFILL_UNFILLED.format(
+                                ', '.join(f"{s} ({n})" for s, n in result['unfilled'].items())
+                            ))
+                    except Exception as e:
+                        st.error(f"{L.PRICE_FETCH_FAILED}: {e}")
     
     with tab2:
         st.subheader(L.PRICE_MANUAL)
@@ -1206,28 +1267,16 @@ def show_price_page():
                 else:
                     session = get_session(engine)
                     try:
-                        existing = session.query(PriceHistory).filter(
-                            and_(
-                                PriceHistory.date == price_date,
-                                PriceHistory.symbol == symbol
-                            )
-                        ).first()
-                        
-                        if existing:
-                            existing.price_usd = price_usd
-                            existing.source = 'manual'
-                            existing.created_at = datetime.utcnow()
-                        else:
-                            new_price = PriceHistory(
-                                date=price_date,
-                                symbol=symbol,
-                                price_usd=price_usd,
-                                source='manual'
-                            )
-                            session.add(new_price)
+                        upsert.upsert_price_history(session, [{
+                            'date': price_date,
+                            'symbol': symbol,
+                            'price_usd': price_usd,
+                            'source': 'manual'
+                        }])
                         
                         session.commit()
-                        clear_data_cache()  # Invalidate cache after manual price entry
+                        data_cache.invalidate('price_history', since=price_date, keys=[symbol])
+                        refresh_valuations(price_date, symbols=[symbol])
                         st.success(L.PRICE_SAVED.format(symbol, price_usd))
                         
                     except Exception as e:
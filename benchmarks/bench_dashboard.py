@@ -0,0 +1,202 @@
+"""
+仪表盘计算函数基准测试（合成数据，临时 SQLite 数据库）
+
+每个规模在独立子进程中运行：生成确定性的合成账本 -> 设置 DB_URL -> 导入 app.py，
+对每个函数分别测量：
+- 未命中缓存的耗时（每次调用前清空 data_cache，取中位数）
+- 命中缓存的耗时
+- 一次未命中调用执行的 SQL 语句数
+- 一次未命中调用的内存峰值（tracemalloc）
+
+用法（在项目根目录）:
+    python -m benchmarks.bench_dashboard
+    python -m benchmarks.bench_dashboard --scales small,medium,large --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_dashboard --compare benchmarks/baseline.json   # 出现回退时以状态 1 退出
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks.synthetic import SCALES, LedgerSpec, build_ledger
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULT_PREFIX = 'BENCH_RESULT '
+
+# 回退判定的绝对下限，避免毫秒级噪声被当成回退
+MIN_TIME_DELTA_MS = 5.0
+MIN_MEMORY_DELTA_KB = 256.0
+
+
+# ============ 子进程：单个规模 ============
+
+def _targets(app):
+    latest = app.get_latest_snapshot_date()
+    return {
+        'calculate_net_worth_for_date': lambda: app.calculate_net_worth_for_date(latest),
+        'calculate_current_net_worth': app.calculate_current_net_worth,
+        'get_net_worth_history': app.get_net_worth_history,
+        'calculate_returns': app.calculate_returns,
+        'get_benchmark_roi': app.get_benchmark_roi,
+    }
+
+
+def measure(app, call, repeat):
+    from sqlalchemy import event
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    call()  # 预热：价格矩阵加载等进程级初始化不计入
+
+    times = []
+    for _ in range(repeat):
+        app.data_cache.clear()
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+
+    app.data_cache.clear()
+    event.listen(app.engine, 'before_cursor_execute', count)
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        event.remove(app.engine, 'before_cursor_execute', count)
+
+    start = time.perf_counter()
+    call()
+    cached = (time.perf_counter() - start) * 1000
+
+    return {
+        'uncached_ms': round(statistics.median(times), 3),
+        'cached_ms': round(cached, 3),
+        'statements': statements[0],
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_worker(spec: LedgerSpec, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        rows = build_ledger(db_path, spec)
+
+        os.environ['DB_URL'] = db_path
+        sys.path.insert(0, PROJECT_ROOT)
+        import app
+
+        functions = {name: measure(app, call, repeat) for name, call in _targets(app).items()}
+        app.engine.dispose()
+
+    print(RESULT_PREFIX + json.dumps({'spec': spec.to_dict(), 'rows': rows, 'functions': functions}))
+
+
+# ============ 主进程 ============
+
+def run_scale(name, repeat):
+    spec = SCALES[name]
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_dashboard', '--worker', json.dumps(spec.to_dict()),
+         '--repeat', str(repeat)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"规模 {name} 运行失败:\n{result.stderr[-3000:]}")
+
+
+def print_results(results):
+    for name, result in results.items():
+        rows = result['rows']
+        print(f"\n📐 {name}: {LedgerSpec(**result['spec']).label()}  "
+              f"(快照 {rows['snapshots']} / 价格 {rows['price_history']} / 估值 {rows['daily_valuation']} 行)")
+        print(f"  {'函数':32s} {'未命中(ms)':>11s} {'命中(ms)':>9s} {'SQL':>5s} {'峰值(KB)':>10s}")
+        for fn, m in result['functions'].items():
+            print(f"  {fn:32s} {m['uncached_ms']:11.2f} {m['cached_ms']:9.3f} {m['statements']:5d} {m['peak_kb']:10.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """与基线对比，返回回退列表"""
+    regressions = []
+    for name, result in results.items():
+        base_scale = baseline.get('scales', {}).get(name)
+        if base_scale is None:
+            continue
+        if base_scale['spec'] != result['spec']:
+            print(f"⚠️  规模 {name} 的参数与基线不同，跳过对比")
+            continue
+        for fn, m in result['functions'].items():
+            base = base_scale['functions'].get(fn)
+            if base is None:
+                continue
+            if m['uncached_ms'] > base['uncached_ms'] * (1 + tolerance) and \
+                    m['uncached_ms'] - base['uncached_ms'] > MIN_TIME_DELTA_MS:
+                regressions.append(f"{name}/{fn}: 耗时 {base['uncached_ms']:.2f} -> {m['uncached_ms']:.2f} ms")
+            if m['statements'] > base['statements']:
+                regressions.append(f"{name}/{fn}: SQL 语句 {base['statements']} -> {m['statements']}")
+            if m['peak_kb'] > base['peak_kb'] * (1 + tolerance) and \
+                    m['peak_kb'] - base['peak_kb'] > MIN_MEMORY_DELTA_KB:
+                regressions.append(f"{name}/{fn}: 内存峰值 {base['peak_kb']:.0f} -> {m['peak_kb']:.0f} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仪表盘计算函数基准（合成数据）")
+    parser.add_argument('--scales', default='small,medium', help=f"逗号分隔的规模: {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=5, help="未命中缓存耗时的重复次数（取中位数）")
+    parser.add_argument('--save-baseline', metavar='PATH', help="把结果保存为基线 JSON")
+    parser.add_argument('--compare', metavar='PATH', help="与基线 JSON 对比，出现回退时以状态 1 退出")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="耗时 / 内存允许的相对增幅")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(LedgerSpec(**json.loads(args.worker)), args.repeat)
+        return
+
+    names = [n.strip() for n in args.scales.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SCALES]
+    if unknown:
+        parser.error(f"未知规模: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"⏳ 运行规模 {name} ...", flush=True)
+        results[name] = run_scale(name, args.repeat)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'scales': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 基线已保存: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n📊 与基线对比（{baseline.get('created_at', '?')}，容差 {args.tolerance:.0%}）:")
+        for line in regressions:
+            print(f"  ❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("  ✅ 未发现回退")
+
+
+if __name__ == '__main__':
+    main()
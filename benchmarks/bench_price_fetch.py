@@ -0,0 +1,99 @@
+"""
+PriceService 串行 / 并发 / 批量获取基准测试（模拟数据源，不访问网络）
+
+用法（在项目根目录）:
+    python -m benchmarks.bench_price_fetch --symbols 60 --latency 0.3
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+from src.price_service import PriceService
+from src.quote_cache import QuoteCache
+
+
+class MockPriceService(PriceService):
+    """用固定延迟模拟各数据源的网络请求"""
+    
+    def __init__(self, latency, **kwargs):
+        # 每次运行使用独立的空缓存，避免不同模式之间互相命中
+        kwargs.setdefault('quote_cache', QuoteCache())
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+    
+    def _mock_request(self, symbols):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        return {s: float(len(s)) for s in symbols}
+    
+    def _fetch_crypto_price_ccxt(self, symbol):
+        return self._mock_request([symbol])[symbol]
+    
+    def _fetch_crypto_price_coingecko(self, symbol):
+        return self._mock_request([symbol])[symbol]
+    
+    def _fetch_stock_price_yfinance(self, symbol):
+        return self._mock_request([symbol])[symbol]
+    
+    def _fetch_crypto_prices_ccxt(self, symbols):
+        return self._mock_request(symbols)
+    
+    def _fetch_crypto_prices_coingecko(self, symbols):
+        return self._mock_request(symbols)
+    
+    def _fetch_stock_prices_yfinance(self, symbols):
+        return self._mock_request(symbols)
+
+
+def make_symbols(count):
+    """按 2:1 的比例混合加密货币与股票代码"""
+    crypto = sorted(PriceService.CRYPTO_SYMBOLS)
+    symbols = []
+    for i in range(count):
+        if i % 3 < 2:
+            symbols.append(crypto[i % len(crypto)] if i < len(crypto) else f"C{i}")
+        else:
+            symbols.append(f"STK{i}")
+    return symbols
+
+
+def run(symbols, latency, concurrent, batch):
+    """返回 (耗时秒数, 模拟请求次数)"""
+    service = MockPriceService(latency)
+    # 生成的 C{i} 代码也按加密货币路由
+    service.CRYPTO_SYMBOLS = service.CRYPTO_SYMBOLS | {s for s in symbols if s.startswith('C')}
+    
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        prices = service.fetch_prices(symbols, concurrent=concurrent, batch=batch)
+    elapsed = time.perf_counter() - start
+    assert len(prices) == len(set(symbols)) and all(p is not None for p in prices.values())
+    return elapsed, service.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PriceService 串行/并发获取耗时对比")
+    parser.add_argument('--symbols', type=int, default=60, help="资产数量")
+    parser.add_argument('--latency', type=float, default=0.3, help="模拟单次请求延迟（秒）")
+    args = parser.parse_args()
+    
+    symbols = make_symbols(args.symbols)
+    legacy = len(symbols) * (args.latency + 0.5)
+    serial, serial_requests = run(symbols, args.latency, concurrent=False, batch=False)
+    concurrent, concurrent_requests = run(symbols, args.latency, concurrent=True, batch=False)
+    batch, batch_requests = run(symbols, args.latency, concurrent=True, batch=True)
+    
+    print(f"资产数量: {len(symbols)}, 模拟延迟: {args.latency:.2f}s")
+    print(f"  旧版串行 (每个资产额外 sleep 0.5s，估算): {legacy:8.2f}s  {len(symbols):4d} 次请求")
+    print(f"  逐个串行 + 令牌桶限流:                    {serial:8.2f}s  {serial_requests:4d} 次请求")
+    print(f"  逐个并发 + 令牌桶限流:                    {concurrent:8.2f}s  {concurrent_requests:4d} 次请求")
+    print(f"  批量接口:                                 {batch:8.2f}s  {batch_requests:4d} 次请求")
+    print(f"  加速比: {serial / concurrent:.1f}x (并发对比串行), {legacy / batch:.1f}x (批量对比旧版)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+应用启动（模块导入）耗时基准测试
+
+用 `python -X importtime` 在全新子进程中导入 app.py 顶层引用的全部模块，
+统计总耗时与最慢的模块，并检查价格数据源后端（ccxt / yfinance / pycoingecko）没有在启动时被导入。
+超过阈值或出现禁止的模块时以非零状态退出，可用于防止启动性能回退。
+
+用法（在项目根目录）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --max-seconds 3.0
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 只应在真正获取价格时才导入的重量级模块
+LAZY_MODULES = ('ccxt', 'yfinance', 'pycoingecko')
+
+
+def app_imports(path=os.path.join(PROJECT_ROOT, 'app.py')):
+    """解析 app.py 顶层的 import 语句 -> 模块名列表（与 app.py 保持同步，无需手工维护）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            # from src import price_service -> src.price_service
+            if node.module == 'src':
+                modules.extend(f"src.{alias.name}" for alias in node.names)
+            else:
+                modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+# 写到 stderr 的分隔行：之前是解释器自身启动（site 等）的导入，不计入
+MARKER = '--- app imports ---'
+
+
+def measure(modules):
+    """
+    在新的解释器中导入 modules 并解析 -X importtime 输出
+
+    -X importtime 的累计耗时包含所有嵌套导入（例如 src.models 的累计耗时已包含 sqlalchemy），
+    所以只取第一层（由这些 import 语句直接触发）的条目：它们互不重叠，相加即为总耗时
+
+    Returns:
+        {模块名: 累计耗时（微秒）}，只包含本次导入的第一层模块；已被前面的模块导入过的为缺省
+    """
+    code = f"import sys; sys.stderr.write({MARKER!r} + '\\n')\n" + '\n'.join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败:\n{result.stderr[-2000:]}")
+
+    lines = result.stderr.splitlines()
+    timings = {}
+    for line in lines[lines.index(MARKER) + 1:]:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue  # 嵌套导入，已计入上一层的累计耗时
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def imported_modules(modules):
+    """新解释器导入 modules 后 sys.modules 中的全部模块名（检查按需加载的模块）"""
+    code = '\n'.join(f"import {m}" for m in modules) + "\nimport sys; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败:\n{result.stderr[-2000:]}")
+    return set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py 启动导入耗时基准")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数（取最快一次，降低磁盘缓存等噪声）")
+    parser.add_argument('--max-seconds', type=float, default=4.0, help="导入总耗时上限（秒），超过则以状态 1 退出")
+    parser.add_argument('--top', type=int, default=10, help="显示最慢的顶层模块数量")
+    args = parser.parse_args()
+
+    modules = app_imports()
+    runs = [measure(modules) for _ in range(max(1, args.repeat))]
+    timings = min(runs, key=lambda t: sum(t.values()))
+    total = sum(timings.values()) / 1e6
+
+    print(f"app.py 顶层导入 {len(modules)} 个模块，{len(runs)} 次取最快（只计第一层，嵌套导入计入触发它的模块）:")
+    for name in sorted(timings, key=timings.get, reverse=True)[:args.top]:
+        print(f"  {timings[name] / 1e6:8.3f}s  {name}")
+    print(f"  {'-' * 30}")
+    print(f"  {total:8.3f}s  合计（上限 {args.max_seconds:.2f}s）")
+
+    failed = False
+    loaded = imported_modules(modules)
+    eager = [m for m in LAZY_MODULES if any(n == m or n.startswith(f"{m}.") for n in loaded)]
+    if eager:
+        print(f"❌ 启动时导入了应按需加载的模块: {', '.join(eager)}")
+        failed = True
+    if total > args.max_seconds:
+        print(f"❌ 启动导入耗时 {total:.3f}s 超过上限 {args.max_seconds:.2f}s")
+        failed = True
+    if not failed:
+        print("✅ 启动导入耗时正常")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
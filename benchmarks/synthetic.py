@@ -0,0 +1,123 @@
+"""
+确定性的合成账本生成器（供基准测试使用）
+
+同样的参数和 seed 总是生成完全相同的数据：
+- 每个账户第一天保存全部持仓，之后每个快照日期以 update_ratio 的概率重新保存（其余日期按 as-of 延续）
+- 每个资产每天一条价格（随机游走），资产列表固定包含 BTC，供基准收益计算使用
+- 转账随机分布在快照日期范围内
+"""
+import os
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+from src.models import get_engine, get_session, Base, Snapshot, Transfer, PriceHistory
+from src import migrations
+from src import valuation
+
+
+@dataclass
+class LedgerSpec:
+    """合成账本的规模"""
+    accounts: int = 5
+    symbols: int = 20
+    dates: int = 90
+    transfers: int = 50
+    update_ratio: float = 0.5
+    seed: int = 42
+
+    def label(self) -> str:
+        return f"{self.accounts}acc-{self.symbols}sym-{self.dates}d-{self.transfers}tx"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# 预置的规模，从小到大
+SCALES = {
+    'small': LedgerSpec(accounts=3, symbols=10, dates=30, transfers=20),
+    'medium': LedgerSpec(accounts=5, symbols=30, dates=180, transfers=100),
+    'large': LedgerSpec(accounts=10, symbols=60, dates=730, transfers=500),
+}
+
+START_DATE = date(2023, 1, 1)
+INSERT_CHUNK = 5000
+
+
+def _symbols(n):
+    return ['BTC'] + [f"S{i:03d}" for i in range(1, n)]
+
+
+def generate_rows(spec: LedgerSpec):
+    """
+    生成账本数据
+
+    Returns:
+        (snapshots, transfers, prices)：三个 list[dict]，可直接用于批量 insert
+    """
+    rng = random.Random(spec.seed)
+    symbols = _symbols(spec.symbols)
+    days = [START_DATE + timedelta(days=i) for i in range(spec.dates)]
+    created = datetime(2023, 1, 1)
+
+    prices = []
+    for symbol in symbols:
+        price = rng.uniform(1, 50000) if symbol == 'BTC' else rng.uniform(0.5, 500)
+        for day in days:
+            price *= 1 + rng.gauss(0, 0.03)
+            prices.append({'date': day, 'symbol': symbol, 'price_usd': round(price, 6), 'source': 'synthetic'})
+
+    snapshots = []
+    per_account = max(1, spec.symbols // 2)
+    for a in range(spec.accounts):
+        account = f"Account-{a + 1:02d}"
+        held = {s: rng.uniform(0.1, 100) for s in rng.sample(symbols, min(per_account, len(symbols)))}
+        for i, day in enumerate(days):
+            if i > 0 and rng.random() >= spec.update_ratio:
+                continue
+            for symbol in list(held):
+                held[symbol] = max(0.0, held[symbol] * (1 + rng.gauss(0, 0.05)))
+            snapshots.extend({
+                'date': day, 'account_name': account, 'symbol': symbol,
+                'quantity': round(quantity, 8), 'created_at': created + timedelta(days=i)
+            } for symbol, quantity in held.items() if quantity > 0)
+
+    transfers = [{
+        'date': rng.choice(days),
+        'type': 'deposit' if rng.random() < 0.8 else 'withdrawal',
+        'amount_usd': round(rng.uniform(100, 10000), 2),
+        'note': 'synthetic',
+        'created_at': created,
+    } for _ in range(spec.transfers)]
+
+    return snapshots, transfers, prices
+
+
+def build_ledger(db_path: str, spec: LedgerSpec) -> dict:
+    """
+    在 db_path 新建 SQLite 数据库并写入合成账本（已有文件会被覆盖），随后构建物化估值表
+
+    Returns:
+        各表写入的行数
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    engine = get_engine(db_path)
+    Base.metadata.create_all(engine)
+    migrations.upgrade(engine)
+
+    snapshots, transfers, prices = generate_rows(spec)
+    session = get_session(engine)
+    try:
+        for model, rows in ((Snapshot, snapshots), (Transfer, transfers), (PriceHistory, prices)):
+            for start in range(0, len(rows), INSERT_CHUNK):
+                session.execute(insert(model), rows[start:start + INSERT_CHUNK])
+        session.commit()
+        valuation_rows = valuation.ensure_daily_valuation(session)
+    finally:
+        session.close()
+    engine.dispose()
+
+    return {'snapshots': len(snapshots), 'transfers': len(transfers),
+            'price_history': len(prices), 'daily_valuation': valuation_rows}
@@ -0,0 +1,62 @@
+"""
+MyLedger - 基准对比
+把任意一组基准资产（BTC、ETH、SPY、QQQ...）的价格对齐到组合的估值日期，
+通过价格矩阵一次向量化 as-of 查询得到，计算各基准相对区间起点的收益序列
+"""
+from typing import Dict, Iterable, List
+import numpy as np
+
+
+# 仪表盘默认可选的基准
+DEFAULT_BENCHMARKS = ['BTC', 'ETH', 'SPY', 'QQQ']
+
+
+def normalize_symbols(symbols: Iterable[str]) -> tuple:
+    """去重、大写、排序后的资产元组（用作缓存键）"""
+    return tuple(sorted({s.strip().upper() for s in symbols if s and s.strip()}))
+
+
+def benchmark_series(price_matrix, symbols: Iterable[str], dates: List) -> Dict:
+    """
+    计算基准在给定日期上的价格与累计收益
+
+    每个基准以它在 dates 中第一个有价格的日期为起点；起点之前的位置为 NaN
+
+    Args:
+        price_matrix: PriceMatrix（as-of 价格矩阵）
+        symbols: 基准资产
+        dates: 组合的估值日期（升序）
+
+    Returns:
+        {
+            'dates': dates,
+            'prices': {symbol: 价格数组},
+            'index': {symbol: 相对起点的价格比值（起点为 1）},
+            'returns': {symbol: 区间收益率（%，起点到最后一个日期）},
+            'missing': [dates 范围内没有任何价格的资产]
+        }
+    """
+    symbols = list(normalize_symbols(symbols))
+    dates = list(dates)
+    result = {'dates': dates, 'prices': {}, 'index': {}, 'returns': {}, 'missing': []}
+    if not symbols or not dates:
+        result['missing'] = symbols
+        return result
+
+    # 一次查询全部 资产 × 日期
+    prices = price_matrix.lookup([s for s in symbols for _ in dates], dates * len(symbols))
+    prices = prices.reshape(len(symbols), len(dates))
+
+    for symbol, row in zip(symbols, prices):
+        valid = np.nonzero(row > 0)[0]
+        if len(valid) == 0:
+            result['missing'].append(symbol)
+            continue
+        base = row[valid[0]]
+        index = row / base
+        index[:valid[0]] = np.nan
+        result['prices'][symbol] = row
+        result['index'][symbol] = index
+        result['returns'][symbol] = float(index[valid[-1]] - 1) * 100
+
+    return result
@@ -0,0 +1,137 @@
+"""
+MyLedger - 批量读写
+按主键分块流式读取核心表（内存占用与表大小无关），以及 SQL 字面量 / PostgreSQL COPY 文本格式的编码，
+供迁移、导出工具使用
+"""
+import io
+import math
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from sqlalchemy import select, text
+from .models import Snapshot, Transfer, PriceHistory
+
+
+# 迁移 / 导出的核心表（按此顺序处理）；daily_valuation 由快照和价格重建，不需要搬运
+CORE_MODELS = (Snapshot, Transfer, PriceHistory)
+
+# 默认每块的行数
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def data_columns(model) -> List[str]:
+    """除自增主键 id 外的列（目标库重新分配 id）"""
+    return [c.name for c in model.__table__.columns if c.name != 'id']
+
+
+def iter_chunks(conn, model, chunk_size: int = DEFAULT_CHUNK_SIZE, after_id: int = 0) -> Iterator[List[Tuple]]:
+    """
+    按 id 升序分块流式读取（yield_per，服务端游标 / 逐块 fetchmany）
+
+    Args:
+        conn: 数据库连接
+        model: 模型类
+        chunk_size: 每块的行数
+        after_id: 只读取 id 大于此值的行（断点续传）
+
+    Yields:
+        [(id, *data_columns), ...]
+    """
+    table = model.__table__
+    columns = [table.c.id] + [table.c[name] for name in data_columns(model)]
+    result = conn.execution_options(yield_per=chunk_size).execute(
+        select(*columns).where(table.c.id > after_id).order_by(table.c.id)
+    )
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+# ============ SQL 字面量 ============
+
+def sql_literal(value) -> str:
+    """
+    单个值 -> SQL 字面量（PostgreSQL / SQLite 通用）
+
+    字符串用单引号包裹、内部单引号加倍（standard_conforming_strings 下反斜杠不需要转义）；
+    NaN / Infinity 输出为带引号的字符串，由 PostgreSQL 转换为 float8
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "'NaN'"
+        if math.isinf(value):
+            return "'Infinity'" if value > 0 else "'-Infinity'"
+        return repr(value)
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_values(rows: Iterable[Sequence]) -> str:
+    """多行 -> VALUES 列表（每行一组括号，逗号 + 换行分隔）"""
+    return ',\n'.join('(' + ', '.join(sql_literal(v) for v in row) + ')' for row in rows)
+
+
+# ============ PostgreSQL COPY ============
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_value(value) -> str:
+    """单个值 -> COPY 文本格式（NULL 为 \\N；反斜杠、制表符、换行转义）"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    elif isinstance(value, float):
+        value = repr(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_rows(rows: Iterable[Sequence]) -> str:
+    """多行 -> COPY 文本（每行以制表符分隔，换行结尾）"""
+    return ''.join('\t'.join(copy_value(v) for v in row) + '\n' for row in rows)
+
+
+def copy_insert(session, model, columns: List[str], rows: List[Sequence], key=None) -> int:
+    """
+    PostgreSQL: COPY FROM STDIN 写入临时表，再 INSERT ... SELECT 到目标表
+
+    COPY 本身不支持 ON CONFLICT，经临时表中转后仍可按自然键跳过已存在的行
+
+    Args:
+        session: 目标库会话（PostgreSQL，调用方负责 commit）
+        model: 模型类
+        columns: rows 中各值对应的列
+        rows: 数据行
+        key: 自然键列；None 表示直接插入（调用方已去重）
+
+    Returns:
+        实际新增的行数
+    """
+    if not rows:
+        return 0
+    table = model.__table__.name
+    staging = f"_copy_{table}"
+    column_list = ', '.join(columns)
+
+    session.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT {column_list} FROM {table} WITH NO DATA"))
+    session.execute(text(f"TRUNCATE {staging}"))
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", io.StringIO(copy_rows(rows)))
+    finally:
+        cursor.close()
+
+    conflict = f" ON CONFLICT ({', '.join(key)}) DO NOTHING" if key else ''
+    return session.execute(text(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}{conflict}"
+    )).rowcount
@@ -0,0 +1,124 @@
+"""
+MyLedger - 资金流前缀和索引
+把转账按日期汇总为升序日期数组 + 入金 / 出金累计和，任意日期区间的资金流用二分查找 O(log n) 得出，
+不再查询 transfers 表；收益率引擎直接使用按估值日期查询的累计和（cumulative）；保存转账时增量更新
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from .models import get_session
+from . import summary
+
+
+class CashFlowIndex:
+    """按日期的入金 / 出金前缀和（线程安全）"""
+
+    def __init__(self, engine, ttl: Optional[float] = 600):
+        """
+        Args:
+            engine: 数据库引擎
+            ttl: 整体重新加载的间隔（秒），用于感知其他进程写入的转账；None 表示不过期
+        """
+        self.engine = engine
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._ordinals = []                  # 有转账的日期（ordinal，升序、唯一）
+        self._deposits = np.empty(0)         # 截至对应日期（含）的累计入金
+        self._withdrawals = np.empty(0)      # 截至对应日期（含）的累计出金
+
+    # ============ 加载 ============
+
+    def load(self):
+        """全量加载（一次按日期分组的查询）"""
+        session = get_session(self.engine)
+        try:
+            rows = summary.daily_transfer_flows(session)
+        finally:
+            session.close()
+
+        with self._lock:
+            self._ordinals = [d.toordinal() for d, _, _, _ in rows]
+            self._deposits = np.cumsum([dep for _, dep, _, _ in rows], dtype=float)
+            self._withdrawals = np.cumsum([wd for _, _, wd, _ in rows], dtype=float)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            expired = self.ttl is not None and self._loaded_at is not None and \
+                time.monotonic() - self._loaded_at > self.ttl
+            if self._loaded_at is None or expired:
+                self.load()
+
+    def add(self, transfer_date: date, transfer_type: str, amount_usd: float):
+        """
+        保存转账后增量更新：新日期插入一行，之后日期的累计和整体加上金额
+
+        Args:
+            transfer_date: 转账日期
+            transfer_type: 'deposit' / 'withdrawal'
+            amount_usd: 金额
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return  # 尚未加载，下次访问时会全量加载
+
+            ordinal = transfer_date.toordinal()
+            i = bisect_left(self._ordinals, ordinal)
+            if i == len(self._ordinals) or self._ordinals[i] != ordinal:
+                self._ordinals.insert(i, ordinal)
+                self._deposits = np.insert(self._deposits, i, self._deposits[i - 1] if i else 0.0)
+                self._withdrawals = np.insert(self._withdrawals, i, self._withdrawals[i - 1] if i else 0.0)
+
+            if transfer_type == 'deposit':
+                self._deposits[i:] += amount_usd
+            elif transfer_type == 'withdrawal':
+                self._withdrawals[i:] += amount_usd
+
+    # ============ 查询 ============
+
+    def _cumulative_at(self, ordinal: int) -> Tuple[float, float]:
+        """截至该日期（含）的累计入金、出金"""
+        i = bisect_right(self._ordinals, ordinal)
+        if i == 0:
+            return 0.0, 0.0
+        return float(self._deposits[i - 1]), float(self._withdrawals[i - 1])
+
+    def totals(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+               include_start: bool = True) -> Tuple[float, float]:
+        """
+        日期范围内的入金、出金合计（与 summary.transfer_totals 语义相同）
+
+        Args:
+            start_date: 起始日期，None 表示不限
+            end_date: 结束日期（含），None 表示不限
+            include_start: 是否包含起始日期当天（区间收益率计算用左开区间）
+
+        Returns:
+            (total_deposits, total_withdrawals)
+        """
+        self._ensure_loaded()
+        with self._lock:
+            end_dep, end_wd = self._cumulative_at(end_date.toordinal() if end_date else date.max.toordinal())
+            if start_date is None:
+                return end_dep, end_wd
+            start_dep, start_wd = self._cumulative_at(start_date.toordinal() - (1 if include_start else 0))
+        return end_dep - start_dep, end_wd - start_wd
+
+    def cumulative(self, dates: Iterable[date]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化查询：每个日期（含当天）之前的累计入金、出金
+
+        Returns:
+            (deposits, withdrawals) 两个与 dates 等长的数组
+        """
+        self._ensure_loaded()
+        ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+        with self._lock:
+            idx = np.searchsorted(np.array(self._ordinals, dtype=np.int64), ordinals, side='right')
+            deposits = np.concatenate([[0.0], self._deposits])[idx]
+            withdrawals = np.concatenate([[0.0], self._withdrawals])[idx]
+        return deposits, withdrawals
@@ -0,0 +1,162 @@
+"""
+MyLedger - 依赖跟踪的计算结果缓存
+每个缓存条目记录它依赖的表（以及日期范围 / 资产）和当时的表版本号；
+写入只递增被写表的版本并记下写入的起始日期和资产，命中检查时只有与条目范围重叠的写入才会使其失效；
+条目总数有上限，超出时按最近最少使用（LRU）淘汰
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from functools import wraps
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+# 每张表保留的写入记录条数，更早的写入视为与所有条目重叠
+MAX_WRITE_LOG = 1000
+
+# 缓存条目数上限（每个不同的参数组合一条，例如仪表盘请求的每个日期 / 区间）
+MAX_ENTRIES = 256
+
+
+@dataclass
+class _Write:
+    version: int
+    since: Optional[date]              # 受影响的最早日期，None 表示全部日期
+    keys: Optional[FrozenSet[str]]     # 受影响的资产，None 表示全部资产
+
+
+@dataclass
+class _Entry:
+    value: object
+    versions: Dict[str, int]           # 计算时各依赖表的版本
+    upto: Optional[date]               # 条目只依赖该日期及之前的数据，None 表示全部日期
+    keys: Optional[FrozenSet[str]]     # 条目只依赖这些资产，None 表示全部资产
+    stored_at: float = field(default_factory=time.monotonic)
+
+
+class DataCache:
+    """按表、日期范围和资产跟踪依赖的进程内缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        """
+        Args:
+            max_entries: 条目数上限，超出时淘汰最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._writes: Dict[str, List[_Write]] = defaultdict(list)
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+
+    # ============ 写入通知 ============
+
+    def invalidate(self, table: str, since: Optional[date] = None, keys: Optional[Iterable[str]] = None):
+        """
+        记录一次写入：递增表版本
+
+        Args:
+            table: 被写入的表名
+            since: 写入影响的最早日期（价格和持仓会向后延续，所以之后的日期也受影响）
+            keys: 写入涉及的资产，None 表示不限
+        """
+        with self._lock:
+            self._versions[table] += 1
+            log = self._writes[table]
+            log.append(_Write(self._versions[table], since, frozenset(keys) if keys is not None else None))
+            if len(log) > MAX_WRITE_LOG:
+                del log[:len(log) - MAX_WRITE_LOG]
+
+    def clear(self):
+        """丢弃所有条目（统计数据保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    # ============ 命中检查 ============
+
+    def _is_fresh(self, entry: _Entry, ttl: Optional[float]) -> bool:
+        if ttl is not None and time.monotonic() - entry.stored_at > ttl:
+            return False
+
+        for table, version in entry.versions.items():
+            if self._versions[table] == version:
+                continue
+            log = self._writes[table]
+            if not log or log[0].version > version + 1:
+                return False  # 写入记录已被截断，无法判断
+            for write in log:
+                if write.version <= version:
+                    continue
+                date_overlap = write.since is None or entry.upto is None or write.since <= entry.upto
+                key_overlap = write.keys is None or entry.keys is None or bool(write.keys & entry.keys)
+                if date_overlap and key_overlap:
+                    return False
+        return True
+
+    def cached(self, tables: Iterable[str], ttl: Optional[float] = None,
+               upto: Optional[Callable] = None, keys: Optional[Iterable[str]] = None):
+        """
+        缓存装饰器
+
+        Args:
+            tables: 函数结果依赖的表
+            ttl: 兜底过期时间（秒），用于感知其他进程的写入
+            upto: 可选，接收函数参数并返回结果依赖的最晚日期
+            keys: 可选，结果只依赖这些资产；也可以是接收函数参数并返回资产集合的函数
+
+        缓存的返回值在调用方之间共享，应视为只读。
+        """
+        tables = tuple(tables)
+        static_keys = frozenset(keys) if keys is not None and not callable(keys) else None
+
+        def decorator(func):
+            name = func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                cache_key = (name, args, tuple(sorted(kwargs.items())))
+                with self._lock:
+                    entry = self._entries.get(cache_key)
+                    if entry is not None and self._is_fresh(entry, ttl):
+                        self._entries.move_to_end(cache_key)
+                        self._hits[name] += 1
+                        return entry.value
+                    self._misses[name] += 1
+                    versions = {table: self._versions[table] for table in tables}
+
+                value = func(*args, **kwargs)
+                entry_keys = frozenset(keys(*args, **kwargs)) if callable(keys) else static_keys
+                with self._lock:
+                    self._entries[cache_key] = _Entry(
+                        value, versions, upto(*args, **kwargs) if upto else None, entry_keys
+                    )
+                    self._entries.move_to_end(cache_key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                return value
+            return wrapper
+        return decorator
+
+    # ============ 统计 ============
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各函数的命中 / 未命中次数"""
+        with self._lock:
+            names = set(self._hits) | set(self._misses)
+            return {n: {'hits': self._hits[n], 'misses': self._misses[n]} for n in sorted(names)}
+
+    def hit_rate(self) -> float:
+        """总体命中率（0-1），尚无调用时为 0"""
+        with self._lock:
+            hits = sum(self._hits.values())
+            total = hits + sum(self._misses.values())
+        return hits / total if total else 0.0
+
+
+# 进程级共享实例：Streamlit 每次 rerun 重新执行 app.py，但 src 模块只导入一次
+cache = DataCache()
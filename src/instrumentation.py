@@ -0,0 +1,170 @@
+"""
+MyLedger - SQL 查询监控
+在引擎上挂 before/after_cursor_execute 监听器，记录每条语句的耗时、行数和调用位置；
+按 Streamlit 的每次 rerun 汇总（线程本地），开启慢查询日志后超过阈值的语句追加写入日志文件
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _log_path(path: Optional[str]) -> Optional[str]:
+    """日志路径：未设置或为空表示不写文件；相对路径以项目根目录为基准（与启动时的当前目录无关）"""
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+# 慢查询阈值（毫秒）与日志文件，可用环境变量覆盖；日志文件默认不写，设置 MYLEDGER_SLOW_QUERY_LOG 后开启
+SLOW_QUERY_MS = float(os.getenv('MYLEDGER_SLOW_QUERY_MS', '200'))
+SLOW_QUERY_LOG = _log_path(os.getenv('MYLEDGER_SLOW_QUERY_LOG'))
+
+# 语句文本的最大保留长度
+MAX_STATEMENT_CHARS = 500
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    duration_ms: float
+    rows: Optional[int]        # 驱动未报告行数时为 None（如 SQLite 的 SELECT）
+    call_site: str
+
+
+def _call_site() -> str:
+    """调用栈中第一个位于项目内（且不是本模块）的帧 -> 'file.py:line in func'"""
+    frame = sys._getframe(2)
+    this_file = os.path.abspath(__file__)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PROJECT_ROOT) and filename != this_file and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class QueryMonitor:
+    """SQL 语句监控（线程安全）"""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, log_path: Optional[str] = SLOW_QUERY_LOG):
+        """
+        Args:
+            slow_ms: 慢查询阈值（毫秒）
+            log_path: 慢查询日志文件（JSON Lines），None 或空字符串表示不写文件；相对路径以项目根目录为基准
+        """
+        self.slow_ms = slow_ms
+        self.log_path = _log_path(log_path)
+        self.total_statements = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._engines = set()
+
+    # ============ 挂载 ============
+
+    def attach(self, engine):
+        """在引擎上注册监听器（同一引擎只注册一次）"""
+        with self._lock:
+            if id(engine) in self._engines:
+                return
+            self._engines.add(id(engine))
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    def _error(self, context):
+        starts = context.connection.info.get('_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_query_start')
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        rowcount = getattr(cursor, 'rowcount', -1)
+        record = QueryRecord(
+            statement=' '.join(statement.split())[:MAX_STATEMENT_CHARS],
+            duration_ms=duration_ms,
+            rows=rowcount if rowcount is not None and rowcount >= 0 else None,
+            call_site=_call_site(),
+        )
+
+        with self._lock:
+            self.total_statements += 1
+            self.total_ms += duration_ms
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            run.append(record)
+        if duration_ms >= self.slow_ms:
+            self._log_slow(record)
+
+    def _log_slow(self, record: QueryRecord):
+        if not self.log_path:
+            return
+        line = json.dumps({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(record.duration_ms, 2),
+            'rows': record.rows,
+            'call_site': record.call_site,
+            'statement': record.statement,
+        }, ensure_ascii=False)
+        try:
+            with self._lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"✗ [SQL] 写入慢查询日志 {self.log_path} 失败: {e}")
+
+    # ============ 按 rerun 汇总 ============
+
+    def start_run(self):
+        """开始记录当前线程的一次 rerun（丢弃上一次的记录）"""
+        self._local.run = []
+
+    def stop_run(self) -> List[QueryRecord]:
+        """结束当前线程的记录并返回本次 rerun 的全部语句"""
+        records = getattr(self._local, 'run', None) or []
+        self._local.run = None
+        return records
+
+    @staticmethod
+    def summarize(records: List[QueryRecord]) -> List[Dict]:
+        """
+        按 (调用位置, 语句) 汇总，按总耗时降序
+
+        Returns:
+            [{'call_site', 'statement', 'count', 'total_ms', 'max_ms', 'rows'}, ...]
+        """
+        groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': None})
+        for r in records:
+            g = groups[(r.call_site, r.statement)]
+            g['count'] += 1
+            g['total_ms'] += r.duration_ms
+            g['max_ms'] = max(g['max_ms'], r.duration_ms)
+            if r.rows is not None:
+                g['rows'] = (g['rows'] or 0) + r.rows
+        summary = [{'call_site': site, 'statement': stmt, **g} for (site, stmt), g in groups.items()]
+        return sorted(summary, key=lambda g: g['total_ms'], reverse=True)
+
+
+# 进程级共享实例：get_engine 创建的引擎都挂到这里
+monitor = QueryMonitor()
+
+
+def instrument(engine):
+    """为引擎挂载进程级的 SQL 监控"""
+    monitor.attach(engine)
+    return engine
@@ -20,6 +20,18 @@ SIDEBAR_STATS = "数据统计"
 STAT_SNAPSHOTS = "快照记录"
 STAT_TRANSFERS = "转账记录"
 STAT_PRICES = "价格记录"
+STAT_CACHE_HIT = "缓存命中率"
+REFRESH_STATUS = "🔄 价格每 {:.0f} 分钟自动刷新，上次: {}"
+REFRESH_PENDING = "进行中"
+SQL_DEBUG_TITLE = "🐢 SQL 调试"
+SQL_DEBUG_SUMMARY = "本次渲染 {} 条语句，共 {:.1f} ms"
+SQL_DEBUG_SLOW = "超过 {:.0f} ms 的语句写入 {}"
+SQL_CALL_SITE = "调用位置"
+SQL_COUNT = "次数"
+SQL_TOTAL_MS = "总耗时 (ms)"
+SQL_MAX_MS = "最大 (ms)"
+SQL_ROWS = "行数"
+SQL_STATEMENT = "语句"
 
 # Dashboard
 DASH_NO_DATA = "暂无快照数据，请先在数据录入页面添加快照"
@@ -55,6 +67,14 @@ TIME_PERIOD_ROI = "期间 ROI"
 TIME_APY = "年化收益率 APY"
 TIME_ANNUALIZED = "年化"
 TIME_HIGH_VOL = "高波动"
+TIME_SELECT_PERIOD = "选择区间"
+TIME_PERIODS = {'all': "全部", '7d': "7 天", '30d': "30 天", '90d': "90 天", '365d': "1 年"}
+TIME_TWR = "时间加权收益 TWR"
+TIME_TWR_HELP = "剔除入金 / 出金影响"
+TIME_IRR = "资金加权收益 IRR"
+TIME_IRR_HELP = "计入入金 / 出金时点"
+TIME_NA = "—"
+TIME_ROLLING_APY = "滚动 APY"
 
 # Charts
 CHART_ASSET_DIST = "资产分布"
@@ -72,6 +92,10 @@ CHART_ATL = "历史最低"
 CHART_GROWTH = "总增长"
 CHART_NEED_2 = "至少需要2个快照才能显示历史"
 CHART_NO_HISTORY = "暂无历史数据"
+BENCH_SELECT = "对比基准"
+BENCH_MISSING = "以下基准在该区间没有价格数据: {}"
+BENCH_BACKFILL = "📥 获取基准历史价格"
+BENCH_BACKFILL_NONE = "未能获取以下基准的历史价格: {}"
 
 # Holdings
 HOLDINGS_DETAIL = "持仓明细"
@@ -128,15 +152,26 @@ PRICE_MANUAL = "手动输入"
 PRICE_NO_SNAPSHOTS = "没有快照记录，请先添加快照"
 PRICE_FOUND_N = "找到 {} 个资产: {}"
 PRICE_SOURCE = "来源"
-PRICE_FROM_SNAPSHOTS = "从快照获取"
+PRICE_FROM_SNAPSHOTS = "持有且需更新"
 PRICE_CUSTOM = "自定义输入"
-PRICE_WILL_FETCH = "将获取 {} 个资产"
+PRICE_PLAN = "将获取 {} 个资产，跳过 {} 个（{} 分钟内已更新 {} 个，已不再持有 {} 个）"
+PRICE_PLAN_DETAILS = "刷新计划明细"
+PRICE_PLAN_STATUS = {'fetch': "待更新", 'fresh': "已是最新", 'not_held': "未持有"}
+PRICE_PLAN_COL_STATUS = "状态"
+PRICE_PLAN_COL_LATEST = "最新价格日期"
+PRICE_PLAN_COL_AGE = "更新于（分钟前）"
 PRICE_SYMBOLS_HINT = "每行输入一个代码"
 PRICE_FETCH = "获取价格"
 PRICE_NO_SYMBOLS = "没有要获取的资产"
 PRICE_FETCHING = "正在获取 {} 个资产的价格..."
 PRICE_UPDATED_N = "已更新 {} 个价格!"
 PRICE_FETCH_FAILED = "获取失败"
+PRICE_BACKFILL = "回填历史价格"
+PRICE_BACKFILL_HINT = "为缺少当日价格的历史快照日期批量获取收盘价（每个资产一次区间请求），仪表盘选中的对比基准一并回填"
+PRICE_BACKFILLING = "正在回填历史价格..."
+PRICE_BACKFILLED_N = "已回填 {} 条历史价格（{} 个资产）"
+PRICE_BACKFILL_NONE = "所有快照日期都已有价格"
+PRICE_BACKFILL_UNFILLED = "以下资产仍有日期未找到价格: {}"
 PRICE_SYMBOL = "代码"
 PRICE_PRICE = "价格 (USD)"
 PRICE_SAVE = "保存价格"
@@ -0,0 +1,132 @@
+"""
+MyLedger - 数据库结构迁移
+create_all 只会创建缺失的表，不会修改已有表；这里按版本号顺序执行增量迁移，
+已执行的版本记录在 schema_migrations 表中
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import Column, Integer, String, DateTime, text
+from .models import Base, Snapshot, PriceHistory, SymbolInfo
+from . import upsert
+
+
+class SchemaMigration(Base):
+    """迁移记录表 - 每个已执行的迁移版本一行"""
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """注册一个迁移函数，函数接收一个处于事务中的连接"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def _index(model, name):
+    return next(ix for ix in model.__table__.indexes if ix.name == name)
+
+
+@migration(1, "热点查询的复合覆盖索引")
+def _composite_indexes(conn):
+    _index(PriceHistory, 'ix_price_history_symbol_date').create(conn, checkfirst=True)
+    _index(Snapshot, 'ix_snapshots_account_date').create(conn, checkfirst=True)
+    
+    # 单列索引已被唯一索引 / 复合索引的前缀覆盖，删除以减少写入开销
+    for name in ('ix_price_history_symbol', 'ix_price_history_date', 'ix_snapshots_date'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+@migration(2, "重新解析仅按 CoinGecko 币种列表归为加密货币的资产")
+def _reresolve_coingecko_symbols(conn):
+    # 旧的解析规则把与 CoinGecko 币种重名的股票代码（SPY、AAPL 等）记成了加密货币，删除后按新规则重新解析
+    conn.execute(SymbolInfo.__table__.delete().where(SymbolInfo.provider == 'coingecko'))
+
+
+@migration(3, "补建自然键唯一索引（重复行备份后删除）")
+def _natural_key_indexes(conn):
+    # 新库由 create_all 直接建好唯一索引，这里只处理建表早于唯一索引的旧库
+    upsert.dedupe_and_index(conn, PriceHistory, upsert.PRICE_KEY)
+    upsert.dedupe_and_index(conn, Snapshot, upsert.SNAPSHOT_KEY)
+
+
+def upgrade(engine) -> List[int]:
+    """
+    建表，并执行所有未执行的迁移
+
+    Returns:
+        本次执行的迁移版本号列表
+    """
+    Base.metadata.create_all(engine)
+    
+    with engine.connect() as conn:
+        applied = {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+    
+    executed = []
+    for version, description, func in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        executed.append(version)
+        print(f"✓ [Migration] {version}: {description}")
+    return executed
+
+
+# ============ 索引使用检查 ============
+
+# 热点查询：(名称, SQL, 参数)
+HOT_QUERIES = [
+    (
+        "as-of 价格查询",
+        "SELECT price_usd FROM price_history WHERE symbol = :symbol AND date <= :date "
+        "ORDER BY date DESC LIMIT 1",
+        {'symbol': 'BTC', 'date': '2099-12-31'}
+    ),
+    (
+        "账户最近快照日期",
+        "SELECT date FROM snapshots WHERE account_name = :account ORDER BY date DESC LIMIT 1",
+        {'account': 'Binance'}
+    ),
+    (
+        "账户最近持仓明细",
+        "SELECT symbol, quantity FROM snapshots WHERE account_name = :account AND date = :date",
+        {'account': 'Binance', 'date': '2099-12-31'}
+    ),
+]
+
+
+def explain_hot_queries(engine) -> List[Tuple[str, bool, str]]:
+    """
+    对热点查询执行 EXPLAIN，判断是否走索引查找（而不是全表扫描）
+
+    Returns:
+        [(查询名称, 是否为索引查找, 执行计划文本)]
+    """
+    dialect = engine.dialect.name
+    results = []
+    with engine.connect() as conn:
+        for name, sql, params in HOT_QUERIES:
+            if dialect == 'sqlite':
+                rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+                plan = '\n'.join(row[-1] for row in rows)
+                ok = 'SEARCH' in plan and 'INDEX' in plan and 'SCAN' not in plan
+            else:
+                # 小表上规划器可能选择顺序扫描，这里关闭 seqscan 只验证索引是否可用
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                rows = conn.execute(text(f"EXPLAIN {sql}"), params).fetchall()
+                plan = '\n'.join(row[0] for row in rows)
+                ok = 'Index' in plan and 'Seq Scan' not in plan
+            results.append((name, ok, plan))
+    return results
@@ -2,10 +2,11 @@
 MyLedger - 数据模型定义
 使用 SQLAlchemy ORM 定义三张核心表
 """
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, create_engine
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+from . import instrumentation
 
 Base = declarative_base()
 
@@ -13,9 +14,13 @@ Base = declarative_base()
 class Snapshot(Base):
     """资产快照表 - 记录每次盘点的持仓数量"""
     __tablename__ = 'snapshots'
+    __table_args__ = (
+        # 自然键：同一天同一账户同一资产只有一行（批量 upsert 依赖此索引）
+        Index('uq_snapshots_date_account_symbol', 'date', 'account_name', 'symbol', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(Date, nullable=False, index=True)
+    date = Column(Date, nullable=False)
     account_name = Column(String(100), nullable=False)  # 例如: Binance, OKX, IBKR
     symbol = Column(String(50), nullable=False)         # 例如: BTC, AAPL, USDT
     quantity = Column(Float, nullable=False)            # 持仓数量
@@ -25,6 +30,10 @@ class Snapshot(Base):
         return f"<Snapshot(date={self.date}, account={self.account_name}, symbol={self.symbol}, qty={self.quantity})>"
 
 
+# 按账户取最近持仓：WHERE account_name = ? ORDER BY date DESC（覆盖索引）
+Index('ix_snapshots_account_date', Snapshot.account_name, Snapshot.date, Snapshot.symbol, Snapshot.quantity)
+
+
 class Transfer(Base):
     """资金流水表 - 记录外部资金进出（存入/提取）"""
     __tablename__ = 'transfers'
@@ -43,10 +52,14 @@ class Transfer(Base):
 class PriceHistory(Base):
     """价格历史表 - 存储各资产的历史价格"""
     __tablename__ = 'price_history'
+    __table_args__ = (
+        # 自然键：同一天同一资产只有一个价格（批量 upsert 依赖此索引）
+        Index('uq_price_history_date_symbol', 'date', 'symbol', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(Date, nullable=False, index=True)
-    symbol = Column(String(50), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    symbol = Column(String(50), nullable=False)
     price_usd = Column(Float, nullable=False)
     source = Column(String(50), nullable=True)  # 价格来源: yfinance, ccxt, coingecko
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -55,6 +68,41 @@ class PriceHistory(Base):
         return f"<PriceHistory(date={self.date}, symbol={self.symbol}, price=${self.price_usd})>"
 
 
+# as-of 价格查询：WHERE symbol = ? AND date <= ? ORDER BY date DESC LIMIT 1（覆盖索引）
+Index('ix_price_history_symbol_date', PriceHistory.symbol, PriceHistory.date.desc(), PriceHistory.price_usd)
+
+
+class DailyValuation(Base):
+    """每日估值表 - 物化的逐账户、逐资产市值，供净值历史直接读取"""
+    __tablename__ = 'daily_valuation'
+    
+    date = Column(Date, primary_key=True)
+    account_name = Column(String(100), primary_key=True)
+    symbol = Column(String(50), primary_key=True)
+    quantity = Column(Float, nullable=False)
+    price_usd = Column(Float, nullable=False)   # 当日或之前最近一次价格，缺失为 0
+    value_usd = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DailyValuation(date={self.date}, account={self.account_name}, symbol={self.symbol}, value=${self.value_usd})>"
+
+
+class SymbolInfo(Base):
+    """资产解析表 - 记录每个资产的类型、价格数据源及其在数据源中的 ID（含查不到报价的负结果）"""
+    __tablename__ = 'symbols'
+    
+    symbol = Column(String(50), primary_key=True)
+    asset_class = Column(String(20), nullable=False)   # crypto / stock / unpriceable
+    provider = Column(String(20), nullable=True)       # 首选数据源: ccxt, coingecko, yfinance；无报价为空
+    provider_id = Column(String(100), nullable=True)   # 首选数据源中的 ID，例如 BTC/USDT、NVDA
+    coingecko_id = Column(String(100), nullable=True)  # CoinGecko ID（加密货币的备用数据源）
+    checked_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SymbolInfo(symbol={self.symbol}, class={self.asset_class}, provider={self.provider})>"
+
+
 def get_engine(db_url='local_ledger.db'):
     """创建数据库引擎，支持 SQLite 和 PostgreSQL"""
     if "://" in db_url:
@@ -68,7 +116,7 @@ def get_engine(db_url='local_ledger.db'):
             db_url += f"{separator}sslmode=require"
         
         # 增加连接池配置
-        return create_engine(
+        engine = create_engine(
             db_url, 
             echo=False,
             pool_pre_ping=True,
@@ -80,7 +128,10 @@ def get_engine(db_url='local_ledger.db'):
                 "sslmode": "require"
             }
         )
-    return create_engine(f'sqlite:///{db_url}', echo=False)
+    else:
+        engine = create_engine(f'sqlite:///{db_url}', echo=False)
+    # SQL 语句耗时 / 行数 / 调用位置监控
+    return instrumentation.instrument(engine)
 
 
 def get_session(engine):
@@ -0,0 +1,178 @@
+"""
+MyLedger - 价格矩阵缓存
+把 price_history 一次性加载为 日期 × 资产 的前向填充 NumPy 矩阵，as-of 查询为 O(1) 下标访问；
+价格写入后只重新加载受影响资产的列
+"""
+import threading
+import time
+from datetime import date
+from typing import Dict, Iterable, Optional
+import numpy as np
+from .models import get_session, PriceHistory
+
+
+def _forward_fill(rows: np.ndarray, prices: np.ndarray, n_rows: int) -> np.ndarray:
+    """在长度为 n_rows 的列上放置 (rows, prices) 并向后延续，首个价格之前为 NaN"""
+    column = np.full(n_rows, np.nan)
+    column[rows] = prices
+    filled_idx = np.where(np.isnan(column), 0, np.arange(n_rows))
+    np.maximum.accumulate(filled_idx, out=filled_idx)
+    return column[filled_idx]
+
+
+class PriceMatrix:
+    """日期 × 资产的前向填充价格矩阵（线程安全）"""
+
+    def __init__(self, engine, ttl: Optional[float] = 600):
+        """
+        Args:
+            engine: 数据库引擎
+            ttl: 整体重新加载的间隔（秒），用于感知其他进程写入的价格；None 表示不过期
+        """
+        self.engine = engine
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._start = 0                      # 第 0 行对应日期的 ordinal
+        self._values = np.empty((0, 0))      # shape: (日期数, 资产数)
+        self._columns: Dict[str, int] = {}
+
+    # ============ 加载 ============
+
+    def _query(self, symbols: Optional[Iterable[str]] = None):
+        session = get_session(self.engine)
+        try:
+            query = session.query(PriceHistory.date, PriceHistory.symbol, PriceHistory.price_usd)
+            if symbols is not None:
+                query = query.filter(PriceHistory.symbol.in_(sorted(symbols)))
+            # 同一天多条记录时后写入的覆盖先写入的
+            return query.order_by(PriceHistory.date, PriceHistory.id).all()
+        finally:
+            session.close()
+
+    @staticmethod
+    def _group(records):
+        """按资产分组 -> {symbol: (ordinals, prices)}"""
+        grouped = {}
+        for d, symbol, price in records:
+            ordinals, prices = grouped.setdefault(symbol, ([], []))
+            ordinals.append(d.toordinal())
+            prices.append(price)
+        return {s: (np.array(o, dtype=np.int64), np.array(p, dtype=float)) for s, (o, p) in grouped.items()}
+
+    def load(self):
+        """全量加载（一次查询）"""
+        grouped = self._group(self._query())
+        with self._lock:
+            if grouped:
+                self._start = min(o.min() for o, _ in grouped.values())
+                end = max(o.max() for o, _ in grouped.values())
+            else:
+                self._start, end = 0, -1
+            n_rows = end - self._start + 1
+
+            self._columns = {symbol: i for i, symbol in enumerate(sorted(grouped))}
+            self._values = np.empty((n_rows, len(self._columns)))
+            for symbol, (ordinals, prices) in grouped.items():
+                self._values[:, self._columns[symbol]] = _forward_fill(ordinals - self._start, prices, n_rows)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            expired = self.ttl is not None and self._loaded_at is not None and \
+                time.monotonic() - self._loaded_at > self.ttl
+            if self._loaded_at is None or expired:
+                self.load()
+
+    def _resize(self, start: int, end: int):
+        """扩展日期范围以覆盖 [start, end]：前面补 NaN，后面沿用最后一行（前向填充）"""
+        n_rows, n_cols = self._values.shape
+        if n_rows == 0:
+            self._start = start
+            self._values = np.full((end - start + 1, n_cols), np.nan)
+            return
+
+        last = self._start + n_rows - 1
+        head = np.full((max(0, self._start - start), n_cols), np.nan)
+        tail = np.repeat(self._values[-1:], max(0, end - last), axis=0)
+        self._values = np.vstack([head, self._values, tail])
+        self._start = min(self._start, start)
+
+    def invalidate(self, symbols: Iterable[str]):
+        """价格写入后只重新加载这些资产的列（一次查询），日期范围不足时扩展矩阵"""
+        symbols = set(symbols)
+        if not symbols:
+            return
+
+        with self._lock:
+            if self._loaded_at is None:
+                return  # 尚未加载，下次访问时会全量加载
+
+            grouped = self._group(self._query(symbols))
+            if grouped:
+                self._resize(min(o.min() for o, _ in grouped.values()),
+                             max(o.max() for o, _ in grouped.values()))
+            n_rows = self._values.shape[0]
+
+            new_symbols = sorted(symbols - self._columns.keys())
+            if new_symbols:
+                for symbol in new_symbols:
+                    self._columns[symbol] = len(self._columns)
+                self._values = np.hstack([self._values, np.full((n_rows, len(new_symbols)), np.nan)])
+
+            for symbol in symbols:
+                col = self._columns[symbol]
+                if symbol in grouped:
+                    ordinals, prices = grouped[symbol]
+                    self._values[:, col] = _forward_fill(ordinals - self._start, prices, n_rows)
+                else:
+                    self._values[:, col] = np.nan
+
+    # ============ 查询 ============
+
+    def get(self, symbol: str, target_date: date) -> Optional[float]:
+        """当日或之前最近一次价格，没有则返回 None"""
+        self._ensure_loaded()
+        with self._lock:
+            col = self._columns.get(symbol)
+            n_rows = self._values.shape[0]
+            row = target_date.toordinal() - self._start
+            if col is None or row < 0 or n_rows == 0:
+                return None
+            price = self._values[min(row, n_rows - 1), col]
+        return None if np.isnan(price) else float(price)
+
+    def latest(self, symbol: str) -> Optional[float]:
+        """最近一次价格"""
+        self._ensure_loaded()
+        with self._lock:
+            col = self._columns.get(symbol)
+            if col is None or self._values.shape[0] == 0:
+                return None
+            price = self._values[-1, col]
+        return None if np.isnan(price) else float(price)
+
+    def lookup(self, symbols, dates) -> np.ndarray:
+        """
+        向量化 as-of 查询
+
+        Args:
+            symbols: 资产符号序列
+            dates: 与 symbols 等长的日期序列
+
+        Returns:
+            价格数组，缺失为 NaN
+        """
+        self._ensure_loaded()
+        with self._lock:
+            n_rows = self._values.shape[0]
+            result = np.full(len(symbols), np.nan)
+            if n_rows == 0 or len(symbols) == 0:
+                return result
+
+            cols = np.array([self._columns.get(s, -1) for s in symbols])
+            rows = np.array([d.toordinal() for d in dates], dtype=np.int64) - self._start
+            valid = (cols >= 0) & (rows >= 0)
+            rows = np.minimum(rows, n_rows - 1)
+            result[valid] = self._values[rows[valid], cols[valid]]
+        return result
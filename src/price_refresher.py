@@ -0,0 +1,200 @@
+"""
+MyLedger - 后台价格刷新
+按固定间隔获取当前持有资产的最新价格，经 update_price_history_db 批量 upsert 并重算当日估值，
+仪表盘读取的始终是已写入数据库的价格，不在页面渲染时等待网络请求；
+刷新计划只包含仍持有且价格已过期的资产
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from .models import get_session, Snapshot
+from . import price_service
+from . import summary
+from . import valuation
+from .symbol_registry import SymbolRegistry
+
+
+# 默认刷新间隔（分钟）
+DEFAULT_INTERVAL_MINUTES = 15
+
+# 最短刷新间隔（分钟），避免配置错误时频繁请求数据源
+MIN_INTERVAL_MINUTES = 1
+
+# 手动刷新时价格的有效期（分钟），更新时间在此之内的资产不再请求
+DEFAULT_MAX_AGE_MINUTES = 15
+
+
+# ============ 刷新计划 ============
+
+@dataclass
+class RefreshPlan:
+    fetch: List[str]                 # 仍持有且价格已过期（或从未有价格）的资产
+    fresh: List[str]                 # 仍持有且 max_age_minutes 内已更新的资产
+    not_held: List[str]              # 出现在快照中但当前未持有的资产
+    max_age_minutes: float
+    latest: Dict[str, Tuple[date, datetime]] = field(default_factory=dict)  # 持有资产最新价格的 (日期, 写入时间 UTC)
+    error: Optional[str] = None      # 生成计划失败时的错误信息（此时各列表为空）
+
+    @classmethod
+    def failed(cls, max_age_minutes: float, error: str) -> 'RefreshPlan':
+        """生成计划失败（例如数据库连接断开）时的空计划：不获取、不跳过任何资产"""
+        return cls(fetch=[], fresh=[], not_held=[], max_age_minutes=max_age_minutes, error=error)
+
+    @property
+    def held(self) -> List[str]:
+        return sorted(self.fetch + self.fresh)
+
+    @property
+    def skipped(self) -> int:
+        return len(self.fresh) + len(self.not_held)
+
+    def print_summary(self):
+        """打印刷新计划"""
+        if self.error is not None:
+            print(f"📋 刷新计划生成失败: {self.error}")
+            return
+        print(f"📋 刷新计划: 持有 {len(self.held)} 个资产，获取 {len(self.fetch)} 个，跳过 {self.skipped} 个"
+              f"（{self.max_age_minutes:g} 分钟内已更新 {len(self.fresh)} 个，已不再持有 {len(self.not_held)} 个）")
+
+
+def plan_refresh(session, max_age_minutes: float = DEFAULT_MAX_AGE_MINUTES,
+                 now: Optional[datetime] = None) -> RefreshPlan:
+    """
+    生成刷新计划：最新估值日期上仍持有的资产，与各资产最新一条价格的写入时间取交集
+
+    今天已有价格且写入时间在 max_age_minutes 之内的资产跳过，其余（包括只有历史价格的）需要获取
+
+    Args:
+        session: 数据库会话
+        max_age_minutes: 价格的有效期（分钟）
+        now: 当前 UTC 时间（默认 datetime.utcnow()）
+
+    Returns:
+        RefreshPlan
+    """
+    now = now or datetime.utcnow()
+    max_age = timedelta(minutes=max_age_minutes)
+    today = date.today()
+
+    held = valuation.held_symbols(session)
+    latest = {symbol: (price_date, created_at) for symbol, price_date, created_at in summary.latest_prices(session, held)}
+    fresh = [
+        s for s in held
+        if s in latest and latest[s][0] >= today and latest[s][1] is not None and now - latest[s][1] < max_age
+    ]
+    all_symbols = {symbol for (symbol,) in session.query(Snapshot.symbol).distinct()}
+    return RefreshPlan(
+        fetch=[s for s in held if s not in fresh],
+        fresh=fresh,
+        not_held=sorted(all_symbols - set(held)),
+        max_age_minutes=max_age_minutes,
+        latest=latest,
+    )
+
+
+class PriceRefresher:
+    """后台价格刷新线程"""
+
+    def __init__(self, engine, interval_minutes: float = DEFAULT_INTERVAL_MINUTES,
+                 service: Optional[price_service.PriceService] = None,
+                 on_update: Optional[Callable[[List[str]], None]] = None):
+        """
+        Args:
+            engine: 数据库引擎
+            interval_minutes: 刷新间隔（分钟）
+            service: 可选的 PriceService（与页面共享时报价缓存也共享）
+            on_update: 写入价格后的回调，参数为本次刷新的资产（用于失效进程内缓存）
+        """
+        self.engine = engine
+        self.interval = max(interval_minutes, MIN_INTERVAL_MINUTES) * 60
+        self.service = service
+        self.on_update = on_update
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {'runs': 0, 'last_run': None, 'last_symbols': 0, 'last_skipped': 0, 'last_rows': 0,
+                        'last_error': None}
+
+    # ============ 单次刷新 ============
+
+    def run_once(self) -> int:
+        """
+        刷新一次：生成刷新计划 -> 获取仍持有且已过期的资产 -> upsert -> 回调
+
+        半个刷新间隔内已被其他途径（例如价格页面）更新过的资产本轮跳过；
+        生成计划或获取失败时记录到 last_error，下一轮照常重试
+
+        Returns:
+            写入的价格条数
+        """
+        plan = self._plan()
+        plan.print_summary()
+        symbols = plan.fetch
+
+        rows = 0
+        error = plan.error
+        try:
+            if symbols:
+                self.service = self.service or price_service.PriceService(registry=SymbolRegistry(self.engine))
+                rows = price_service.update_price_history_db(symbols, engine=self.engine, service=self.service)
+                if self.on_update is not None:
+                    self.on_update(symbols)
+        except Exception as e:
+            error = str(e)
+            print(f"✗ [价格刷新] 失败: {e}")
+
+        with self._lock:
+            self._status.update(
+                runs=self._status['runs'] + 1, last_run=datetime.now(),
+                last_symbols=len(symbols), last_skipped=plan.skipped, last_rows=rows, last_error=error
+            )
+        return rows
+
+    def _plan(self) -> RefreshPlan:
+        """生成本轮刷新计划；数据库读取失败时返回 RefreshPlan.failed，由 run_once 记录到 last_error"""
+        max_age_minutes = self.interval / 60 / 2
+        try:
+            session = get_session(self.engine)
+            try:
+                return plan_refresh(session, max_age_minutes=max_age_minutes)
+            finally:
+                session.close()
+        except Exception as e:
+            return RefreshPlan.failed(max_age_minutes, str(e))
+
+    # ============ 后台线程 ============
+
+    def _loop(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.run_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """启动后台线程（守护线程，启动后立即刷新一次）；已在运行时不重复启动"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='price-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程（正在进行的刷新会先完成）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict:
+        """
+        刷新状态
+
+        Returns:
+            {'running', 'interval_minutes', 'runs', 'last_run', 'last_symbols', 'last_skipped', 'last_rows', 'last_error'}
+        """
+        with self._lock:
+            return {'running': self.is_running(), 'interval_minutes': self.interval / 60, **self._status}
@@ -2,19 +2,64 @@
 MyLedger - Price Service Module
 """
 import time
-from datetime import date, datetime
-from typing import Dict, List, Optional
-import yfinance as yf
-import ccxt
-from pycoingecko import CoinGeckoAPI
-from .models import get_engine, get_session, PriceHistory
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from sqlalchemy import and_
+from .models import get_engine, get_session, PriceHistory, DailyValuation
+from . import valuation
+from . import upsert
+from . import migrations
+from .quote_cache import get_quote_cache
+from .provider_router import ProviderRouter, PROVIDER_NAMES
+from .symbol_registry import SymbolRegistry, CRYPTO
+
+
+# ============ 数据源后端（按需导入） ============
+# yfinance / ccxt / pycoingecko 导入耗时约 1 秒，只在第一次真正请求价格时加载，
+# 仅查看仪表盘的启动和不联网的工具不必承担这部分开销
+
+def _yf():
+    """导入并返回 yfinance 模块"""
+    import yfinance
+    return yfinance
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全），替代固定的 sleep 间隔"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数），默认等于 rate 且至少为 1
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """取走一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
 
 
 class PriceService:
     """价格获取服务类"""
     
-    # 常见加密货币符号
+    # 常见加密货币符号（没有资产解析注册表，或注册表无法解析时使用）
     CRYPTO_SYMBOLS = {
         'BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'ADA', 'DOGE', 'AVAX', 
         'DOT', 'MATIC', 'LINK', 'UNI', 'ATOM', 'LTC', 'ETC', 'BCH',
@@ -25,23 +70,192 @@ class PriceService:
     # 稳定币（价格固定为 1.0）
     STABLECOINS = {'USDT', 'USDC', 'DAI', 'BUSD', 'TUSD', 'USDP', 'FDUSD'}
     
-    def __init__(self, retry_count=3, retry_delay=2):
+    # CoinGecko ID 映射（常见币种；币种列表中同一符号对应多个币时以此为准）
+    COINGECKO_IDS = {
+        'BTC': 'bitcoin',
+        'ETH': 'ethereum',
+        'SOL': 'solana',
+        'BNB': 'binancecoin',
+        'XRP': 'ripple',
+        'ADA': 'cardano',
+        'DOGE': 'dogecoin',
+        'AVAX': 'avalanche-2',
+        'DOT': 'polkadot',
+        'MATIC': 'matic-network',
+        'LINK': 'chainlink',
+        'UNI': 'uniswap',
+        'ATOM': 'cosmos',
+        'LTC': 'litecoin',
+    }
+    
+    # 各类资产可用的数据源（按默认优先级）
+    CRYPTO_PROVIDERS = ('ccxt', 'coingecko')
+    STOCK_PROVIDERS = ('yfinance',)
+    
+    # 各数据源的并发上限与限流速率（请求/秒）
+    PROVIDER_LIMITS = {
+        'ccxt': {'concurrency': 8, 'rate': 10.0},
+        'coingecko': {'concurrency': 2, 'rate': 0.5},   # 免费版约 30 次/分钟
+        'yfinance': {'concurrency': 4, 'rate': 4.0},
+    }
+    
+    def __init__(self, retry_count=3, retry_delay=2, max_workers=8, provider_limits=None, quote_cache=None,
+                 router=None, registry: Optional[SymbolRegistry] = None):
         """
         初始化价格服务
         
         Args:
-            retry_count: 重试次数
-            retry_delay: 重试延迟（秒）
+            retry_count: 每个数据源的最多尝试次数
+            retry_delay: 重试退避的基准时间（秒），第 n 次重试最多等待 retry_delay * 2^n
+            max_workers: 并发获取时的线程数
+            provider_limits: 覆盖 PROVIDER_LIMITS 的配置
+            quote_cache: 报价缓存，默认使用进程内共享的 QuoteCache
+            router: 数据源路由 / 熔断器，默认每个 PriceService 一个
+            registry: 资产解析注册表，None 时按 CRYPTO_SYMBOLS / COINGECKO_IDS 静态分类
         """
         self.retry_count = retry_count
         self.retry_delay = retry_delay
-        self.binance = ccxt.binance()
-        self.coingecko = CoinGeckoAPI()
+        self.max_workers = max_workers
+        self.quote_cache = quote_cache if quote_cache is not None else get_quote_cache()
+        self.router = router if router is not None else ProviderRouter()
+        self.registry = registry
+        self._binance = None
+        self._coingecko = None
+        self._client_lock = threading.Lock()
         
+        limits = dict(self.PROVIDER_LIMITS)
+        limits.update(provider_limits or {})
+        self._semaphores = {name: threading.BoundedSemaphore(cfg['concurrency']) for name, cfg in limits.items()}
+        self._buckets = {name: TokenBucket(cfg['rate']) for name, cfg in limits.items()}
+    
+    @property
+    def binance(self):
+        """Binance 客户端（首次使用时创建）"""
+        if self._binance is None:
+            with self._client_lock:
+                if self._binance is None:
+                    import ccxt
+                    self._binance = ccxt.binance()
+        return self._binance
+    
+    @property
+    def coingecko(self):
+        """CoinGecko 客户端（首次使用时创建）"""
+        if self._coingecko is None:
+            with self._client_lock:
+                if self._coingecko is None:
+                    from pycoingecko import CoinGeckoAPI
+                    self._coingecko = CoinGeckoAPI()
+        return self._coingecko
+    
+    def _call_provider(self, provider: str, func: Callable, *args):
+        """在数据源的并发上限和令牌桶限流下调用 func，并把结果（是否抛出异常）和耗时记入路由"""
+        with self._semaphores[provider]:
+            self._buckets[provider].acquire()
+            start = time.perf_counter()
+            try:
+                result = func(*args)
+            except Exception:
+                self.router.record(provider, False, time.perf_counter() - start)
+                raise
+            self.router.record(provider, True, time.perf_counter() - start)
+            return result
+        
+    # ============ 资产分类与路由 ============
+    
+    def _entry(self, symbol: str):
+        """注册表中的路由记录；没有注册表、没有记录或记录为负结果时返回 None（按静态分类）"""
+        entry = self.registry.get(symbol) if self.registry is not None else None
+        return entry if entry is not None and entry.providers else None
+    
     def _is_crypto(self, symbol: str) -> bool:
         """判断是否为加密货币"""
+        entry = self._entry(symbol)
+        if entry is not None:
+            return entry.asset_class == CRYPTO
         return symbol.upper() in self.CRYPTO_SYMBOLS
     
+    def _providers(self, symbol: str) -> Tuple[str, ...]:
+        """资产可用的数据源（按默认优先级）：有解析记录时按记录路由，否则按静态分类"""
+        entry = self._entry(symbol)
+        if entry is not None:
+            return entry.providers
+        return self.CRYPTO_PROVIDERS if self._is_crypto(symbol) else self.STOCK_PROVIDERS
+    
+    def _coingecko_id(self, symbol: str) -> Optional[str]:
+        """资产的 CoinGecko ID"""
+        entry = self._entry(symbol)
+        if entry is not None:
+            return entry.coingecko_id
+        return self.COINGECKO_IDS.get(symbol.upper())
+    
+    def _load_symbol_catalog(self):
+        """
+        获取 Binance 交易对列表和 CoinGecko 币种列表（供注册表解析新资产）
+        
+        Returns:
+            (有 /USDT 交易对的币种集合, {币种: CoinGecko ID})，获取失败或熔断中的部分为 None；
+            币种列表中同一符号对应多个币时只采用 COINGECKO_IDS 中的映射
+        """
+        markets = coins = None
+        if self.router.allow('ccxt'):
+            try:
+                pairs = self._call_provider('ccxt', self.binance.load_markets)
+                markets = {pair.partition('/')[0] for pair in pairs if pair.endswith('/USDT')}
+            except Exception as e:
+                print(f"✗ [CCXT Binance] 交易对列表获取失败: {e}")
+        if self.router.allow('coingecko'):
+            try:
+                ids = {}
+                for coin in self._call_provider('coingecko', self.coingecko.get_coins_list):
+                    ids.setdefault(coin['symbol'].upper(), set()).add(coin['id'])
+                coins = {symbol: next(iter(found)) for symbol, found in ids.items() if len(found) == 1}
+                coins.update(self.COINGECKO_IDS)
+            except Exception as e:
+                print(f"✗ [CoinGecko] 币种列表获取失败: {e}")
+        print(f"📚 [Symbols] 交易对列表 {len(markets) if markets is not None else '-'} 个币种，"
+              f"CoinGecko 币种列表 {len(coins) if coins is not None else '-'} 个")
+        return markets, coins
+    
+    def _priceable(self, symbols: List[str]) -> List[str]:
+        """
+        经注册表解析资产（新资产才会请求交易对 / 币种列表），去掉已知无报价的资产
+        
+        Args:
+            symbols: 大写资产符号（不含稳定币）
+        """
+        if self.registry is None or not symbols:
+            return symbols
+        self.registry.resolve(symbols, self._load_symbol_catalog,
+                              known_crypto=self.CRYPTO_SYMBOLS | set(self.COINGECKO_IDS))
+        skipped = [s for s in symbols if self.registry.is_unpriceable(s)]
+        if skipped:
+            print(f"⊘ [Symbols] 已知无报价，跳过: {', '.join(skipped)}")
+        return [s for s in symbols if s not in skipped]
+    
+    def _mark_unpriceable(self, symbols: List[str]):
+        """记录所有数据源都没有数据的资产（需要注册表）"""
+        if self.registry is not None and symbols:
+            self.registry.mark_unpriceable(symbols)
+    
+    def _route_to_fallback(self, symbol: str, provider: str, missed: Iterable[str]):
+        """首选数据源确认没有数据、CoinGecko 给出价格时，记录改为直接路由到 CoinGecko（需要注册表）"""
+        entry = self._entry(symbol)
+        if provider == 'coingecko' and entry is not None and entry.provider in missed:
+            self.registry.route_to_coingecko(symbol)
+    
+    def _confirm_fallback(self, symbol: str, preferred: str):
+        """批量结果中缺失不能确认没有数据（可能是部分失败或限流），用一次逐个请求确认后再改路由"""
+        if not self.router.allow(preferred):
+            return
+        try:
+            price = self._call_provider(preferred, self._quote_fetchers()[preferred], symbol)
+        except Exception as e:
+            print(f"✗ [{PROVIDER_NAMES[preferred]}] {symbol} 确认请求失败: {e}")
+            return
+        if price is None:
+            self._route_to_fallback(symbol, 'coingecko', (preferred,))
+    
     def _is_stablecoin(self, symbol: str) -> bool:
         """判断是否为稳定币"""
         return symbol.upper() in self.STABLECOINS
@@ -54,17 +268,16 @@ class PriceService:
             symbol: 加密货币符号（如 BTC, ETH）
             
         Returns:
-            价格（USDT），失败返回 None
+            价格（USDT），交易对未上架时返回 None；请求失败时抛出异常
         """
-        try:
-            trading_pair = f"{symbol.upper()}/USDT"
-            ticker = self.binance.fetch_ticker(trading_pair)
-            price = ticker['last']
-            print(f"✓ [CCXT Binance] {symbol}: ${price:,.2f}")
-            return float(price)
-        except Exception as e:
-            print(f"✗ [CCXT Binance] {symbol} 获取失败: {e}")
+        trading_pair = f"{symbol.upper()}/USDT"
+        if trading_pair not in self.binance.load_markets():
+            print(f"⊘ [CCXT Binance] {trading_pair} 未上架")
             return None
+        
+        price = self.binance.fetch_ticker(trading_pair)['last']
+        print(f"✓ [CCXT Binance] {symbol}: ${price:,.2f}")
+        return float(price)
     
     def _fetch_crypto_price_coingecko(self, symbol: str) -> Optional[float]:
         """
@@ -74,39 +287,19 @@ class PriceService:
             symbol: 加密货币符号
             
         Returns:
-            价格（USD），失败返回 None
+            价格（USD），没有映射或无报价时返回 None；请求失败时抛出异常
         """
-        try:
-            # CoinGecko ID 映射（常见币种）
-            symbol_to_id = {
-                'BTC': 'bitcoin',
-                'ETH': 'ethereum',
-                'SOL': 'solana',
-                'BNB': 'binancecoin',
-                'XRP': 'ripple',
-                'ADA': 'cardano',
-                'DOGE': 'dogecoin',
-                'AVAX': 'avalanche-2',
-                'DOT': 'polkadot',
-                'MATIC': 'matic-network',
-                'LINK': 'chainlink',
-                'UNI': 'uniswap',
-                'ATOM': 'cosmos',
-                'LTC': 'litecoin',
-            }
-            
-            coin_id = symbol_to_id.get(symbol.upper())
-            if not coin_id:
-                print(f"✗ [CoinGecko] {symbol} 未找到映射")
-                return None
-            
-            data = self.coingecko.get_price(ids=coin_id, vs_currencies='usd')
-            price = data[coin_id]['usd']
-            print(f"✓ [CoinGecko] {symbol}: ${price:,.2f}")
-            return float(price)
-        except Exception as e:
-            print(f"✗ [CoinGecko] {symbol} 获取失败: {e}")
+        coin_id = self._coingecko_id(symbol)
+        if not coin_id:
+            print(f"⊘ [CoinGecko] {symbol} 未找到映射")
             return None
+        
+        price = (self.coingecko.get_price(ids=coin_id, vs_currencies='usd').get(coin_id) or {}).get('usd')
+        if price is None:
+            print(f"⊘ [CoinGecko] {symbol} 无报价")
+            return None
+        print(f"✓ [CoinGecko] {symbol}: ${price:,.2f}")
+        return float(price)
     
     def _fetch_stock_price_yfinance(self, symbol: str) -> Optional[float]:
         """
@@ -116,22 +309,286 @@ class PriceService:
             symbol: 股票代码（如 NVDA, AAPL）
             
         Returns:
-            价格（USD），失败返回 None
+            价格（USD），无数据时返回 None；请求失败时抛出异常
         """
-        try:
-            ticker = yf.Ticker(symbol.upper())
-            data = ticker.history(period='1d')
-            
-            if data.empty:
-                print(f"✗ [yfinance] {symbol} 无数据")
-                return None
+        data = _yf().Ticker(symbol.upper()).history(period='1d')
+        if data.empty:
+            print(f"⊘ [yfinance] {symbol} 无数据")
+            return None
+        
+        price = data['Close'].iloc[-1]
+        print(f"✓ [yfinance] {symbol}: ${price:,.2f}")
+        return float(price)
+    
+    # ============ 批量接口：每个数据源一次请求 ============
+    
+    @staticmethod
+    def _parse_ccxt_tickers(tickers: Dict) -> Dict[str, float]:
+        """解析 binance.fetch_tickers 的返回值 -> {symbol: price}"""
+        prices = {}
+        for pair, ticker in tickers.items():
+            base, _, quote = pair.partition('/')
+            if quote == 'USDT' and ticker and ticker.get('last') is not None:
+                prices[base] = float(ticker['last'])
+        return prices
+    
+    @staticmethod
+    def _parse_coingecko_prices(data: Dict, symbol_ids: Dict[str, str]) -> Dict[str, float]:
+        """解析 CoinGecko get_price 的返回值 -> {symbol: price}"""
+        prices = {}
+        for symbol, coin_id in symbol_ids.items():
+            price = (data.get(coin_id) or {}).get('usd')
+            if price is not None:
+                prices[symbol] = float(price)
+        return prices
+    
+    @staticmethod
+    def _parse_yfinance_download(data, symbols: List[str]) -> Dict[str, float]:
+        """解析 yf.download 的返回值（取每只股票最近一个有效收盘价）-> {symbol: price}"""
+        if data is None or data.empty or 'Close' not in data:
+            return {}
+        
+        close = data['Close']
+        if not hasattr(close, 'columns'):
+            close = close.to_frame(symbols[0])
+        
+        prices = {}
+        for symbol in symbols:
+            if symbol in close.columns:
+                series = close[symbol].dropna()
+                if not series.empty:
+                    prices[symbol] = float(series.iloc[-1])
+        return prices
+    
+    def _fetch_crypto_prices_ccxt(self, symbols: List[str]) -> Dict[str, float]:
+        """一次 fetch_tickers 获取全部 /USDT 交易对的价格（未上架的交易对直接跳过）"""
+        markets = self.binance.load_markets()
+        pairs = [f"{s}/USDT" for s in symbols if f"{s}/USDT" in markets]
+        if not pairs:
+            return {}
+        
+        prices = self._parse_ccxt_tickers(self.binance.fetch_tickers(pairs))
+        print(f"✓ [CCXT Binance] 批量获取 {len(prices)}/{len(symbols)} 个")
+        return prices
+    
+    def _fetch_crypto_prices_coingecko(self, symbols: List[str]) -> Dict[str, float]:
+        """一次 get_price（逗号拼接 ids）获取全部有映射的币种"""
+        symbol_ids = {s: self._coingecko_id(s) for s in symbols if self._coingecko_id(s)}
+        if not symbol_ids:
+            return {}
+        
+        data = self.coingecko.get_price(ids=','.join(sorted(set(symbol_ids.values()))), vs_currencies='usd')
+        prices = self._parse_coingecko_prices(data, symbol_ids)
+        print(f"✓ [CoinGecko] 批量获取 {len(prices)}/{len(symbols)} 个")
+        return prices
+    
+    def _fetch_stock_prices_yfinance(self, symbols: List[str]) -> Dict[str, float]:
+        """一次 yf.download 获取全部股票最近的收盘价"""
+        data = _yf().download(symbols, period='5d', progress=False, auto_adjust=True, threads=False)
+        if data is None or data.empty:
+            # 整批无数据通常是网络或限流问题，交给逐个获取的重试逻辑
+            raise RuntimeError("yf.download 返回空数据")
+        prices = self._parse_yfinance_download(data, symbols)
+        print(f"✓ [yfinance] 批量获取 {len(prices)}/{len(symbols)} 个")
+        return prices
+    
+    def _fetch_prices_batch(self, symbols: List[str]):
+        """
+        按数据源分组批量获取
+        
+        每个资产单独记录各数据源的结果：某个数据源的批量请求失败（或熔断中）时，其中的资产继续交给下一个数据源；
+        所有数据源都尝试过后仍没有价格的资产交给逐个获取的重试逻辑。批量结果中缺失不能确认没有数据
+        （可能是部分失败或限流），负结果只由逐个获取在确认所有数据源都没有数据后写入
+        
+        Returns:
+            (quotes, retry_symbols): 成功的 {symbol: (price, provider)}，以及需要逐个重试的资产
+        """
+        quotes = {}
+        
+        # 按可用数据源分组（同一组走相同的数据源序列）
+        groups = {}
+        for symbol in symbols:
+            if self._is_stablecoin(symbol):
+                quotes[symbol] = (1.0, 'fixed')
+            else:
+                groups.setdefault(self._providers(symbol), []).append(symbol)
+        
+        batch_fetchers = {
+            'ccxt': self._fetch_crypto_prices_ccxt,
+            'coingecko': self._fetch_crypto_prices_coingecko,
+            'yfinance': self._fetch_stock_prices_yfinance,
+        }
+        
+        missed = {}   # symbol -> 请求成功但没有该资产数据的数据源
+        for providers, group in groups.items():
+            for provider in self.router.order(providers):
+                missing = [s for s in group if s not in quotes]
+                if not missing:
+                    break
+                if not self.router.allow(provider):
+                    print(f"⊘ [{PROVIDER_NAMES[provider]}] 熔断中，跳过批量请求")
+                    continue
+                try:
+                    fetched = self._call_provider(provider, batch_fetchers[provider], missing)
+                except Exception as e:
+                    print(f"✗ [{PROVIDER_NAMES[provider]}] 批量获取失败: {e}")
+                    continue
+                for symbol in missing:
+                    if symbol in fetched:
+                        quotes[symbol] = (fetched[symbol], provider)
+                    else:
+                        missed.setdefault(symbol, set()).add(provider)
+                self.quote_cache.put_many(fetched, provider)
+        
+        # 首选数据源的批量结果中缺失、由 CoinGecko 补上价格的资产：逐个向首选数据源确认一次，确认没有数据时改路由
+        for symbol, (price, provider) in quotes.items():
+            entry = self._entry(symbol)
+            if provider == 'coingecko' and entry is not None and entry.provider in missed.get(symbol, ()):
+                self._confirm_fallback(symbol, entry.provider)
+        
+        return quotes, [s for group in groups.values() for s in group if s not in quotes]
+    
+    # ============ 历史价格：每个资产一次区间请求 ============
+    
+    # Binance fetch_ohlcv 单次最多返回的 K 线数量
+    OHLCV_LIMIT = 1000
+    
+    @staticmethod
+    def _utc_ms(day: date) -> int:
+        """日期 -> 当日 00:00 UTC 的毫秒时间戳"""
+        return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+    
+    @staticmethod
+    def _parse_ohlcv(candles: List) -> Dict[date, float]:
+        """解析 fetch_ohlcv 的日线 [[ms, open, high, low, close, volume], ...] -> {date: close}"""
+        return {
+            datetime.fromtimestamp(c[0] / 1000, tz=timezone.utc).date(): float(c[4])
+            for c in candles if c[4] is not None
+        }
+    
+    @staticmethod
+    def _parse_market_chart(data: Dict) -> Dict[date, float]:
+        """解析 CoinGecko market_chart_range 的 prices [[ms, price], ...] -> {date: 当日最后一个价格}"""
+        prices = {}
+        for ms, price in sorted(data.get('prices') or []):
+            if price is not None:
+                prices[datetime.fromtimestamp(ms / 1000, tz=timezone.utc).date()] = float(price)
+        return prices
+    
+    @staticmethod
+    def _parse_yfinance_history(data, symbols: List[str]) -> Dict[str, Dict[date, float]]:
+        """解析区间 yf.download 的返回值 -> {symbol: {date: close}}"""
+        if data is None or data.empty or 'Close' not in data:
+            return {}
+        
+        close = data['Close']
+        if not hasattr(close, 'columns'):
+            close = close.to_frame(symbols[0])
+        
+        history = {}
+        for symbol in symbols:
+            if symbol in close.columns:
+                series = close[symbol].dropna()
+                if not series.empty:
+                    history[symbol] = {ts.date(): float(price) for ts, price in series.items()}
+        return history
+    
+    def _fetch_crypto_history_ccxt(self, symbol: str, start: date, end: date) -> Dict[date, float]:
+        """Binance 日线 K 线（超过 OHLCV_LIMIT 天时分页）"""
+        pair = f"{symbol}/USDT"
+        since, end_ms = self._utc_ms(start), self._utc_ms(end)
+        history = {}
+        while since <= end_ms:
+            candles = self._call_provider('ccxt', self.binance.fetch_ohlcv, pair, '1d', since, self.OHLCV_LIMIT)
+            if not candles:
+                break
+            history.update(self._parse_ohlcv(candles))
+            if len(candles) < self.OHLCV_LIMIT:
+                break
+            since = candles[-1][0] + 86400000
+        return {d: p for d, p in history.items() if start <= d <= end}
+    
+    def _fetch_crypto_history_coingecko(self, symbol: str, start: date, end: date) -> Dict[date, float]:
+        """CoinGecko market_chart_range（一次请求覆盖整个区间）"""
+        coin_id = self._coingecko_id(symbol)
+        if not coin_id:
+            return {}
+        data = self._call_provider(
+            'coingecko', self.coingecko.get_coin_market_chart_range_by_id,
+            coin_id, 'usd', self._utc_ms(start) // 1000, self._utc_ms(end + timedelta(days=1)) // 1000
+        )
+        return {d: p for d, p in self._parse_market_chart(data).items() if start <= d <= end}
+    
+    def _fetch_stock_history_yfinance(self, symbols: List[str], start: date, end: date) -> Dict[str, Dict[date, float]]:
+        """一次区间 yf.download 获取全部股票的日收盘价（yfinance 的 end 不含当天）"""
+        data = _yf().download(symbols, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+                              progress=False, auto_adjust=True, threads=False)
+        return self._parse_yfinance_history(data, symbols)
+    
+    def fetch_price_history(self, ranges: Dict[str, Tuple[date, date]]) -> Dict[str, Tuple[str, Dict[date, float]]]:
+        """
+        获取历史日收盘价
+        
+        加密货币每个资产一次 ccxt fetch_ohlcv（失败或无数据时改用 CoinGecko market_chart_range），
+        股票全部合并为一次区间 yf.download（无数据且有 CoinGecko 备用映射的再逐个请求 CoinGecko）；
+        稳定币不请求，由调用方按 1.0 处理
+        
+        Args:
+            ranges: {symbol: (start_date, end_date)}，日期均包含
             
-            price = data['Close'].iloc[-1]
-            print(f"✓ [yfinance] {symbol}: ${price:,.2f}")
-            return float(price)
-        except Exception as e:
-            print(f"✗ [yfinance] {symbol} 获取失败: {e}")
+        Returns:
+            {symbol: (source, {date: price})}，获取失败的资产不在结果中
+        """
+        ranges = {s.upper(): r for s, r in ranges.items() if not self._is_stablecoin(s)}
+        ranges = {s: ranges[s] for s in self._priceable(list(ranges))}
+        crypto = [s for s in ranges if self._is_crypto(s)]
+        stocks = [s for s in ranges if not self._is_crypto(s)]
+        results = {}
+        
+        history_fetchers = {
+            'ccxt': self._fetch_crypto_history_ccxt,
+            'coingecko': self._fetch_crypto_history_coingecko,
+        }
+        
+        def fetch_one(symbol):
+            start, end = ranges[symbol]
+            for source in self.router.order(self._providers(symbol)):
+                if source not in history_fetchers:
+                    continue
+                fetch = history_fetchers[source]
+                if not self.router.allow(source):
+                    print(f"⊘ [{source}] 熔断中，{symbol} 跳过")
+                    continue
+                try:
+                    history = fetch(symbol, start, end)
+                except Exception as e:
+                    print(f"✗ [{source}] {symbol} 历史价格获取失败: {e}")
+                    continue
+                if history:
+                    print(f"✓ [{source}] {symbol}: {len(history)} 天 ({start} ~ {end})")
+                    return source, history
             return None
+        
+        if stocks:
+            start = min(ranges[s][0] for s in stocks)
+            end = max(ranges[s][1] for s in stocks)
+            try:
+                history = self._call_provider('yfinance', self._fetch_stock_history_yfinance, stocks, start, end)
+                for symbol, series in history.items():
+                    results[symbol] = ('yfinance', series)
+                print(f"✓ [yfinance] 批量获取历史价格 {len(history)}/{len(stocks)} 个 ({start} ~ {end})")
+            except Exception as e:
+                print(f"✗ [yfinance] 历史价格批量获取失败: {e}")
+        
+        # 加密货币逐个请求；yfinance 没有数据、但有 CoinGecko 备用映射的资产也走这里
+        singles = crypto + [s for s in stocks if s not in results and 'coingecko' in self._providers(s)]
+        if singles:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for symbol, result in zip(singles, executor.map(fetch_one, singles)):
+                    if result is not None:
+                        results[symbol] = result
+        
+        return results
     
     def fetch_price(self, symbol: str) -> Optional[float]:
         """
@@ -143,42 +600,78 @@ class PriceService:
         Returns:
             价格（USD/USDT），失败返回 None
         """
+        quote = self.fetch_quote(symbol)
+        return quote[0] if quote is not None else None
+    
+    def fetch_quote(self, symbol: str) -> Optional[Tuple[float, str]]:
+        """
+        获取单个资产的价格及实际提供价格的数据源
+        
+        Returns:
+            (price, source)，source 为 ccxt / coingecko / yfinance，稳定币为 fixed；失败返回 None
+        """
         symbol = symbol.upper()
         
         # 稳定币直接返回 1.0
         if self._is_stablecoin(symbol):
             print(f"✓ [Stablecoin] {symbol}: $1.00")
-            return 1.0
+            return 1.0, 'fixed'
         
-        # 加密货币：优先 CCXT，失败后尝试 CoinGecko
-        if self._is_crypto(symbol):
-            for attempt in range(self.retry_count):
-                price = self._fetch_crypto_price_ccxt(symbol)
-                if price is not None:
-                    return price
-                
-                if attempt < self.retry_count - 1:
-                    print(f"  ⟳ 重试 {attempt + 1}/{self.retry_count - 1}...")
-                    time.sleep(self.retry_delay)
-            
-            # CCXT 失败，尝试 CoinGecko
-            print(f"  → 尝试备用数据源 CoinGecko...")
-            price = self._fetch_crypto_price_coingecko(symbol)
-            if price is not None:
-                return price
+        cached = self.quote_cache.get_quote(symbol)
+        if cached is not None:
+            print(f"✓ [Cache] {symbol}: ${cached[0]:,.2f}")
+            return cached
         
-        # 股票：使用 yfinance
-        else:
+        if not self._priceable([symbol]):
+            return None
+        return self._fetch_price_from_providers(symbol)
+    
+    def _quote_fetchers(self) -> Dict[str, Callable[[str], Optional[float]]]:
+        """各数据源的单个资产报价函数（无数据返回 None，请求失败抛出异常）"""
+        return {
+            'ccxt': self._fetch_crypto_price_ccxt,
+            'coingecko': self._fetch_crypto_price_coingecko,
+            'yfinance': self._fetch_stock_price_yfinance,
+        }
+    
+    def _fetch_price_from_providers(self, symbol: str) -> Optional[Tuple[float, str]]:
+        """
+        按健康度依次尝试数据源，成功后写入报价缓存，返回 (price, provider)
+        
+        请求失败时以带抖动的指数退避重试；熔断中的数据源直接跳过；
+        数据源对该资产没有数据（未上架、无映射）时不重试，直接换下一个；
+        首选数据源没有数据而 CoinGecko 有报价时改为直接路由到 CoinGecko，所有数据源都没有数据时记入注册表的负结果
+        """
+        fetchers = self._quote_fetchers()
+        providers = self._providers(symbol)
+        missed = []
+        
+        for provider in self.router.order(providers):
+            name = PROVIDER_NAMES[provider]
             for attempt in range(self.retry_count):
-                price = self._fetch_stock_price_yfinance(symbol)
-                if price is not None:
-                    return price
+                if not self.router.allow(provider):
+                    print(f"⊘ [{name}] 熔断中，{symbol} 跳过")
+                    break
+                try:
+                    price = self._call_provider(provider, fetchers[provider], symbol)
+                except Exception as e:
+                    print(f"✗ [{name}] {symbol} 获取失败: {e}")
+                    if attempt < self.retry_count - 1:
+                        delay = self.router.backoff(attempt, self.retry_delay)
+                        print(f"  ⟳ {delay:.1f} 秒后重试 {attempt + 1}/{self.retry_count - 1}...")
+                        time.sleep(delay)
+                    continue
                 
-                if attempt < self.retry_count - 1:
-                    print(f"  ⟳ 重试 {attempt + 1}/{self.retry_count - 1}...")
-                    time.sleep(self.retry_delay)
+                if price is not None:
+                    self.quote_cache.put(symbol, price, provider)
+                    self._route_to_fallback(symbol, provider, missed)
+                    return price, provider
+                missed.append(provider)
+                break
         
         print(f"✗ {symbol} 所有数据源均失败")
+        if providers and len(missed) == len(providers):
+            self._mark_unpriceable([symbol])
         return None
     
     def fetch_fx_rate(self, to_currency: str) -> float:
@@ -194,6 +687,10 @@ class PriceService:
         to_currency = to_currency.upper()
         if to_currency == 'USD':
             return 1.0
+        
+        cached = self.quote_cache.get(to_currency, kind='fx')
+        if cached is not None:
+            return cached
             
         try:
             # 尝试多种 yfinance 汇率代码格式
@@ -202,113 +699,146 @@ class PriceService:
             ticker_candidates = [f"USD{to_currency}=X", f"{to_currency}=X"]
             
             for ticker_name in ticker_candidates:
-                ticker = yf.Ticker(ticker_name)
+                ticker = _yf().Ticker(ticker_name)
                 # 使用 period='5d' 确保在周末或节假日也能拿到最近的收盘价
-                data = ticker.history(period='5d')
+                data = self._call_provider('yfinance', lambda: ticker.history(period='5d'))
                 if not data.empty:
                     rate = data['Close'].iloc[-1]
                     if rate > 0:
                         # 检查汇率是否合理（比如 CNY 应该是 7 左右，如果拿到了 1 以下可能是反向汇率）
                         # 这里简单判断即可，通常 USD 为基准
                         print(f"✓ [FX] {ticker_name}: {rate:.4f}")
+                        self.quote_cache.put(to_currency, rate, 'fx', kind='fx')
                         return float(rate)
         except Exception as e:
             print(f"✗ [FX] {to_currency} 汇率获取失败: {e}")
             
         return 1.0
 
-    def fetch_prices(self, symbols_list: List[str]) -> Dict[str, Optional[float]]:
+    def fetch_prices(self, symbols_list: List[str], concurrent: bool = True, batch: bool = True) -> Dict[str, Optional[float]]:
         """
         批量获取多个资产的价格
         
         Args:
             symbols_list: 资产符号列表
+            concurrent: 是否并发获取（限流由各数据源的令牌桶控制）
+            batch: 是否优先使用批量接口（每个数据源一次请求），批量接口没有拿到的资产才会逐个获取
             
         Returns:
             字典 {symbol: price}
         """
+        quotes = self.fetch_quotes(symbols_list, concurrent=concurrent, batch=batch)
+        return {symbol: quote[0] if quote is not None else None for symbol, quote in quotes.items()}
+    
+    def fetch_quotes(self, symbols_list: List[str], concurrent: bool = True,
+                     batch: bool = True) -> Dict[str, Optional[Tuple[float, str]]]:
+        """
+        批量获取多个资产的价格及实际提供价格的数据源（参数同 fetch_prices）
+        
+        Returns:
+            字典 {symbol: (price, source)}，获取失败为 None；source 为 ccxt / coingecko / yfinance，稳定币为 fixed
+        """
         print(f"\n📊 开始获取 {len(symbols_list)} 个资产的价格...")
         print("=" * 60)
         
-        prices = {}
-        for symbol in symbols_list:
-            price = self.fetch_price(symbol)
-            prices[symbol.upper()] = price
-            time.sleep(0.5)  # 避免 API 限流
+        symbols = list(dict.fromkeys(s.upper() for s in symbols_list))
+        
+        # 稳定币固定为 1.0；TTL 内的报价直接使用缓存，不发起网络请求
+        cached = {}
+        for symbol in symbols:
+            quote = (1.0, 'fixed') if self._is_stablecoin(symbol) else self.quote_cache.get_quote(symbol)
+            if quote is not None:
+                cached[symbol] = quote
+        if cached:
+            print(f"✓ [Cache] {len(cached)} 个资产使用缓存 / 固定报价")
+        uncached = self._priceable([s for s in symbols if s not in cached])
+        
+        if batch:
+            quotes, pending = self._fetch_prices_batch(uncached)
+        else:
+            quotes, pending = {}, uncached
+        quotes.update(cached)
+        
+        if concurrent and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self._fetch_price_from_providers, pending))
+        else:
+            results = [self._fetch_price_from_providers(symbol) for symbol in pending]
+        quotes.update(zip(pending, results))
+        quotes = {symbol: quotes.get(symbol) for symbol in symbols}
         
         print("=" * 60)
-        success_count = sum(1 for p in prices.values() if p is not None)
-        print(f"✅ 完成: {success_count}/{len(symbols_list)} 个资产获取成功\n")
+        success_count = sum(1 for q in quotes.values() if q is not None)
+        cache_stats = self.quote_cache.stats()
+        print(f"✅ 完成: {success_count}/{len(symbols_list)} 个资产获取成功"
+              f"（报价缓存 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}）")
+        self.router.print_report()
+        print()
         
-        return prices
+        return quotes
 
 
-def update_price_history_db(symbols_list: List[str], db_path='local_ledger.db'):
+def update_price_history_db(symbols_list: List[str], db_path='local_ledger.db',
+                            engine=None, service: Optional[PriceService] = None):
     """
     获取价格并更新到数据库
     
     Args:
         symbols_list: 资产符号列表
-        db_path: 数据库路径
+        db_path: 数据库路径（未传 engine 时使用）
+        engine: 可选的数据库引擎（调用方已在启动时执行迁移，例如 init_connection、refresh_prices.py）
+        service: 可选的 PriceService
         
     Returns:
         更新/插入的记录数
     """
-    # 获取价格
-    service = PriceService()
-    prices = service.fetch_prices(symbols_list)
+    # 连接数据库：只有自行创建引擎时才执行迁移，后台刷新每轮调用时不再重复建表 / 查询迁移表
+    if engine is None:
+        engine = get_engine(db_path)
+        migrations.upgrade(engine)
     
-    # 连接数据库
-    engine = get_engine(db_path)
+    # 获取价格
+    service = service or PriceService(registry=SymbolRegistry(engine))
+    quotes = service.fetch_quotes(symbols_list)
     session = get_session(engine)
     
     today = date.today()
-    updated_count = 0
-    inserted_count = 0
     
     try:
-        for symbol, price in prices.items():
-            if price is None:
+        rows = []
+        for symbol, quote in quotes.items():
+            if quote is None:
                 print(f"⊘ {symbol}: 跳过（获取失败）")
                 continue
             
-            # 判断数据源
-            if symbol in service.STABLECOINS:
-                source = 'fixed'
-            elif symbol in service.CRYPTO_SYMBOLS:
-                source = 'ccxt'
-            else:
-                source = 'yfinance'
-            
-            # 检查今天是否已有记录
-            existing = session.query(PriceHistory).filter(
-                and_(
-                    PriceHistory.date == today,
-                    PriceHistory.symbol == symbol
-                )
-            ).first()
-            
-            if existing:
-                # 更新现有记录
-                existing.price_usd = price
-                existing.source = source
-                existing.created_at = datetime.utcnow()
-                updated_count += 1
-                print(f"⟳ {symbol}: 更新价格 ${price:,.2f}")
+            # 记录实际提供价格的数据源
+            price, source = quote
+            rows.append({'date': today, 'symbol': symbol, 'price_usd': price, 'source': source})
+        
+        saved_symbols = [row['symbol'] for row in rows]
+        
+        # 一次查询区分新增 / 更新（仅用于统计输出）
+        existing = {s for (s,) in session.query(PriceHistory.symbol).filter(
+            PriceHistory.date == today,
+            PriceHistory.symbol.in_(saved_symbols)
+        )} if saved_symbols else set()
+        
+        for row in rows:
+            if row['symbol'] in existing:
+                print(f"⟳ {row['symbol']}: 更新价格 ${row['price_usd']:,.2f}")
             else:
-                # 插入新记录
-                new_price = PriceHistory(
-                    date=today,
-                    symbol=symbol,
-                    price_usd=price,
-                    source=source
-                )
-                session.add(new_price)
-                inserted_count += 1
-                print(f"+ {symbol}: 新增价格 ${price:,.2f}")
+                print(f"+ {row['symbol']}: 新增价格 ${row['price_usd']:,.2f}")
+        updated_count = len(existing)
+        inserted_count = len(rows) - updated_count
         
+        upsert.upsert_price_history(session, rows)
         session.commit()
         
+        # 今日价格会影响今日及之后快照的估值
+        if saved_symbols:
+            valuation.refresh_daily_valuation(session, since=today, symbols=saved_symbols)
+            session.commit()
+        
         print("\n" + "=" * 60)
         print(f"💾 数据库更新完成:")
         print(f"  - 新增: {inserted_count} 条")
@@ -325,6 +855,145 @@ def update_price_history_db(symbols_list: List[str], db_path='local_ledger.db'):
         session.close()
 
 
+def find_price_gaps(session, symbols: Optional[Iterable[str]] = None) -> Dict[str, List[date]]:
+    """
+    找出估值需要但当天没有价格记录的 (资产, 日期)（单次 LEFT JOIN 查询）
+    
+    以物化估值表 daily_valuation 为准，它包含各估值日期上 as-of 延续的持仓
+    
+    Args:
+        session: 数据库会话
+        symbols: 仅检查这些资产，None 表示全部
+        
+    Returns:
+        {symbol: [date, ...]}，日期升序
+    """
+    query = session.query(DailyValuation.symbol, DailyValuation.date).outerjoin(
+        PriceHistory,
+        and_(PriceHistory.symbol == DailyValuation.symbol, PriceHistory.date == DailyValuation.date)
+    ).filter(PriceHistory.id.is_(None))
+    if symbols is not None:
+        query = query.filter(DailyValuation.symbol.in_(sorted({s.upper() for s in symbols})))
+    
+    gaps = {}
+    for symbol, gap_date in query.distinct().order_by(DailyValuation.symbol, DailyValuation.date):
+        gaps.setdefault(symbol, []).append(gap_date)
+    return gaps
+
+
+def find_benchmark_gaps(session, symbols: Iterable[str]) -> Dict[str, List[date]]:
+    """
+    找出基准资产在估值日期上缺少的价格（两次查询）
+    
+    基准不一定被持有，find_price_gaps 覆盖不到；与组合对比需要从第一个估值日期起的每个估值日期都有价格
+    
+    Args:
+        session: 数据库会话
+        symbols: 基准资产
+        
+    Returns:
+        {symbol: [date, ...]}，日期升序
+    """
+    symbols = sorted({s.upper() for s in symbols})
+    if not symbols:
+        return {}
+    dates = [d for (d,) in session.query(DailyValuation.date).distinct().order_by(DailyValuation.date)]
+    if not dates:
+        return {}
+    
+    priced = set(session.query(PriceHistory.symbol, PriceHistory.date).filter(
+        PriceHistory.symbol.in_(symbols),
+        PriceHistory.date >= dates[0]
+    ))
+    gaps = {}
+    for symbol in symbols:
+        missing = [d for d in dates if (symbol, d) not in priced]
+        if missing:
+            gaps[symbol] = missing
+    return gaps
+
+
+def backfill_price_history(symbols_list: Optional[List[str]] = None, db_path='local_ledger.db',
+                           engine=None, service: Optional[PriceService] = None, lookback_days: int = 7,
+                           benchmarks: Iterable[str] = ()) -> Dict:
+    """
+    回填历史快照日期缺失的价格：每个资产一次区间请求，批量 upsert 后重算受影响的估值
+    
+    缺口日期没有收盘价（周末、节假日）时使用 lookback_days 天内最近一个收盘价
+    
+    Args:
+        symbols_list: 仅回填这些资产，None 表示快照中的全部资产，[] 表示只回填基准
+        db_path: 数据库路径（未传 engine 时使用）
+        engine: 可选的数据库引擎
+        service: 可选的 PriceService
+        lookback_days: 向前多取的天数
+        benchmarks: 同时回填的基准资产（从第一个估值日期起的全部估值日期，不要求持有）
+        
+    Returns:
+        {'rows': 写入行数, 'since': 最早的回填日期或 None, 'symbols': 已回填的资产, 'unfilled': {symbol: 未回填天数}}
+    """
+    engine = engine if engine is not None else get_engine(db_path)
+    migrations.upgrade(engine)
+    session = get_session(engine)
+    
+    try:
+        valuation.ensure_daily_valuation(session)
+        gaps = find_price_gaps(session, symbols_list)
+        for symbol, dates in find_benchmark_gaps(session, benchmarks).items():
+            gaps[symbol] = sorted(set(gaps.get(symbol, [])) | set(dates))
+        total = sum(len(dates) for dates in gaps.values())
+        print(f"\n🔍 {len(gaps)} 个资产共缺少 {total} 个快照日期的价格")
+        if not gaps:
+            return {'rows': 0, 'since': None, 'symbols': [], 'unfilled': {}}
+        
+        service = service or PriceService(registry=SymbolRegistry(engine))
+        lookback = timedelta(days=lookback_days)
+        history = service.fetch_price_history({s: (dates[0] - lookback, dates[-1]) for s, dates in gaps.items()})
+        
+        rows = []
+        unfilled = {}
+        for symbol, dates in gaps.items():
+            if service._is_stablecoin(symbol):
+                rows.extend({'date': d, 'symbol': symbol, 'price_usd': 1.0, 'source': 'fixed'} for d in dates)
+                continue
+            
+            source, series = history.get(symbol, (None, {}))
+            known = sorted(series)
+            missed = 0
+            for gap_date in dates:
+                i = bisect_right(known, gap_date) - 1
+                if i < 0 or gap_date - known[i] > lookback:
+                    missed += 1
+                    continue
+                rows.append({'date': gap_date, 'symbol': symbol, 'price_usd': series[known[i]], 'source': source})
+            if missed:
+                unfilled[symbol] = missed
+        
+        upsert.upsert_price_history(session, rows)
+        session.commit()
+        
+        filled_symbols = sorted({row['symbol'] for row in rows})
+        since = min((row['date'] for row in rows), default=None)
+        if rows:
+            valuation.refresh_daily_valuation(session, since=since, symbols=filled_symbols)
+            session.commit()
+        
+        print("\n" + "=" * 60)
+        print(f"💾 历史价格回填完成: {len(rows)} 条（{len(filled_symbols)} 个资产）")
+        for symbol, missed in unfilled.items():
+            print(f"  ⊘ {symbol}: {missed} 个日期未找到价格")
+        print("=" * 60 + "\n")
+        
+        return {'rows': len(rows), 'since': since, 'symbols': filled_symbols, 'unfilled': unfilled}
+        
+    except Exception as e:
+        session.rollback()
+        print(f"\n❌ 历史价格回填失败: {e}\n")
+        raise
+    finally:
+        session.close()
+
+
 def fetch_and_display_prices(symbols_list: List[str]):
     """
     获取价格并打印（不保存到数据库）
@@ -0,0 +1,189 @@
+"""
+MyLedger - 数据源路由与熔断
+记录每个价格数据源的成功率和延迟；连续失败达到阈值后熔断，冷却期内直接跳过该数据源，
+冷却结束后放行一次试探请求（半开），成功则恢复；按健康度排序数据源，重试使用带抖动的指数退避
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+
+# 连续失败多少次后熔断
+FAILURE_THRESHOLD = 3
+
+# 熔断冷却时间（秒）
+COOLDOWN_SECONDS = 60.0
+
+# 指数退避的上限（秒）
+MAX_BACKOFF_SECONDS = 30.0
+
+# 延迟的指数移动平均系数
+LATENCY_ALPHA = 0.3
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+PROVIDER_NAMES = {'ccxt': 'CCXT Binance', 'coingecko': 'CoinGecko', 'yfinance': 'yfinance'}
+
+
+@dataclass
+class ProviderStats:
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency_ms: Optional[float] = None     # 指数移动平均
+    state: str = CLOSED
+    opened_at: float = 0.0
+    trial_started: Optional[float] = None  # 半开状态下试探请求的开始时间
+    skipped: int = 0                       # 熔断期间被跳过的请求数
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        total = self.successes + self.failures
+        return self.successes / total if total else None
+
+    @property
+    def score(self) -> float:
+        """排序用的平滑成功率（无记录时为 0.5）"""
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+
+class ProviderRouter:
+    """数据源健康度跟踪与熔断（线程安全）"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN_SECONDS,
+                 max_backoff: float = MAX_BACKOFF_SECONDS):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断冷却时间（秒）
+            max_backoff: 重试等待时间上限（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_backoff = max_backoff
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str) -> ProviderStats:
+        return self._stats.setdefault(provider, ProviderStats())
+
+    # ============ 熔断 ============
+
+    def allow(self, provider: str) -> bool:
+        """
+        是否可以向该数据源发请求
+
+        熔断中返回 False；冷却结束后只放行一个试探请求（其结果决定恢复还是继续熔断），
+        试探请求超过冷却时间仍没有结果（例如调用方最终没有发请求）时再放行一个
+        """
+        with self._lock:
+            stats = self._get(provider)
+            if stats.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if stats.state == OPEN and now - stats.opened_at >= self.cooldown:
+                stats.state = HALF_OPEN
+                stats.trial_started = None
+            if stats.state == HALF_OPEN and (stats.trial_started is None or now - stats.trial_started >= self.cooldown):
+                stats.trial_started = now
+                return True
+            stats.skipped += 1
+            return False
+
+    def record(self, provider: str, ok: bool, latency: float):
+        """
+        记录一次请求结果
+
+        Args:
+            provider: 数据源
+            ok: 是否成功（请求本身成功，即使该资产无数据也算成功）
+            latency: 耗时（秒）
+        """
+        with self._lock:
+            stats = self._get(provider)
+            ms = latency * 1000
+            stats.latency_ms = ms if stats.latency_ms is None else \
+                LATENCY_ALPHA * ms + (1 - LATENCY_ALPHA) * stats.latency_ms
+
+            if ok:
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                stats.state = CLOSED
+            else:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+                    if stats.state != OPEN:
+                        print(f"⚡ [{PROVIDER_NAMES.get(provider, provider)}] 连续失败 "
+                              f"{stats.consecutive_failures} 次，熔断 {self.cooldown:.0f} 秒")
+                    stats.state = OPEN
+                    stats.opened_at = time.monotonic()
+            stats.trial_started = None
+
+    # ============ 排序与退避 ============
+
+    def order(self, providers: Iterable[str]) -> List[str]:
+        """
+        按健康度排序数据源：熔断中的排在最后，其余按平滑成功率降序，相同时保持传入顺序
+
+        Args:
+            providers: 按默认优先级排列的数据源
+        """
+        providers = list(providers)
+        with self._lock:
+            now = time.monotonic()
+            keys = {}
+            for i, p in enumerate(providers):
+                stats = self._get(p)
+                cooling = stats.state == OPEN and now - stats.opened_at < self.cooldown
+                keys[p] = (cooling, -round(stats.score, 2), i)
+        return sorted(providers, key=keys.get)
+
+    def backoff(self, attempt: int, base: float) -> float:
+        """
+        第 attempt 次（从 0 开始）重试前的等待时间：全抖动指数退避 uniform(0, min(上限, base * 2^attempt))
+        """
+        return random.uniform(0, min(self.max_backoff, base * (2 ** attempt)))
+
+    # ============ 报告 ============
+
+    def report(self) -> List[Dict]:
+        """
+        各数据源的健康状况
+
+        Returns:
+            [{'provider', 'state', 'successes', 'failures', 'success_rate', 'latency_ms', 'skipped'}, ...]
+        """
+        with self._lock:
+            now = time.monotonic()
+            rows = []
+            for provider, stats in sorted(self._stats.items()):
+                state = stats.state
+                if state == OPEN and now - stats.opened_at >= self.cooldown:
+                    state = HALF_OPEN
+                rows.append({
+                    'provider': provider,
+                    'state': state,
+                    'successes': stats.successes,
+                    'failures': stats.failures,
+                    'success_rate': stats.success_rate,
+                    'latency_ms': stats.latency_ms,
+                    'skipped': stats.skipped,
+                })
+            return rows
+
+    def print_report(self):
+        """打印数据源健康报告"""
+        rows = [r for r in self.report() if r['successes'] or r['failures'] or r['skipped']]
+        if not rows:
+            return
+        icons = {CLOSED: '✅', HALF_OPEN: '🟡', OPEN: '⛔'}
+        print("📡 数据源健康:")
+        for r in rows:
+            rate = f"{r['success_rate']:.0%}" if r['success_rate'] is not None else '-'
+            latency = f"{r['latency_ms']:.0f} ms" if r['latency_ms'] is not None else '-'
+            skipped = f"，熔断跳过 {r['skipped']} 次" if r['skipped'] else ''
+            print(f"  {icons[r['state']]} {PROVIDER_NAMES.get(r['provider'], r['provider']):14s} "
+                  f"成功 {r['successes']}/{r['successes'] + r['failures']} ({rate})，平均 {latency}{skipped}")
@@ -0,0 +1,142 @@
+"""
+MyLedger - 报价缓存
+内存 + 可选磁盘（JSON 文件）的报价缓存，按数据源设置 TTL；
+同一进程内的多个 PriceService 共享，配置磁盘路径后 Streamlit 与命令行工具之间也能共享
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class QuoteCache:
+    """带 TTL 的报价缓存（线程安全）"""
+
+    # 各数据源报价的有效期（秒）
+    DEFAULT_TTLS = {
+        'ccxt': 60,
+        'coingecko': 120,
+        'yfinance': 300,
+        'fx': 3600,
+    }
+
+    def __init__(self, path: Optional[str] = None, ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            path: 磁盘缓存的 JSON 文件路径，None 表示只用内存
+            ttls: 覆盖 DEFAULT_TTLS 的配置
+        """
+        self.path = path
+        self.ttls = dict(self.DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (value, source, fetched_at)；fetched_at 为 Unix 时间戳，便于跨进程共享
+        self._quotes: Dict[str, Tuple[float, str, float]] = {}
+        self._load()
+
+    @staticmethod
+    def _key(kind: str, symbol: str) -> str:
+        return f"{kind}:{symbol.upper()}"
+
+    def _read_file(self) -> Dict[str, Tuple[float, str, float]]:
+        """读取磁盘缓存文件，文件不存在或损坏时返回空字典"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {k: tuple(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            print(f"✗ [QuoteCache] 读取 {self.path} 失败: {e}")
+            return {}
+
+    def _load(self):
+        self._quotes = self._read_file()
+
+    def _merge(self, quotes: Dict[str, Tuple[float, str, float]]):
+        """合并其他来源的报价：同一 key 保留获取时间较新的一条"""
+        for key, quote in quotes.items():
+            current = self._quotes.get(key)
+            if current is None or quote[2] > current[2]:
+                self._quotes[key] = quote
+
+    def _save(self):
+        """
+        写入磁盘缓存：先重新读取文件并合并（应用、后台刷新、命令行工具共用同一个文件时不覆盖彼此的报价），
+        丢弃已过期的报价后原子替换
+        """
+        if not self.path:
+            return
+        self._merge(self._read_file())
+        now = time.time()
+        self._quotes = {
+            key: quote for key, quote in self._quotes.items()
+            if now - quote[2] <= self.ttls.get(quote[1], 0)
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._quotes, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"✗ [QuoteCache] 写入 {self.path} 失败: {e}")
+
+    def get(self, symbol: str, kind: str = 'price') -> Optional[float]:
+        """
+        读取未过期的报价
+
+        Args:
+            symbol: 资产符号或货币代码
+            kind: 'price'（资产价格）或 'fx'（汇率）
+
+        Returns:
+            报价，不存在或已过期返回 None
+        """
+        quote = self.get_quote(symbol, kind)
+        return quote[0] if quote is not None else None
+
+    def get_quote(self, symbol: str, kind: str = 'price') -> Optional[Tuple[float, str]]:
+        """读取未过期的报价及其数据源，不存在或已过期返回 None"""
+        with self._lock:
+            quote = self._quotes.get(self._key(kind, symbol))
+            if quote is not None:
+                value, source, fetched_at = quote
+                if time.time() - fetched_at <= self.ttls.get(source, 0):
+                    self.hits += 1
+                    return value, source
+            self.misses += 1
+            return None
+
+    def put(self, symbol: str, value: float, source: str, kind: str = 'price'):
+        """写入报价（source 决定 TTL）"""
+        self.put_many({symbol: value}, source, kind)
+
+    def put_many(self, values: Dict[str, float], source: str, kind: str = 'price'):
+        """批量写入同一数据源的报价，磁盘只写一次"""
+        if not values:
+            return
+        now = time.time()
+        with self._lock:
+            for symbol, value in values.items():
+                self._quotes[self._key(kind, symbol)] = (float(value), source, now)
+            self._save()
+
+    def stats(self) -> Dict[str, int]:
+        """命中 / 未命中次数"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_quote_cache() -> QuoteCache:
+    """进程内共享的报价缓存；设置环境变量 MYLEDGER_QUOTE_CACHE 后同时持久化到该 JSON 文件"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QuoteCache(os.getenv('MYLEDGER_QUOTE_CACHE'))
+        return _shared_cache
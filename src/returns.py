@@ -0,0 +1,231 @@
+"""
+MyLedger - 收益率分析引擎
+基于完整的净值序列和资金流序列（NumPy 向量化）计算：
+- 每个子区间的时间加权收益（TWR）及任意区间的累计 TWR
+- 资金加权收益率（IRR，所有区间同时用向量化牛顿法求解）
+- 7 / 30 / 90 / 365 天滚动 APY
+现金流约定与原区间 ROI 一致：区间 (start, end] 内的转账计入该区间，视为发生在区间末尾
+"""
+from typing import Dict, Optional
+import numpy as np
+
+
+DAYS_PER_YEAR = 365.25
+
+# 滚动窗口（天）
+WINDOWS = {'7d': 7, '30d': 30, '90d': 90, '365d': 365}
+
+# IRR 牛顿迭代参数
+IRR_GUESS = 0.1
+IRR_TOL = 1e-10
+IRR_MAX_ITER = 100
+
+
+def _as_days(values) -> np.ndarray:
+    return np.asarray(values, dtype='datetime64[D]')
+
+
+# ============ 序列对齐 ============
+
+def cumulative_flows(dates, flow_dates, flows) -> np.ndarray:
+    """
+    每个估值日期（含当天）之前的累计资金流
+
+    Args:
+        dates: 估值日期（升序）
+        flow_dates: 转账日期（升序）
+        flows: 与 flow_dates 对应的金额
+
+    Returns:
+        与 dates 等长的累计金额数组
+    """
+    flows = np.asarray(flows, dtype=float)
+    prefix = np.concatenate([[0.0], np.cumsum(flows)])
+    return prefix[np.searchsorted(_as_days(flow_dates), _as_days(dates), side='right')]
+
+
+def sub_period_returns(values, interval_flows) -> np.ndarray:
+    """
+    相邻估值日期之间的收益率 r_i = (V_i - V_{i-1} - F_i) / V_{i-1}，r_0 = 0；期初净值不为正时记 0
+
+    Args:
+        values: 净值序列
+        interval_flows: 每个区间 (d_{i-1}, d_i] 的净流入，interval_flows[0] 不参与计算
+    """
+    values = np.asarray(values, dtype=float)
+    flows = np.asarray(interval_flows, dtype=float)
+    returns = np.zeros(len(values))
+    if len(values) > 1:
+        prev = values[:-1]
+        gain = values[1:] - prev - flows[1:]
+        returns[1:] = np.divide(gain, prev, out=np.zeros_like(prev), where=prev > 0)
+    return returns
+
+
+def rolling_apy(dates, growth, window_days: int) -> np.ndarray:
+    """
+    以每个估值日期为终点的滚动 APY
+
+    区间起点取窗口起始日当天或之前最近的估值日期；数据不足一个完整窗口的位置为 NaN
+
+    Args:
+        dates: 估值日期（升序）
+        growth: TWR 累计净值指数（growth[j] / growth[i] 为 i 到 j 的时间加权增长）
+        window_days: 窗口天数
+
+    Returns:
+        APY 数组（小数，如 0.12 表示 12%）
+    """
+    days = _as_days(dates)
+    growth = np.asarray(growth, dtype=float)
+    start = np.searchsorted(days, days - np.timedelta64(window_days, 'D'), side='right') - 1
+    valid = start >= 0
+
+    result = np.full(len(days), np.nan)
+    if not valid.any():
+        return result
+    end_idx = np.nonzero(valid)[0]
+    start_idx = start[valid]
+    span = (days[end_idx] - days[start_idx]).astype(float)
+    ratio = growth[end_idx] / growth[start_idx]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[end_idx] = np.where((span > 0) & (ratio > 0), ratio ** (DAYS_PER_YEAR / span) - 1, np.nan)
+    return result
+
+
+# ============ IRR ============
+
+def irr(amounts, years, guess: float = IRR_GUESS) -> np.ndarray:
+    """
+    向量化牛顿法求多组现金流的年化 IRR
+
+    每一行是一组现金流（投资者视角：投入为负、取回为正），求 r 使 sum(a * (1 + r) ** -t) = 0
+
+    Args:
+        amounts: shape (n, m) 的金额矩阵，不足 m 个的行用 0 补齐
+        years: 同形状的时间（年，相对于各行起点）
+        guess: 初始值
+
+    Returns:
+        长度 n 的年化 IRR（小数），未收敛或无解为 NaN；
+        导数为 0 的行（例如 NPV 与利率无关的退化现金流）无法迭代，也为 NaN
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    years = np.atleast_2d(np.asarray(years, dtype=float))
+    rate = np.full(amounts.shape[0], guess)
+    converged = np.zeros(amounts.shape[0], dtype=bool)
+    stalled = np.zeros(amounts.shape[0], dtype=bool)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(IRR_MAX_ITER):
+            base = (1 + rate)[:, None]
+            discount = base ** -years
+            npv = (amounts * discount).sum(axis=1)
+            slope = (-years * amounts * discount / base).sum(axis=1)
+            stalled |= ~converged & ~(slope != 0)
+            done = converged | stalled
+            step = np.where(done, 0.0, npv / np.where(done, 1.0, slope))
+            rate = np.maximum(rate - step, -0.999999)
+            converged |= ~stalled & (np.abs(step) < IRR_TOL)
+            if (converged | stalled).all():
+                break
+
+    return np.where(converged & np.isfinite(rate), rate, np.nan)
+
+
+# ============ 汇总 ============
+
+def analyze(dates, values, cum_deposits=None, cum_withdrawals=None) -> Optional[Dict]:
+    """
+    计算全部区间（整段 + 各滚动窗口的最近一期）的收益指标
+
+    资金流以累计值传入（例如 CashFlowIndex.cumulative(dates) 的前缀和，或 cumulative_flows 的结果），
+    任意区间 (d_i, d_j] 的流入都是两个累计值之差，这里不再重新求和
+
+    Args:
+        dates: 估值日期（升序）
+        values: 对应的净值
+        cum_deposits: 每个估值日期（含当天）之前的累计入金，None 表示没有资金流
+        cum_withdrawals: 每个估值日期（含当天）之前的累计出金，None 表示没有资金流
+
+    Returns:
+        估值日期少于 2 个时为 None，否则为
+        {
+            'dates': [date, ...],
+            'twr_index': TWR 累计净值指数（首日为 1）,
+            'rolling_apy': {window: APY 数组（%）},
+            'periods': {'all' / window: 区间指标}，数据不足一个窗口的区间不出现
+        }
+        区间指标: start_date, end_date, days, start_net_worth, end_net_worth,
+        period_deposits, period_withdrawals, net_cash_flow, roi, twr, irr, apy（收益率均为 %）
+    """
+    days = _as_days(dates)
+    values = np.asarray(values, dtype=float)
+    if len(days) < 2:
+        return None
+
+    cum_dep = np.zeros(len(days)) if cum_deposits is None else np.asarray(cum_deposits, dtype=float)
+    cum_wd = np.zeros(len(days)) if cum_withdrawals is None else np.asarray(cum_withdrawals, dtype=float)
+    cum_net = cum_dep - cum_wd
+    interval_flows = np.diff(cum_net, prepend=cum_net[0])
+
+    growth = np.cumprod(1 + sub_period_returns(values, interval_flows))
+
+    # 各区间起点：整段从第一天开始，窗口取窗口起始日或之前最近的估值日期
+    end = len(days) - 1
+    starts = {'all': 0}
+    for key, window in WINDOWS.items():
+        start = np.searchsorted(days, days[end] - np.timedelta64(window, 'D'), side='right') - 1
+        if start >= 0 and start < end:
+            starts[key] = int(start)
+
+    keys = list(starts)
+    start_idx = np.array([starts[k] for k in keys])
+    span_days = (days[end] - days[start_idx]).astype(float)
+
+    twr = growth[end] / growth[start_idx] - 1
+    net_flow = cum_net[end] - cum_net[start_idx]
+    start_values = values[start_idx]
+    roi = np.divide(values[end] - start_values - net_flow, start_values,
+                    out=np.zeros_like(start_values), where=start_values > 0)
+    with np.errstate(invalid='ignore'):
+        apy = np.where(span_days > 0, (1 + twr) ** (DAYS_PER_YEAR / np.maximum(span_days, 1)) - 1, 0.0)
+
+    # IRR：每个区间一行现金流 [-期初净值, -区间内各日净流入..., +期末净值]
+    flows_in = np.diff(cum_net, prepend=0.0)   # 每个估值日期上新增的净流入（首日含之前的全部流入，不参与区间）
+    amounts = np.zeros((len(keys), len(days) + 1))
+    years = np.zeros_like(amounts)
+    elapsed = (days - days[0]).astype(float) / DAYS_PER_YEAR
+    for row, s in enumerate(start_idx):
+        amounts[row, s] = -values[s]
+        amounts[row, s + 1:end + 1] = -flows_in[s + 1:end + 1]
+        amounts[row, -1] = values[end]
+        years[row, :len(days)] = elapsed - elapsed[s]
+        years[row, -1] = elapsed[end] - elapsed[s]
+    irr_values = irr(amounts, np.maximum(years, 0.0))
+
+    to_date = lambda d: d.astype(object)
+    periods = {}
+    for row, key in enumerate(keys):
+        s = start_idx[row]
+        periods[key] = {
+            'start_date': to_date(days[s]),
+            'end_date': to_date(days[end]),
+            'days': float(span_days[row]),
+            'start_net_worth': float(values[s]),
+            'end_net_worth': float(values[end]),
+            'period_deposits': float(cum_dep[end] - cum_dep[s]),
+            'period_withdrawals': float(cum_wd[end] - cum_wd[s]),
+            'net_cash_flow': float(net_flow[row]),
+            'roi': float(roi[row]) * 100,
+            'twr': float(twr[row]) * 100,
+            'irr': float(irr_values[row]) * 100,
+            'apy': float(apy[row]) * 100,
+        }
+
+    return {
+        'dates': [to_date(d) for d in days],
+        'twr_index': growth,
+        'rolling_apy': {key: rolling_apy(days, growth, window) * 100 for key, window in WINDOWS.items()},
+        'periods': periods,
+    }
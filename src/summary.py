@@ -0,0 +1,168 @@
+"""
+MyLedger - 汇总查询
+转账合计、按周期的资金流、各表行数等统计直接在数据库里聚合，
+每个函数一次往返，返回普通元组而不是 ORM 对象
+"""
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import and_, case, func, select
+from .models import Snapshot, Transfer, PriceHistory
+
+
+def _flow_columns():
+    deposits = func.coalesce(func.sum(case((Transfer.type == 'deposit', Transfer.amount_usd), else_=0.0)), 0.0)
+    withdrawals = func.coalesce(func.sum(case((Transfer.type == 'withdrawal', Transfer.amount_usd), else_=0.0)), 0.0)
+    return deposits, withdrawals
+
+
+def transfer_totals(session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    include_start: bool = True) -> Tuple[float, float, int]:
+    """
+    日期范围内的入金、出金合计
+
+    Args:
+        session: 数据库会话
+        start_date: 起始日期，None 表示不限
+        end_date: 结束日期（含），None 表示不限
+        include_start: 是否包含起始日期当天（区间收益率计算用左开区间）
+
+    Returns:
+        (total_deposits, total_withdrawals, transfer_count)
+    """
+    deposits, withdrawals = _flow_columns()
+    query = session.query(deposits, withdrawals, func.count(Transfer.id))
+    if start_date is not None:
+        query = query.filter(Transfer.date >= start_date if include_start else Transfer.date > start_date)
+    if end_date is not None:
+        query = query.filter(Transfer.date <= end_date)
+    total_deposits, total_withdrawals, count = query.one()
+    return float(total_deposits), float(total_withdrawals), count
+
+
+def _period_key(session, period: str):
+    """按周期截断日期的 SQL 表达式（结果为 'YYYY' / 'YYYY-MM' / 'YYYY-MM-DD' 字符串）"""
+    formats = {
+        'year': ('%Y', 'YYYY'),
+        'month': ('%Y-%m', 'YYYY-MM'),
+        'day': ('%Y-%m-%d', 'YYYY-MM-DD'),
+    }
+    if period not in formats:
+        raise ValueError(f"不支持的周期: {period}（可选 {', '.join(formats)}）")
+    sqlite_format, pg_format = formats[period]
+    if session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(Transfer.date, pg_format)
+    return func.strftime(sqlite_format, Transfer.date)
+
+
+def transfer_flows(session, period: str = 'month') -> List[Tuple[str, float, float, float]]:
+    """
+    按周期分组的资金流
+
+    Args:
+        session: 数据库会话
+        period: 'year' / 'month' / 'day'
+
+    Returns:
+        [(period, deposits, withdrawals, net_flow), ...]，按周期升序
+    """
+    key = _period_key(session, period).label('period')
+    deposits, withdrawals = _flow_columns()
+    rows = session.query(key, deposits, withdrawals).group_by(key).order_by(key).all()
+    return [(p, float(d), float(w), float(d) - float(w)) for p, d, w in rows]
+
+
+def daily_transfer_flows(session) -> List[Tuple[date, float, float, int]]:
+    """
+    按转账日期分组的入金、出金和笔数
+
+    Returns:
+        [(date, deposits, withdrawals, transfer_count), ...]，按日期升序
+    """
+    deposits, withdrawals = _flow_columns()
+    rows = session.query(Transfer.date, deposits, withdrawals, func.count(Transfer.id)).group_by(
+        Transfer.date
+    ).order_by(Transfer.date).all()
+    return [(d, float(dep), float(wd), n) for d, dep, wd, n in rows]
+
+
+def table_counts(session) -> Tuple[int, int, int]:
+    """
+    各核心表的行数（一条语句）
+
+    Returns:
+        (snapshot_count, transfer_count, price_count)
+    """
+    return tuple(session.execute(select(
+        select(func.count()).select_from(Snapshot).scalar_subquery(),
+        select(func.count()).select_from(Transfer).scalar_subquery(),
+        select(func.count()).select_from(PriceHistory).scalar_subquery(),
+    )).one())
+
+
+def snapshot_dates(session) -> List[Tuple[date, int, int, int]]:
+    """
+    按快照日期分组的概览
+
+    Returns:
+        [(date, account_count, symbol_count, row_count), ...]，按日期升序
+    """
+    return [tuple(r) for r in session.query(
+        Snapshot.date,
+        func.count(func.distinct(Snapshot.account_name)),
+        func.count(func.distinct(Snapshot.symbol)),
+        func.count(Snapshot.id),
+    ).group_by(Snapshot.date).order_by(Snapshot.date).all()]
+
+
+def price_coverage(session) -> List[Tuple[str, int, date, date]]:
+    """
+    按资产分组的价格覆盖范围
+
+    Returns:
+        [(symbol, price_count, first_date, last_date), ...]，按资产排序
+    """
+    return [tuple(r) for r in session.query(
+        PriceHistory.symbol, func.count(PriceHistory.id), func.min(PriceHistory.date), func.max(PriceHistory.date)
+    ).group_by(PriceHistory.symbol).order_by(PriceHistory.symbol).all()]
+
+
+def latest_prices(session, symbols: Iterable[str]) -> List[Tuple[str, date, object]]:
+    """
+    各资产最新一条价格的日期和写入时间
+
+    Args:
+        session: 数据库会话
+        symbols: 资产列表
+
+    Returns:
+        [(symbol, date, created_at), ...]，按资产排序；没有价格的资产不在结果中
+    """
+    symbols = sorted({s.upper() for s in symbols})
+    if not symbols:
+        return []
+    latest = session.query(
+        PriceHistory.symbol.label('symbol'), func.max(PriceHistory.date).label('date')
+    ).filter(PriceHistory.symbol.in_(symbols)).group_by(PriceHistory.symbol).subquery()
+
+    return [tuple(r) for r in session.query(PriceHistory.symbol, PriceHistory.date, PriceHistory.created_at).join(
+        latest, and_(PriceHistory.symbol == latest.c.symbol, PriceHistory.date == latest.c.date)
+    ).order_by(PriceHistory.symbol).all()]
+
+
+def snapshots_without_price(session) -> List[Tuple[date, str]]:
+    """
+    快照日期当天及之前都没有任何价格的 (日期, 资产)
+
+    Returns:
+        [(date, symbol), ...]，按日期、资产排序
+    """
+    first_price = session.query(
+        PriceHistory.symbol.label('symbol'), func.min(PriceHistory.date).label('first_date')
+    ).group_by(PriceHistory.symbol).subquery()
+
+    rows = session.query(Snapshot.date, Snapshot.symbol).outerjoin(
+        first_price, first_price.c.symbol == Snapshot.symbol
+    ).filter(
+        (first_price.c.first_date.is_(None)) | (Snapshot.date < first_price.c.first_date)
+    ).distinct().order_by(Snapshot.date, Snapshot.symbol).all()
+    return [tuple(r) for r in rows]
@@ -0,0 +1,222 @@
+"""
+MyLedger - 资产解析注册表
+把资产解析为 (类型, 首选数据源, 数据源 ID) 并持久化到 symbols 表：新资产用 Binance 交易对列表和
+CoinGecko 币种列表解析一次（两份列表在进程内缓存），之后按表中记录直接路由；
+所有数据源都确认没有数据的资产记为负结果，有效期内不再发起请求。
+
+CoinGecko 币种列表中大量符号与股票代码重名（SPY、AAPL 等），只有 Binance 有 /USDT 交易对或在已知
+加密货币名单中的资产才解析为加密货币；仅在币种列表中匹配的资产按股票处理，yfinance 无数据时再用 CoinGecko，
+yfinance 逐个请求确认没有数据而 CoinGecko 有报价时，记录改为直接路由到 CoinGecko
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .models import get_session, SymbolInfo
+from . import upsert
+
+
+CRYPTO, STOCK, UNPRICEABLE = 'crypto', 'stock', 'unpriceable'
+
+# 解析结果的有效期（天），过期后重新解析（例如币种新上架 Binance）
+RESOLVED_TTL_DAYS = 30
+
+# 负结果的有效期（天），过期后重新尝试获取
+NEGATIVE_TTL_DAYS = 7
+
+# 交易对 / 币种列表在进程内的有效期（秒）
+CATALOG_TTL_SECONDS = 6 * 3600
+
+# (Binance 有 /USDT 交易对的币种, {币种: CoinGecko ID})，获取失败的部分为 None
+Catalog = Tuple[Optional[Set[str]], Optional[Dict[str, str]]]
+
+
+@dataclass(frozen=True)
+class SymbolEntry:
+    symbol: str
+    asset_class: str
+    provider: Optional[str] = None
+    provider_id: Optional[str] = None
+    coingecko_id: Optional[str] = None
+    checked_at: Optional[datetime] = None
+
+    @property
+    def providers(self) -> Tuple[str, ...]:
+        """可用的数据源（按默认优先级），负结果为空"""
+        if self.asset_class == CRYPTO:
+            if self.provider == 'ccxt':
+                return ('ccxt', 'coingecko') if self.coingecko_id else ('ccxt',)
+            return ('coingecko',)
+        if self.asset_class == STOCK:
+            return ('yfinance', 'coingecko') if self.coingecko_id else ('yfinance',)
+        return ()
+
+
+class SymbolRegistry:
+    """资产解析结果的内存索引 + symbols 表持久化（线程安全）"""
+
+    def __init__(self, engine, resolved_ttl_days: float = RESOLVED_TTL_DAYS,
+                 negative_ttl_days: float = NEGATIVE_TTL_DAYS, catalog_ttl: float = CATALOG_TTL_SECONDS):
+        """
+        Args:
+            engine: 数据库引擎
+            resolved_ttl_days: 解析结果的有效期（天）
+            negative_ttl_days: 负结果的有效期（天）
+            catalog_ttl: 交易对 / 币种列表的缓存时间（秒）
+        """
+        self.engine = engine
+        self.resolved_ttl = timedelta(days=resolved_ttl_days)
+        self.negative_ttl = timedelta(days=negative_ttl_days)
+        self.catalog_ttl = catalog_ttl
+        self._entries: Optional[Dict[str, SymbolEntry]] = None
+        self._catalog: Optional[Catalog] = None
+        self._catalog_loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    # ============ 读取 ============
+
+    def _load(self) -> Dict[str, SymbolEntry]:
+        """首次使用时一次查询读入整张 symbols 表"""
+        if self._entries is None:
+            session = get_session(self.engine)
+            try:
+                self._entries = {
+                    row.symbol: SymbolEntry(row.symbol, row.asset_class, row.provider, row.provider_id,
+                                            row.coingecko_id, row.checked_at)
+                    for row in session.query(SymbolInfo)
+                }
+            finally:
+                session.close()
+        return self._entries
+
+    def _expired(self, entry: SymbolEntry, now: datetime) -> bool:
+        ttl = self.negative_ttl if entry.asset_class == UNPRICEABLE else self.resolved_ttl
+        return entry.checked_at is None or now - entry.checked_at >= ttl
+
+    def get(self, symbol: str) -> Optional[SymbolEntry]:
+        """读取资产的解析记录（O(1)，不发起网络请求），没有记录返回 None"""
+        with self._lock:
+            return self._load().get(symbol.upper())
+
+    def is_unpriceable(self, symbol: str) -> bool:
+        """是否为有效期内的负结果"""
+        entry = self.get(symbol)
+        return entry is not None and entry.asset_class == UNPRICEABLE and not self._expired(entry, datetime.utcnow())
+
+    def entries(self) -> List[SymbolEntry]:
+        """全部解析记录，按资产排序"""
+        with self._lock:
+            return sorted(self._load().values(), key=lambda e: e.symbol)
+
+    # ============ 解析 ============
+
+    def _get_catalog(self, load_catalog: Callable[[], Catalog]) -> Catalog:
+        """读取交易对 / 币种列表；只缓存两部分都获取成功的结果"""
+        if self._catalog is None or time.monotonic() - self._catalog_loaded_at >= self.catalog_ttl:
+            markets, coins = load_catalog()
+            if markets is None or coins is None:
+                return markets, coins
+            self._catalog = (markets, coins)
+            self._catalog_loaded_at = time.monotonic()
+        return self._catalog
+
+    @staticmethod
+    def _classify(symbol: str, markets: Set[str], coins: Dict[str, str], complete: bool,
+                  known_crypto: Set[str]) -> Optional[Dict]:
+        """按列表解析一个资产；列表不完整且无法确认是加密货币时返回 None（不能断定为股票）"""
+        coin_id = coins.get(symbol)
+        if symbol in markets:
+            return {'asset_class': CRYPTO, 'provider': 'ccxt', 'provider_id': f"{symbol}/USDT", 'coingecko_id': coin_id}
+        if not complete:
+            return None
+        if coin_id and symbol in known_crypto:
+            return {'asset_class': CRYPTO, 'provider': 'coingecko', 'provider_id': coin_id, 'coingecko_id': coin_id}
+        # 仅在 CoinGecko 币种列表中匹配：多半是重名的股票代码，CoinGecko 只作为 yfinance 之后的备用
+        return {'asset_class': STOCK, 'provider': 'yfinance', 'provider_id': symbol, 'coingecko_id': coin_id}
+
+    def resolve(self, symbols: Iterable[str], load_catalog: Callable[[], Catalog],
+                known_crypto: Iterable[str] = ()) -> Dict[str, SymbolEntry]:
+        """
+        解析资产：已有且未过期的记录直接使用，其余按交易对 / 币种列表解析并写入 symbols 表
+
+        Args:
+            symbols: 资产符号
+            load_catalog: 获取 (Binance 币种集合, {币种: CoinGecko ID}) 的函数，只在有待解析资产时调用
+            known_crypto: 已知的加密货币（Binance 未上架时也按加密货币解析，使用 CoinGecko）
+
+        Returns:
+            {symbol: SymbolEntry}，列表获取失败而无法解析的资产不在结果中（调用方按静态规则处理）
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        now = datetime.utcnow()
+        with self._lock:
+            entries = self._load()
+            resolved = {s: entries[s] for s in symbols if s in entries and not self._expired(entries[s], now)}
+            pending = [s for s in symbols if s not in resolved]
+            if not pending:
+                return resolved
+
+            markets, coins = self._get_catalog(load_catalog)
+            complete = markets is not None and coins is not None
+            known_crypto = {s.upper() for s in known_crypto}
+            rows = []
+            for symbol in pending:
+                row = self._classify(symbol, markets or set(), coins or {}, complete, known_crypto)
+                if row is not None:
+                    rows.append({'symbol': symbol, 'checked_at': now, **row})
+            self._save(rows)
+            for row in rows:
+                resolved[row['symbol']] = entries[row['symbol']]
+            return resolved
+
+    def route_to_coingecko(self, symbol: str) -> bool:
+        """
+        首选数据源确认没有数据、CoinGecko 给出了价格时，改为直接路由到 CoinGecko（按加密货币记录）
+
+        用于只在 CoinGecko 币种列表中匹配、实际不是股票的代币：之后的刷新不再先请求 yfinance
+
+        Returns:
+            是否更新了记录（没有记录、没有 CoinGecko ID 或已路由到 CoinGecko 时为 False）
+        """
+        symbol = symbol.upper()
+        with self._lock:
+            entry = self._load().get(symbol)
+            if entry is None or not entry.coingecko_id or entry.provider == 'coingecko':
+                return False
+            self._save([{'symbol': symbol, 'asset_class': CRYPTO, 'provider': 'coingecko',
+                         'provider_id': entry.coingecko_id, 'coingecko_id': entry.coingecko_id,
+                         'checked_at': datetime.utcnow()}])
+        print(f"↪ [Symbols] {symbol} 在 {entry.provider} 没有数据，改为直接使用 CoinGecko ({entry.coingecko_id})")
+        return True
+
+    def mark_unpriceable(self, symbols: Iterable[str]):
+        """记录负结果：所有数据源都确认没有这些资产的数据"""
+        symbols = sorted({s.upper() for s in symbols})
+        if not symbols:
+            return
+        now = datetime.utcnow()
+        with self._lock:
+            self._save([{'symbol': s, 'asset_class': UNPRICEABLE, 'checked_at': now} for s in symbols])
+        print(f"⊘ [Symbols] {', '.join(symbols)} 所有数据源均无数据，"
+              f"{self.negative_ttl.days} 天内不再请求")
+
+    def _save(self, rows: List[Dict]):
+        """写入 symbols 表并更新内存索引（写库失败时仅保留在内存中）"""
+        if not rows:
+            return
+        entries = self._load()
+        for row in rows:
+            entries[row['symbol']] = SymbolEntry(
+                row['symbol'], row['asset_class'], row.get('provider'), row.get('provider_id'),
+                row.get('coingecko_id'), row['checked_at']
+            )
+        session = get_session(self.engine)
+        try:
+            upsert.upsert_symbols(session, rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"✗ [Symbols] 写入 symbols 表失败: {e}")
+        finally:
+            session.close()
@@ -0,0 +1,245 @@
+"""
+MyLedger - 批量 Upsert
+基于 INSERT ... ON CONFLICT DO UPDATE，一条语句写入整批价格或快照（SQLite / PostgreSQL）；
+其他数据库退回到按自然键先查询、再批量 UPDATE / INSERT 的通用写法
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, bindparam, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import Snapshot, Transfer, PriceHistory, SymbolInfo
+
+
+# 单条语句的最大行数（SQLite 对绑定参数数量有上限）
+CHUNK_SIZE = 500
+
+PRICE_KEY = ('date', 'symbol')
+SNAPSHOT_KEY = ('date', 'account_name', 'symbol')
+SYMBOL_KEY = ('symbol',)
+
+# transfers 没有唯一索引（同一天可以有金额相同的多笔转账），迁移时用含写入时间的组合去重
+TRANSFER_KEY = ('date', 'type', 'amount_usd', 'created_at')
+
+# 各核心表的自然键
+NATURAL_KEYS = {
+    Snapshot.__tablename__: SNAPSHOT_KEY,
+    Transfer.__tablename__: TRANSFER_KEY,
+    PriceHistory.__tablename__: PRICE_KEY,
+}
+
+
+def _insert(session, model):
+    """按当前连接的方言返回支持 on_conflict 的 insert 构造，不支持的方言返回 None"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
+
+
+def _existing_keys(session, model, rows: List[Dict], key) -> Set[Tuple]:
+    """rows 中自然键已存在于表中的部分（按键的第一列 IN 查询，再在内存中比对完整的键）"""
+    table = model.__table__
+    wanted = {tuple(row[k] for k in key) for row in rows}
+    query = select(*(table.c[k] for k in key)).where(table.c[key[0]].in_(sorted({k[0] for k in wanted})))
+    return {tuple(row) for row in session.execute(query)} & wanted
+
+
+def _upsert_portable(session, model, rows: List[Dict], key, update_columns) -> int:
+    """
+    不支持 ON CONFLICT 的数据库：每块一次查询已存在的键，再分别 executemany UPDATE / INSERT
+
+    Returns:
+        update_columns 非空时为写入的行数，否则为实际新增的行数
+    """
+    table = model.__table__
+    update_stmt = None
+    if update_columns:
+        update_stmt = update(table).where(and_(*(table.c[k] == bindparam(f"key_{k}") for k in key))) \
+            .values({col: bindparam(col) for col in update_columns})
+
+    affected = 0
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        existing = _existing_keys(session, model, chunk, key)
+        new_rows = [row for row in chunk if tuple(row[k] for k in key) not in existing]
+        if new_rows:
+            session.execute(insert(table), new_rows)
+            affected += len(new_rows)
+        if update_stmt is not None and existing:
+            session.execute(update_stmt, [
+                {**{f"key_{k}": row[k] for k in key}, **{col: row[col] for col in update_columns}}
+                for row in chunk if tuple(row[k] for k in key) in existing
+            ])
+            affected += len(chunk) - len(new_rows)
+    return affected
+
+
+def _dedupe(rows: Iterable[Dict], key) -> List[Dict]:
+    """同一批次内按自然键去重（保留最后一条），ON CONFLICT 不允许同一语句重复命中一行"""
+    unique = {}
+    for row in rows:
+        unique[tuple(row[k] for k in key)] = row
+    return list(unique.values())
+
+
+def _upsert(session, model, rows: List[Dict], key, update_columns) -> int:
+    """分块执行 upsert，返回受影响的行数"""
+    if _insert(session, model) is None:
+        return _upsert_portable(session, model, rows, key, update_columns)
+    affected = 0
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        stmt = _insert(session, model).values(chunk)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key),
+                set_={col: stmt.excluded[col] for col in update_columns}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(key))
+        affected += session.execute(stmt).rowcount
+    return affected
+
+
+def insert_new(session, model, rows: List[Dict], key) -> int:
+    """
+    批量插入，自然键已存在的行跳过
+
+    一条预编译语句 + executemany（驱动按批发送），不像 _upsert 那样按块拼接多行 VALUES，
+    避免大批量写入时每块都重新编译 SQL。有唯一索引的表使用 ON CONFLICT DO NOTHING；
+    没有唯一索引的表（transfers）由调用方预先过滤，这里直接插入
+
+    Args:
+        session: 数据库会话（调用方负责 commit）
+        model: 模型类
+        rows: 行字典（已按 key 去重，列相同）
+        key: 自然键列
+
+    Returns:
+        实际新增的行数
+    """
+    if not rows:
+        return 0
+    stmt = _insert(session, model)
+    if not any(ix.unique for ix in model.__table__.indexes):
+        stmt = insert(model.__table__)
+    elif stmt is None:
+        return _upsert_portable(session, model, rows, key, ())
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(key))
+    return session.connection().execute(stmt, rows).rowcount
+
+
+def upsert_price_history(session, rows: Iterable[Dict]) -> int:
+    """
+    批量写入价格，(date, symbol) 已存在时覆盖价格与来源
+
+    Args:
+        session: 数据库会话（调用方负责 commit）
+        rows: [{'date', 'symbol', 'price_usd', 'source'}]
+
+    Returns:
+        写入的行数
+    """
+    now = datetime.utcnow()
+    rows = _dedupe(({
+        'date': r['date'],
+        'symbol': r['symbol'].upper(),
+        'price_usd': float(r['price_usd']),
+        'source': r.get('source'),
+        'created_at': now
+    } for r in rows), PRICE_KEY)
+    if not rows:
+        return 0
+
+    _upsert(session, PriceHistory, rows, PRICE_KEY, ('price_usd', 'source', 'created_at'))
+    return len(rows)
+
+
+def upsert_snapshots(session, rows: Iterable[Dict], overwrite: bool = True) -> int:
+    """
+    批量写入快照
+
+    Args:
+        session: 数据库会话（调用方负责 commit）
+        rows: [{'date', 'account_name', 'symbol', 'quantity'}]
+        overwrite: True 时覆盖已存在行的数量；False 时已存在的行保持不变
+
+    Returns:
+        overwrite=True 时为写入的行数；False 时为实际新增的行数
+    """
+    now = datetime.utcnow()
+    rows = _dedupe(({
+        'date': r['date'],
+        'account_name': r['account_name'],
+        'symbol': r['symbol'].upper(),
+        'quantity': float(r['quantity']),
+        'created_at': now
+    } for r in rows), SNAPSHOT_KEY)
+    if not rows:
+        return 0
+
+    if not overwrite:
+        return _upsert(session, Snapshot, rows, SNAPSHOT_KEY, ())
+
+    _upsert(session, Snapshot, rows, SNAPSHOT_KEY, ('quantity', 'created_at'))
+    return len(rows)
+
+
+def upsert_symbols(session, rows: Iterable[Dict]) -> int:
+    """
+    批量写入资产解析结果，symbol 已存在时整行覆盖
+
+    Args:
+        session: 数据库会话（调用方负责 commit）
+        rows: [{'symbol', 'asset_class', 'provider', 'provider_id', 'coingecko_id'}]
+
+    Returns:
+        写入的行数
+    """
+    now = datetime.utcnow()
+    rows = _dedupe(({
+        'symbol': r['symbol'].upper(),
+        'asset_class': r['asset_class'],
+        'provider': r.get('provider'),
+        'provider_id': r.get('provider_id'),
+        'coingecko_id': r.get('coingecko_id'),
+        'checked_at': r.get('checked_at') or now
+    } for r in rows), SYMBOL_KEY)
+    if not rows:
+        return 0
+
+    _upsert(session, SymbolInfo, rows, SYMBOL_KEY,
+            ('asset_class', 'provider', 'provider_id', 'coingecko_id', 'checked_at'))
+    return len(rows)
+
+
+def dedupe_and_index(conn, model, key) -> Optional[int]:
+    """
+    为旧库补建自然键唯一索引（create_all 不会给已存在的表加索引），由迁移调用一次。
+    建索引前删除重复行，每组保留 id 最大（最后写入）的一行；被删除的行先复制到 <表名>_duplicates 备份表
+
+    Args:
+        conn: 处于事务中的连接
+        model: 模型类
+        key: 自然键列
+
+    Returns:
+        删除的行数；索引已存在时为 None
+    """
+    table = model.__tablename__
+    index = next(ix for ix in model.__table__.indexes if ix.unique)
+    if conn.dialect.has_index(conn, table, index.name):
+        return None
+
+    duplicates = f"id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {', '.join(key)})"
+    removed = conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {duplicates}")).scalar()
+    if removed:
+        backup = f"{table}_duplicates"
+        conn.execute(text(f"CREATE TABLE {backup} AS SELECT * FROM {table} WHERE {duplicates}"))
+        conn.execute(text(f"DELETE FROM {table} WHERE {duplicates}"))
+        print(f"⚠️  [Migration] {table}: 删除 {removed} 条自然键重复的行（已备份到 {backup} 表）")
+    index.create(conn)
+    return removed
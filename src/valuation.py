@@ -0,0 +1,276 @@
+"""
+MyLedger - 估值引擎
+一次性拉取快照与价格，用 as-of join 计算整段日期范围的持仓市值
+"""
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+import pandas as pd
+from sqlalchemy import func, insert
+from .models import Snapshot, PriceHistory, DailyValuation
+
+
+VALUATION_COLUMNS = ['date', 'account_name', 'symbol', 'quantity', 'price', 'value']
+
+
+def load_holdings(session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                  symbols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    读取日期范围内每个估值日期的 as-of 持仓（两次查询）
+
+    估值日期为任一账户有快照的日期；每个账户在估值日期上的持仓是它在该日期或之前最近一次的快照，
+    所以保存快照时不必把其他账户的持仓复制到新日期。
+
+    Args:
+        session: 数据库会话
+        start_date: 起始日期（含），None 表示不限；更早的快照仍会作为 as-of 持仓参与计算
+        end_date: 结束日期（含），None 表示不限
+        symbols: 仅读取这些资产，None 表示全部
+
+    Returns:
+        DataFrame[date, account_name, symbol, quantity]
+    """
+    columns = ['date', 'account_name', 'symbol', 'quantity']
+
+    # 1. 各账户的快照日期（不按资产过滤：某账户新快照里没有该资产即表示已清仓）
+    query = session.query(Snapshot.account_name, Snapshot.date).distinct()
+    if end_date is not None:
+        query = query.filter(Snapshot.date <= end_date)
+    snapshot_dates = pd.DataFrame(query.all(), columns=['account_name', 'snapshot_date'])
+    if snapshot_dates.empty:
+        return pd.DataFrame(columns=columns)
+
+    valuation_dates = sorted(set(snapshot_dates['snapshot_date']))
+    if start_date is not None:
+        valuation_dates = [d for d in valuation_dates if d >= start_date]
+    if not valuation_dates:
+        return pd.DataFrame(columns=columns)
+
+    # 2. 账户 × 估值日期 -> 该账户 as-of 的快照日期
+    accounts = snapshot_dates['account_name'].unique()
+    grid = pd.DataFrame({
+        'account_name': accounts.repeat(len(valuation_dates)),
+        'date': valuation_dates * len(accounts),
+    })
+    grid['_ts'] = pd.to_datetime(grid['date'])
+    right = snapshot_dates.assign(_ts=pd.to_datetime(snapshot_dates['snapshot_date'])).sort_values('_ts')
+    grid = pd.merge_asof(grid.sort_values('_ts'), right, on='_ts', by='account_name', direction='backward')
+    grid = grid.dropna(subset=['snapshot_date']).drop(columns='_ts')
+    if grid.empty:
+        return pd.DataFrame(columns=columns)
+
+    # 3. 读取被引用的快照行并展开到估值日期
+    query = session.query(
+        Snapshot.date, Snapshot.account_name, Snapshot.symbol, Snapshot.quantity
+    ).filter(Snapshot.date >= grid['snapshot_date'].min(), Snapshot.date <= max(valuation_dates))
+    if symbols is not None:
+        query = query.filter(Snapshot.symbol.in_(sorted(set(symbols))))
+    rows = pd.DataFrame(query.all(), columns=['snapshot_date', 'account_name', 'symbol', 'quantity'])
+
+    holdings = grid.merge(rows, on=['account_name', 'snapshot_date'])
+    holdings = holdings.sort_values(['date', 'account_name'], kind='stable').reset_index(drop=True)
+    return holdings[columns]
+
+
+def load_prices(session, symbols, end_date: Optional[date] = None) -> pd.DataFrame:
+    """
+    读取指定资产在 end_date 及之前的全部价格（单次查询）
+
+    Args:
+        session: 数据库会话
+        symbols: 资产符号集合
+        end_date: 截止日期（含），None 表示不限
+
+    Returns:
+        DataFrame[date, symbol, price]
+    """
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return pd.DataFrame(columns=['date', 'symbol', 'price'])
+
+    query = session.query(
+        PriceHistory.date, PriceHistory.symbol, PriceHistory.price_usd
+    ).filter(PriceHistory.symbol.in_(symbols))
+    if end_date is not None:
+        query = query.filter(PriceHistory.date <= end_date)
+
+    rows = query.order_by(PriceHistory.date, PriceHistory.id).all()
+    return pd.DataFrame(rows, columns=['date', 'symbol', 'price'])
+
+
+def attach_prices(holdings: pd.DataFrame, prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    为每一行持仓匹配"当日或之前最近一次"的价格并计算市值
+
+    Args:
+        holdings: DataFrame[date, account_name, symbol, quantity]
+        prices: DataFrame[date, symbol, price]
+
+    Returns:
+        DataFrame[date, account_name, symbol, quantity, price, value]，
+        缺少价格的行 price/value 为 0
+    """
+    if holdings.empty:
+        return pd.DataFrame(columns=VALUATION_COLUMNS)
+
+    left = holdings.copy()
+    left['_ts'] = pd.to_datetime(left['date'])
+    left['_row'] = range(len(left))
+    left = left.sort_values('_ts', kind='stable')
+
+    if prices.empty:
+        left['price'] = float('nan')
+    else:
+        right = prices[['date', 'symbol', 'price']].copy()
+        right['_ts'] = pd.to_datetime(right['date'])
+        # 同一天同一资产有多条记录时保留最后写入的一条
+        right = right.drop(columns='date').drop_duplicates(['_ts', 'symbol'], keep='last')
+        right = right.sort_values('_ts', kind='stable')
+        left = pd.merge_asof(left, right, on='_ts', by='symbol', direction='backward')
+
+    left = left.sort_values('_row').drop(columns=['_ts', '_row']).reset_index(drop=True)
+    left['price'] = left['price'].fillna(0.0).astype(float)
+    left['value'] = left['quantity'].astype(float) * left['price']
+    return left[VALUATION_COLUMNS]
+
+
+def build_valuation_frame(session, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          symbols: Optional[Iterable[str]] = None, price_matrix=None) -> pd.DataFrame:
+    """
+    计算日期范围内每个快照日期的逐行估值（共两次查询；传入价格矩阵时只有一次）
+
+    Args:
+        session: 数据库会话
+        start_date: 起始日期（含）
+        end_date: 结束日期（含）
+        symbols: 仅计算这些资产，None 表示全部
+        price_matrix: 可选的 PriceMatrix，提供时直接用它做 as-of 查价
+
+    Returns:
+        DataFrame[date, account_name, symbol, quantity, price, value]
+    """
+    holdings = load_holdings(session, start_date, end_date, symbols)
+    if holdings.empty:
+        return pd.DataFrame(columns=VALUATION_COLUMNS)
+
+    if price_matrix is not None:
+        frame = holdings.copy()
+        frame['price'] = price_matrix.lookup(frame['symbol'].tolist(), frame['date'].tolist())
+        frame['price'] = frame['price'].fillna(0.0)
+        frame['value'] = frame['quantity'].astype(float) * frame['price']
+        return frame[VALUATION_COLUMNS]
+
+    prices = load_prices(session, holdings['symbol'].unique(), holdings['date'].max())
+    return attach_prices(holdings, prices)
+
+
+# ============ 物化估值表 daily_valuation ============
+
+def refresh_daily_valuation(session, since: Optional[date] = None, symbols: Optional[Iterable[str]] = None,
+                            price_matrix=None) -> int:
+    """
+    增量重算 daily_valuation：只处理 since 及之后的日期（价格会向后延续，所以之后的日期同样受影响）
+
+    Args:
+        session: 数据库会话（调用方负责 commit）
+        since: 受影响的最早日期，None 表示全量重建
+        symbols: 仅重算这些资产（价格写入时使用），None 表示全部资产
+        price_matrix: 可选的 PriceMatrix（需已包含最新写入的价格）
+
+    Returns:
+        写入的行数
+    """
+    symbols = {s.upper() for s in symbols} if symbols is not None else None
+
+    frame = build_valuation_frame(session, start_date=since, symbols=symbols, price_matrix=price_matrix)
+
+    stale = session.query(DailyValuation)
+    if since is not None:
+        stale = stale.filter(DailyValuation.date >= since)
+    if symbols is not None:
+        stale = stale.filter(DailyValuation.symbol.in_(symbols))
+    stale.delete(synchronize_session=False)
+
+    if frame.empty:
+        return 0
+
+    # 同一天同一账户同一资产若有重复快照行，按原逻辑累加
+    rows = frame.groupby(['date', 'account_name', 'symbol'], as_index=False).agg(
+        quantity=('quantity', 'sum'), price=('price', 'last'), value=('value', 'sum')
+    )
+    now = datetime.utcnow()
+    records = [{
+        'date': r.date,
+        'account_name': r.account_name,
+        'symbol': r.symbol,
+        'quantity': float(r.quantity),
+        'price_usd': float(r.price),
+        'value_usd': float(r.value),
+        'updated_at': now
+    } for r in rows.itertuples(index=False)]
+
+    session.execute(insert(DailyValuation), records)
+    return len(records)
+
+
+def ensure_daily_valuation(session) -> int:
+    """估值表为空但已有快照时（新库、迁移后）做一次全量构建"""
+    if session.query(DailyValuation.date).first() is not None:
+        return 0
+    if session.query(Snapshot.id).first() is None:
+        return 0
+
+    count = refresh_daily_valuation(session)
+    session.commit()
+    return count
+
+
+def load_daily_valuation(session, target_date: date) -> pd.DataFrame:
+    """
+    读取单个日期的物化估值明细
+
+    Returns:
+        DataFrame[account_name, symbol, quantity, price, value]，无数据时为空 DataFrame
+    """
+    rows = session.query(
+        DailyValuation.account_name, DailyValuation.symbol, DailyValuation.quantity,
+        DailyValuation.price_usd, DailyValuation.value_usd
+    ).filter(DailyValuation.date == target_date).order_by(
+        DailyValuation.account_name, DailyValuation.symbol
+    ).all()
+
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows, columns=['account_name', 'symbol', 'quantity', 'price', 'value'])
+
+
+def load_net_worth_history(session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+    """
+    按日期读取净值历史（daily_valuation 上的一次范围扫描 + 分组求和）
+
+    Returns:
+        DataFrame[date, net_worth]，无数据时为空 DataFrame
+    """
+    query = session.query(DailyValuation.date, func.sum(DailyValuation.value_usd))
+    if start_date is not None:
+        query = query.filter(DailyValuation.date >= start_date)
+    if end_date is not None:
+        query = query.filter(DailyValuation.date <= end_date)
+
+    rows = query.group_by(DailyValuation.date).order_by(DailyValuation.date).all()
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows, columns=['date', 'net_worth'])
+
+
+def held_symbols(session) -> List[str]:
+    """
+    最新估值日期上持有（数量大于 0）的资产（daily_valuation 上的一次查询）
+
+    Returns:
+        资产列表（排序），无估值数据时为空列表
+    """
+    latest = session.query(func.max(DailyValuation.date)).scalar_subquery()
+    rows = session.query(DailyValuation.symbol).filter(
+        DailyValuation.date == latest, DailyValuation.quantity > 0
+    ).distinct().order_by(DailyValuation.symbol).all()
+    return [symbol for (symbol,) in rows]
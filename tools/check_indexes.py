@@ -0,0 +1,77 @@
+"""
+Index Usage Check
+在临时的合成账本上执行数据库迁移后对热点查询做 EXPLAIN，确认 as-of 价格查询和账户最近持仓查询走索引查找。
+任一查询退化为全表扫描时以非零状态码退出，可用于 CI。
+
+默认不读写真实账本；--db 显式指定数据库时只做 EXPLAIN（不执行迁移，不修改数据）。
+
+用法（在项目根目录）:
+    python tools/check_indexes.py
+    python tools/check_indexes.py --db local_ledger.db
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import LedgerSpec, build_ledger
+from src.models import get_engine
+from src import migrations
+
+
+# 临时账本的规模：足以让规划器在全表扫描和索引查找之间做出区分
+SPEC = LedgerSpec(accounts=3, symbols=20, dates=60, transfers=20)
+
+
+def _explain(engine) -> bool:
+    all_ok = True
+    for name, ok, plan in migrations.explain_hot_queries(engine):
+        all_ok = all_ok and ok
+        print(f"\n{'✅' if ok else '❌'} {name}")
+        for line in plan.splitlines():
+            print(f"   {line}")
+    return all_ok
+
+
+def check_indexes(db_url=None):
+    """
+    检查热点查询的执行计划
+
+    Args:
+        db_url: 要检查的数据库（默认 None：在临时目录生成合成账本并执行迁移）
+
+    Returns:
+        所有热点查询是否都走索引查找
+    """
+    print("=" * 60)
+    print("🔍 热点查询执行计划检查")
+    print("=" * 60)
+
+    if db_url is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'indexes.db')
+            build_ledger(db_path, SPEC)
+            engine = get_engine(db_path)
+            migrations.upgrade(engine)
+            all_ok = _explain(engine)
+            engine.dispose()
+    else:
+        print(f"⚠️  检查指定数据库: {db_url}")
+        print("   只执行 EXPLAIN，不执行迁移；缺少索引时请先启动应用或运行 db_init.py 完成迁移")
+        engine = get_engine(db_url)
+        all_ok = _explain(engine)
+        engine.dispose()
+
+    print("\n" + "=" * 60)
+    print("✅ 所有热点查询均使用索引查找" if all_ok else "❌ 存在全表扫描的热点查询")
+    print("=" * 60)
+    return all_ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="热点查询索引检查")
+    parser.add_argument('--db', help="检查指定的数据库 URL 或 SQLite 路径（默认使用临时合成账本）")
+    args = parser.parse_args()
+    sys.exit(0 if check_indexes(args.db) else 1)
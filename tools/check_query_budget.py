@@ -0,0 +1,157 @@
+"""
+Query Budget Check
+用 Streamlit AppTest 在两种规模的合成账本上渲染各页面，并调用 save_snapshots_batch 保存不同数量的持仓，
+统计执行的 SQL 语句数（src/instrumentation.py 的计数器）。
+每个页面 / 操作的语句数必须不超过预算，且不能随持仓数、日期数增长（防止逐行查询的 N+1 写法回归）。
+任一检查失败时以非零状态码退出，可用于 CI。
+
+用法（在项目根目录）:
+    python tools/check_query_budget.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.synthetic import LedgerSpec, build_ledger
+
+
+# 两种规模：持仓数、日期数都相差数倍
+SPECS = {
+    'small': LedgerSpec(accounts=2, symbols=6, dates=10, transfers=5),
+    'large': LedgerSpec(accounts=6, symbols=40, dates=120, transfers=200),
+}
+
+# 各页面冷渲染（结果缓存为空）与保存快照允许的最多语句数
+BUDGETS = {
+    'dashboard': 15,
+    'data_entry': 10,
+    'price_update': 10,
+    'data_view': 10,
+    'save_snapshot': 15,
+}
+
+# 保存快照时分别写入的持仓行数
+SAVE_SIZES = (2, 50)
+
+RESULT_PREFIX = 'QUERY_BUDGET '
+
+
+# ============ 子进程：单个规模 ============
+
+def _statements():
+    from src.instrumentation import monitor
+    return monitor.total_statements
+
+
+def _render_counts(pages):
+    from streamlit.testing.v1 import AppTest
+    from src.data_cache import cache as data_cache
+
+    def new_app():
+        at = AppTest.from_file(os.path.join(PROJECT_ROOT, 'app.py'), default_timeout=120)
+        at.session_state['password_correct'] = True
+        return at
+
+    # 预热：建表迁移、物化估值、价格矩阵加载等进程级初始化不计入
+    new_app().run()
+
+    counts = {}
+    for key, label in pages.items():
+        at = new_app()
+        if label is not None:
+            at.run()
+            at.sidebar.radio[0].set_value(label)
+        data_cache.clear()
+        before = _statements()
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{key} 渲染异常: {at.exception[0].value}")
+        counts[key] = _statements() - before
+    return counts
+
+
+def _save_counts():
+    import pandas as pd
+    from datetime import date, timedelta
+    import app
+
+    counts = []
+    target = (app.get_latest_snapshot_date() or date.today()) + timedelta(days=1)
+    for size in SAVE_SIZES:
+        rows = pd.DataFrame({
+            'Symbol': [f"Q{i:03d}" for i in range(size)],
+            'Quantity': [1.0 + i for i in range(size)],
+        })
+        before = _statements()
+        app.save_snapshots_batch(target, 'Budget-Check', rows)
+        counts.append(_statements() - before)
+    return max(counts), counts
+
+
+def run_worker(spec: LedgerSpec):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'budget.db')
+        build_ledger(db_path, spec)
+        os.environ['DB_URL'] = db_path
+
+        from src import lang as L
+        counts = _render_counts({
+            'dashboard': None,
+            'data_entry': L.NAV_DATA_ENTRY,
+            'price_update': L.NAV_PRICE_UPDATE,
+            'data_view': L.NAV_DATA_VIEW,
+        })
+        counts['save_snapshot'], save_detail = _save_counts()
+
+    print(RESULT_PREFIX + json.dumps({'counts': counts, 'save_detail': save_detail}))
+
+
+# ============ 主进程 ============
+
+def run_spec(name):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(SPECS[name].to_dict())],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"规模 {name} 运行失败:\n{result.stderr[-3000:]}")
+
+
+def check_query_budget():
+    print("=" * 60)
+    print("🧮 页面 SQL 语句预算检查")
+    print("=" * 60)
+
+    results = {}
+    for name, spec in SPECS.items():
+        print(f"⏳ {name}: {spec.label()} ...", flush=True)
+        results[name] = run_spec(name)
+
+    small, large = results['small'], results['large']
+    print(f"\n  {'页面 / 操作':16s} {'small':>6s} {'large':>6s} {'预算':>6s}")
+    all_ok = True
+    for key, budget in BUDGETS.items():
+        a, b = small['counts'][key], large['counts'][key]
+        ok = b <= budget and a <= budget and b <= a
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {key:16s} {a:6d} {b:6d} {budget:6d}")
+    print(f"\n  保存 {SAVE_SIZES} 行持仓的语句数: small {small['save_detail']}, large {large['save_detail']}")
+
+    print("\n" + "=" * 60)
+    print("✅ 语句数均在预算内且不随数据量增长" if all_ok else "❌ 存在超出预算或随数据量增长的页面 / 操作")
+    print("=" * 60)
+    return all_ok
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--worker':
+        run_worker(LedgerSpec(**json.loads(sys.argv[2])))
+    else:
+        sys.exit(0 if check_query_budget() else 1)
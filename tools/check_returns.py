@@ -0,0 +1,85 @@
+"""
+Returns Engine Check
+用手工可算出结果的小序列验证 src/returns.py 的 TWR、ROI、IRR 与滚动 APY，
+包括退化现金流（IRR 无解时必须为 NaN，不能返回初始猜测值）。
+任一检查失败时以非零状态码退出，可用于 CI。
+
+用法（在项目根目录）:
+    python tools/check_returns.py
+"""
+import math
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import returns
+
+D0 = date(2024, 1, 1)
+
+
+def _days(*offsets):
+    return [D0 + timedelta(days=n) for n in offsets]
+
+
+def _close(a, b, tol=1e-6):
+    return (math.isnan(a) and math.isnan(b)) or abs(a - b) <= tol
+
+
+def _period(dates, values, flow_dates=(), deposits=(), withdrawals=()):
+    cum_deposits = returns.cumulative_flows(dates, flow_dates, deposits)
+    cum_withdrawals = returns.cumulative_flows(dates, flow_dates, withdrawals)
+    return returns.analyze(dates, values, cum_deposits, cum_withdrawals)['periods']['all']
+
+
+# (名称, 实际值, 期望值)
+def _cases():
+    # 一年增长 10%，无资金流：TWR = ROI = IRR = 10%
+    p = _period(_days(0, 365), [100, 110])
+    yield "无资金流 TWR", p['twr'], 10.0
+    yield "无资金流 ROI", p['roi'], 10.0
+    yield "无资金流 IRR", p['irr'], (1.1 ** (returns.DAYS_PER_YEAR / 365) - 1) * 100
+
+    # 中途入金 100 且当天无盈亏：TWR 只计算投资收益
+    p = _period(_days(0, 100, 365), [100, 200, 220], _days(100), [100], [0])
+    yield "入金后 TWR", p['twr'], 10.0
+    yield "入金后净流入", p['net_cash_flow'], 100.0
+
+    # 期初净值为 0、当天入金后无盈亏：NPV 与利率无关，IRR 无解
+    p = _period(_days(0, 1), [0, 100], _days(1), [100], [0])
+    yield "退化现金流 IRR", p['irr'], math.nan
+
+    # 全零现金流
+    yield "全零现金流 IRR", float(returns.irr([[0.0, 0.0]], [[0.0, 1.0]])[0]) * 100, math.nan
+
+    # 一行退化不影响同一批次里其他行收敛
+    rates = returns.irr([[-100.0, 110.0], [0.0, 0.0]], [[0.0, 1.0], [0.0, 1.0]])
+    yield "批量求解（正常行）", float(rates[0]) * 100, 10.0
+
+    # 滚动 APY：7 天窗口内每天增长相同
+    dates = _days(*range(8))
+    growth = [1.001 ** n for n in range(8)]
+    apy = returns.rolling_apy(dates, growth, 7)
+    yield "7 天滚动 APY", float(apy[-1]) * 100, (1.001 ** returns.DAYS_PER_YEAR - 1) * 100
+
+
+def check_returns():
+    print("=" * 60)
+    print("📐 收益率引擎检查")
+    print("=" * 60)
+
+    all_ok = True
+    for name, actual, expected in _cases():
+        ok = _close(actual, expected)
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {name:20s} 实际 {actual:12.6f}  期望 {expected:12.6f}")
+
+    print("\n" + "=" * 60)
+    print("✅ 收益率计算符合预期" if all_ok else "❌ 存在计算错误")
+    print("=" * 60)
+    return all_ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_returns() else 1)
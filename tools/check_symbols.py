@@ -0,0 +1,120 @@
+"""
+Symbol Resolution Check
+用固定的交易对 / 币种列表（不发起网络请求）在临时数据库上解析一组资产，确认分类与数据源顺序：
+与 CoinGecko 代币重名的股票代码（SPY、AAPL 等）必须解析为股票并优先使用 yfinance；
+用替身数据源检查路由更新：yfinance 逐个确认没有数据、CoinGecko 有报价的代币改为直接使用 CoinGecko，
+批量结果中只是缺失的股票保持原路由，也不记为无报价。
+任一检查失败时以非零状态码退出，可用于 CI。
+
+用法（在项目根目录）:
+    python tools/check_symbols.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models import get_engine
+from src import migrations
+from src.price_service import PriceService
+from src.quote_cache import QuoteCache
+from src.symbol_registry import SymbolRegistry, CRYPTO, STOCK
+
+# Binance 有 /USDT 交易对的币种
+MARKETS = {'BTC', 'ETH', 'SOL'}
+
+# CoinGecko 币种列表（符号唯一对应的部分）：包含与股票代码重名的代币
+COINS = {'BTC': 'bitcoin', 'ETH': 'ethereum', 'NEAR': 'near', 'SPY': 'spy-token', 'AAPL': 'apple-tokenized',
+         'NVDA': 'nvidia-meme', 'OBSCURE': 'obscure-coin'}
+
+# (资产, 期望类型, 期望数据源顺序)
+EXPECTED = [
+    ('BTC', CRYPTO, ('ccxt', 'coingecko')),
+    ('SOL', CRYPTO, ('ccxt',)),
+    ('NEAR', CRYPTO, ('coingecko',)),               # 已知加密货币，Binance 未上架
+    ('SPY', STOCK, ('yfinance', 'coingecko')),      # 与代币重名的股票代码
+    ('AAPL', STOCK, ('yfinance', 'coingecko')),
+    ('NVDA', STOCK, ('yfinance', 'coingecko')),
+    ('OBSCURE', STOCK, ('yfinance', 'coingecko')),  # 只在币种列表中：yfinance 无数据时用 CoinGecko
+    ('QQQ', STOCK, ('yfinance',)),
+]
+
+
+def check_symbols():
+    print("=" * 60)
+    print("🔎 资产解析检查")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_engine(os.path.join(tmp, 'symbols.db'))
+        migrations.upgrade(engine)
+        registry = SymbolRegistry(engine)
+        known = PriceService.CRYPTO_SYMBOLS | set(PriceService.COINGECKO_IDS)
+        registry.resolve([s for s, _, _ in EXPECTED], lambda: (MARKETS, dict(COINS)), known_crypto=known)
+
+        # 重新读表：确认持久化后的结果一致
+        reloaded = SymbolRegistry(engine)
+        all_ok = True
+        for symbol, asset_class, providers in EXPECTED:
+            entry = reloaded.get(symbol)
+            got = (entry.asset_class, entry.providers) if entry else (None, ())
+            ok = got == (asset_class, providers)
+            all_ok = all_ok and ok
+            print(f"{'✅' if ok else '❌'} {symbol:8s} {got[0] or '-':8s} {' -> '.join(got[1]) or '-'}")
+        engine.dispose()
+
+    print("\n" + "=" * 60)
+    print("✅ 资产解析符合预期" if all_ok else "❌ 存在解析错误的资产")
+    print("=" * 60)
+    return all_ok
+
+
+# ============ 路由更新（替身数据源，不发起网络请求） ============
+
+# 替身数据源的报价：yfinance 有 SPY、QQQ（批量结果中缺失，模拟部分失败），CoinGecko 有 SPY 和 OBSCURE；
+# GONE 只有 yfinance 一个数据源且逐个请求也没有数据
+YF_QUOTES = {'SPY': 500.0, 'QQQ': 400.0}
+CG_QUOTES = {'SPY': 0.01, 'OBSCURE': 0.5}
+
+
+def _stub_service(registry) -> PriceService:
+    service = PriceService(retry_count=1, quote_cache=QuoteCache(), registry=registry)
+    service._fetch_stock_price_yfinance = YF_QUOTES.get
+    service._fetch_crypto_price_coingecko = CG_QUOTES.get
+    service._fetch_stock_prices_yfinance = lambda symbols: {}
+    service._fetch_crypto_prices_coingecko = lambda symbols: {s: CG_QUOTES[s] for s in symbols if s in CG_QUOTES}
+    return service
+
+
+def check_routing():
+    print("\n🔀 路由更新检查")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_engine(os.path.join(tmp, 'routing.db'))
+        migrations.upgrade(engine)
+        registry = SymbolRegistry(engine)
+        symbols = ['SPY', 'OBSCURE', 'QQQ', 'GONE']
+        registry.resolve(symbols, lambda: (MARKETS, dict(COINS)))
+        quotes = _stub_service(registry).fetch_quotes(symbols)
+
+        reloaded = SymbolRegistry(engine)
+        checks = [
+            ('OBSCURE 改为直接使用 CoinGecko', reloaded.get('OBSCURE').providers == ('coingecko',)),
+            ('SPY 批量缺失后仍为股票', reloaded.get('SPY').providers == ('yfinance', 'coingecko')),
+            ('OBSCURE 报价来自 CoinGecko', quotes['OBSCURE'] == (0.5, 'coingecko')),
+            ('QQQ 批量缺失后逐个获取成功', quotes['QQQ'] == (400.0, 'yfinance')),
+            ('QQQ 不记为无报价', not reloaded.is_unpriceable('QQQ')),
+            ('GONE 逐个确认后记为无报价', reloaded.is_unpriceable('GONE')),
+        ]
+        engine.dispose()
+
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == '__main__':
+    ok = check_symbols()
+    ok = check_routing() and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,121 @@
+"""
+Snapshot Compaction Tool
+估值按 as-of 持仓计算（每个账户取估值日期或之前最近一次快照），旧版"自动继承"复制到新日期的快照行已经多余。
+本工具删除与该账户上一次快照完全相同的快照，删除前后逐行对比估值结果，不一致则回滚。
+
+用法（在项目根目录）:
+    python tools/compact_snapshots.py [DB_URL] [--dry-run]
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models import get_engine, get_session, Snapshot
+from src import valuation
+from src import migrations
+from src.upsert import CHUNK_SIZE
+
+
+def find_redundant_snapshots(session):
+    """
+    找出可删除的快照行
+
+    某账户在某日期的快照（资产与数量的集合）与它上一次快照完全相同即为冗余；
+    若某日期所有账户都冗余，保留其中一个账户，以免该日期从净值历史中消失
+
+    Returns:
+        [(date, account_name, [snapshot_id, ...]), ...]
+    """
+    rows = session.query(
+        Snapshot.id, Snapshot.date, Snapshot.account_name, Snapshot.symbol, Snapshot.quantity
+    ).order_by(Snapshot.account_name, Snapshot.date).all()
+
+    # (account, date) -> ids / 持仓集合
+    ids, holdings = {}, {}
+    for snapshot_id, snapshot_date, account_name, symbol, quantity in rows:
+        key = (account_name, snapshot_date)
+        ids.setdefault(key, []).append(snapshot_id)
+        holdings.setdefault(key, set()).add((symbol, quantity))
+
+    redundant = {}
+    previous = {}
+    for account_name, snapshot_date in holdings:  # 已按账户、日期排序
+        key = (account_name, snapshot_date)
+        if previous.get(account_name) == holdings[key]:
+            redundant[key] = ids[key]
+        previous[account_name] = holdings[key]
+
+    accounts_by_date = {}
+    for account_name, snapshot_date in holdings:
+        accounts_by_date.setdefault(snapshot_date, []).append(account_name)
+    for snapshot_date, accounts in accounts_by_date.items():
+        if all((a, snapshot_date) in redundant for a in accounts):
+            del redundant[(min(accounts), snapshot_date)]
+
+    return sorted((d, a, snapshot_ids) for (a, d), snapshot_ids in redundant.items())
+
+
+def _valuation_rows(session):
+    holdings = valuation.load_holdings(session)
+    return holdings.sort_values(['date', 'account_name', 'symbol']).reset_index(drop=True)
+
+
+def compact_snapshots(db_url='local_ledger.db', dry_run=False):
+    engine = get_engine(db_url)
+    migrations.upgrade(engine)
+    session = get_session(engine)
+
+    print("=" * 60)
+    print("🗜️  快照压缩工具")
+    print("=" * 60)
+
+    try:
+        total = session.query(Snapshot).count()
+        redundant = find_redundant_snapshots(session)
+        delete_ids = [i for _, _, snapshot_ids in redundant for i in snapshot_ids]
+
+        print(f"\n📋 快照共 {total} 行，其中 {len(delete_ids)} 行与账户上一次快照相同:")
+        for snapshot_date, account_name, snapshot_ids in redundant:
+            print(f"  {snapshot_date} | {account_name:15s} | {len(snapshot_ids)} 行")
+
+        if not delete_ids:
+            print("\n✅ 没有需要压缩的快照")
+            return 0
+        if dry_run:
+            print("\n⊘ --dry-run：未做任何修改")
+            return 0
+
+        confirm = input(f"\n请输入 'YES' 确认删除 {len(delete_ids)} 行: ")
+        if confirm != 'YES':
+            print("\n❌ 操作已取消")
+            return 0
+
+        before = _valuation_rows(session)
+        for start in range(0, len(delete_ids), CHUNK_SIZE):
+            session.query(Snapshot).filter(
+                Snapshot.id.in_(delete_ids[start:start + CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        after = _valuation_rows(session)
+
+        if not before.equals(after):
+            session.rollback()
+            print("\n❌ 压缩后 as-of 持仓与压缩前不一致，已回滚")
+            return 0
+
+        session.commit()
+        print(f"\n✅ 已删除 {len(delete_ids)} 行，剩余 {total - len(delete_ids)} 行（估值结果不变）")
+        return len(delete_ids)
+
+    except Exception as e:
+        session.rollback()
+        print(f"\n❌ 压缩失败: {e}")
+        raise
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db_url = args[0] if args else (os.getenv("DB_URL") or 'local_ledger.db')
+    compact_snapshots(db_url, dry_run='--dry-run' in sys.argv[1:])
@@ -1,54 +1,140 @@
 # -*- coding: utf-8 -*-
 """
 MyLedger SQL Dump Tool: SQLite -> SQL Text
+
+以 fetchmany 分块流式读取快照、转账、价格（内存占用与数据量无关），所有值都经过转义后输出为：
+  - insert（默认）: 多行 INSERT ... VALUES (...),(...)，每批 --batch-size 行；快照和价格带 ON CONFLICT DO NOTHING，
+                    可直接粘贴到 Supabase SQL Editor，重复执行不会产生重复行（转账没有唯一键，重复执行会重复）
+  - copy: PostgreSQL COPY ... FROM stdin 块，用 psql 回放最快（目标表需为空）
+
+用法（在项目根目录）:
+    python tools/dump_to_sql.py                              # -> supabase_import.sql
+    python tools/dump_to_sql.py --format copy --gzip         # -> supabase_import.sql.gz
+    gunzip -c supabase_import.sql.gz | psql "$DB_URL"
 """
-import sqlite3
+import argparse
+import gzip
 import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import bulk_io
+from src import upsert
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _stream(cursor, table, columns, batch_size):
+    """按 id 顺序读取，每次 fetchmany 一批"""
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def write_inserts(f, cursor, model, batch_size):
+    """写出一张表的多行 INSERT 语句，返回行数"""
+    table = model.__tablename__
+    columns = bulk_io.data_columns(model)
+    conflict = ''
+    if any(ix.unique for ix in model.__table__.indexes):
+        conflict = f"\nON CONFLICT ({', '.join(upsert.NATURAL_KEYS[table])}) DO NOTHING"
+
+    count = 0
+    for rows in _stream(cursor, table, columns, batch_size):
+        f.write(f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n{bulk_io.sql_values(rows)}{conflict};\n")
+        count += len(rows)
+    return count
+
 
-def generate_sql():
-    db_path = 'local_ledger.db'
+def write_copy(f, cursor, model, batch_size):
+    """写出一张表的 COPY ... FROM stdin 块，返回行数"""
+    table = model.__tablename__
+    columns = bulk_io.data_columns(model)
+
+    f.write(f"COPY {table} ({', '.join(columns)}) FROM stdin;\n")
+    count = 0
+    for rows in _stream(cursor, table, columns, batch_size):
+        f.write(bulk_io.copy_rows(rows))
+        count += len(rows)
+    f.write("\\.\n")
+    return count
+
+
+def generate_sql(db_path='local_ledger.db', output_file=None, fmt='insert',
+                 batch_size=DEFAULT_BATCH_SIZE, compress=False):
+    """
+    导出 SQL 脚本
+
+    Args:
+        db_path: SQLite 数据库路径
+        output_file: 输出文件，默认 supabase_import.sql（压缩时加 .gz）
+        fmt: 'insert'（多行 INSERT）或 'copy'（PostgreSQL COPY）
+        batch_size: 每次 fetchmany / 每条 INSERT 的行数
+        compress: 是否 gzip 压缩
+
+    Returns:
+        是否成功
+    """
     if not os.path.exists(db_path):
         print(f"❌ 未找到 {db_path}")
-        return
+        return False
+
+    output_file = output_file or ('supabase_import.sql.gz' if compress else 'supabase_import.sql')
+    writer = write_copy if fmt == 'copy' else write_inserts
+    opener = gzip.open if compress else open
 
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    
-    output_file = 'supabase_import.sql'
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- MyLedger Data Migration SQL\n")
-        f.write("BEGIN;\n\n")
-
-        # 1. Snapshots
-        f.write("-- 📥 Migrating Snapshots\n")
-        cursor.execute("SELECT date, account_name, symbol, quantity, created_at FROM snapshots")
-        rows = cursor.fetchall()
-        if rows:
-            for row in rows:
-                f.write(f"INSERT INTO snapshots (date, account_name, symbol, quantity, created_at) VALUES ('{row[0]}', '{row[1]}', '{row[2]}', {row[3]}, '{row[4]}');\n")
-        
-        # 2. Transfers
-        f.write("\n-- 💸 Migrating Transfers\n")
-        cursor.execute("SELECT date, type, amount_usd, note, created_at FROM transfers")
-        rows = cursor.fetchall()
-        if rows:
-            for row in rows:
-                note = row[3].replace("'", "''") if row[3] else ""
-                f.write(f"INSERT INTO transfers (date, type, amount_usd, note, created_at) VALUES ('{row[0]}', '{row[1]}', {row[2]}, '{note}', '{row[4]}');\n")
-
-        # 3. Price History
-        f.write("\n-- 📈 Migrating Price History\n")
-        cursor.execute("SELECT date, symbol, price_usd, source, created_at FROM price_history")
-        rows = cursor.fetchall()
-        if rows:
-            for row in rows:
-                f.write(f"INSERT INTO price_history (date, symbol, price_usd, source, created_at) VALUES ('{row[0]}', '{row[1]}', {row[2]}, '{row[3]}', '{row[4]}');\n")
-
-        f.write("\nCOMMIT;")
-    
-    conn.close()
-    print(f"✅ 生成成功！请打开当前文件夹下的 {output_file}，并复制其内容。")
+    started = time.perf_counter()
+    total = 0
+    try:
+        with opener(output_file, 'wt', encoding='utf-8', newline='\n') as f:
+            f.write("-- MyLedger Data Migration SQL\n")
+            f.write(f"-- format: {fmt}, batch size: {batch_size}\n")
+            f.write("BEGIN;\n")
+
+            icons = {'snapshots': '📥', 'transfers': '💸', 'price_history': '📈'}
+            for model in bulk_io.CORE_MODELS:
+                table = model.__tablename__
+                f.write(f"\n-- {icons[table]} Migrating {table}\n")
+                count = writer(f, cursor, model, batch_size)
+                total += count
+                print(f"✓ {table}: {count:,} 行")
+
+            f.write("\nCOMMIT;\n")
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(output_file) / 1024 / 1024
+    print(f"✅ 生成成功！共 {total:,} 行，{size:.2f} MB，耗时 {elapsed:.1f} 秒 -> {output_file}")
+    if fmt == 'copy':
+        replay = f'gunzip -c {output_file} | psql "$DB_URL"' if compress else f'psql "$DB_URL" -f {output_file}'
+        print(f"   COPY 格式需要用 psql 回放: {replay}")
+    else:
+        print("   可以直接复制到 Supabase SQL Editor 执行，或用 psql 回放。")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 SQL 脚本（SQLite -> PostgreSQL）")
+    parser.add_argument('--db', default='local_ledger.db', help="SQLite 数据库路径")
+    parser.add_argument('--output', help="输出文件（默认 supabase_import.sql[.gz]）")
+    parser.add_argument('--format', choices=('insert', 'copy'), default='insert',
+                        help="insert: 多行 INSERT；copy: PostgreSQL COPY 块（psql 回放）")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="每条 INSERT / 每次读取的行数")
+    parser.add_argument('--gzip', action='store_true', help="gzip 压缩输出")
+    args = parser.parse_args()
+
+    ok = generate_sql(args.db, args.output, args.format, args.batch_size, args.gzip)
+    sys.exit(0 if ok else 1)
+
 
 if __name__ == "__main__":
-    generate_sql()
+    main()
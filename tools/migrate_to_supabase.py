@@ -1,84 +1,222 @@
 # -*- coding: utf-8 -*-
 """
 MyLedger Data Migration Tool: SQLite -> Supabase (PostgreSQL)
+
+按 id 分块流式读取本地的快照、转账、价格（内存占用与数据量无关），每块一个事务写入目标库：
+PostgreSQL 使用 COPY FROM STDIN（经临时表按自然键去重），其他数据库使用多行 INSERT ... ON CONFLICT DO NOTHING。
+每块提交后把进度写入检查点文件，中断后重新运行会从上次位置继续；重复运行不会产生重复行。
+迁移完成后重建目标库的每日估值表。
+
+用法（在项目根目录）:
+    python tools/migrate_to_supabase.py                                # 交互输入 Supabase DB_URL
+    python tools/migrate_to_supabase.py --target postgresql://...
+    python tools/migrate_to_supabase.py --target copy.db               # SQLite -> SQLite（测试 / 备份）
+    python tools/migrate_to_supabase.py --source my.db --chunk-size 2000 --restart
 """
-import sys
+import argparse
+import json
 import os
+import sys
+import time
+from urllib.parse import urlsplit
 
 # 确保能导入 src 模块
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.models import Base, Snapshot, Transfer, PriceHistory
-
-def migrate():
-    # 1. 配置本地数据库
-    local_db_path = 'local_ledger.db'
-    if not os.path.exists(local_db_path):
-        print(f"❌ 错误: 在当前目录下未找到 {local_db_path}")
-        return
-
-    local_engine = create_engine(f'sqlite:///{local_db_path}')
-    LocalSession = sessionmaker(bind=local_engine)
-    
-    # 2. 获取远程数据库地址
-    print("--- 🚀 MyLedger 数据一键搬家 ---")
-    remote_url = input("请输入您的 Supabase DB_URL (即您填在 Secrets 里的那个): ").strip()
-    
-    if not remote_url:
-        print("❌ 错误: 未提供有效的连接地址")
-        return
+from sqlalchemy import select
+from src.models import get_engine, get_session, Transfer
+from src import bulk_io
+from src import migrations
+from src import upsert
+from src import valuation
 
-    # 兼容处理
-    if remote_url.startswith("postgresql://") and "postgresql+psycopg2://" not in remote_url:
-        remote_url = remote_url.replace("postgresql://", "postgresql+psycopg2://", 1)
-    if "sslmode" not in remote_url:
-        separator = "&" if "?" in remote_url else "?"
-        remote_url += f"{separator}sslmode=require"
+DEFAULT_CHECKPOINT = 'migrate_checkpoint.json'
 
-    try:
-        remote_engine = create_engine(remote_url)
-        RemoteSession = sessionmaker(bind=remote_engine)
-        
-        # 3. 开始迁移
-        local_session = LocalSession()
-        remote_session = RemoteSession()
-
-        print("\n正在同步数据，请稍候...")
-
-        # 迁移 Snapshots
-        snapshots = local_session.query(Snapshot).all()
-        print(f"📦 正在迁移快照记录: {len(snapshots)} 条...")
-        for s in snapshots:
-            # 清除 ID 让远程数据库自动重新分配
-            new_s = Snapshot(date=s.date, account_name=s.account_name, symbol=s.symbol, quantity=s.quantity, created_at=s.created_at)
-            remote_session.add(new_s)
-        
-        # 迁移 Transfers
-        transfers = local_session.query(Transfer).all()
-        print(f"💸 正在迁移转账记录: {len(transfers)} 条...")
-        for t in transfers:
-            new_t = Transfer(date=t.date, type=t.type, amount_usd=t.amount_usd, note=t.note, created_at=t.created_at)
-            remote_session.add(new_t)
-
-        # 迁移 PriceHistory
-        prices = local_session.query(PriceHistory).all()
-        print(f"📈 正在迁移价格历史: {len(prices)} 条...")
-        for p in prices:
-            new_p = PriceHistory(date=p.date, symbol=p.symbol, price_usd=p.price_usd, source=p.source, created_at=p.created_at)
-            remote_session.add(new_p)
-
-        # 提交到云端
+
+def _redact(url):
+    """去掉连接地址中的密码（写入检查点和输出）"""
+    if '://' not in url:
+        return url
+    parts = urlsplit(url)
+    if parts.password:
+        return url.replace(f":{parts.password}@", ":***@", 1)
+    return url
+
+
+# ============ 检查点 ============
+
+def load_checkpoint(path, source, target):
+    """读取检查点；源 / 目标与本次不一致时从头开始"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('source') != source or checkpoint.get('target') != _redact(target):
+        print(f"⚠️  检查点 {path} 属于另一次迁移，忽略")
+        return {}
+    return checkpoint.get('tables', {})
+
+
+def save_checkpoint(path, source, target, tables):
+    """原子写入检查点（先写临时文件再替换）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'target': _redact(target), 'tables': tables}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ============ 迁移 ============
+
+def _existing_transfer_keys(session):
+    """目标库已有转账的去重键（transfers 没有唯一索引，无法用 ON CONFLICT）"""
+    table = Transfer.__table__
+    return {tuple(row) for row in session.execute(select(*(table.c[k] for k in upsert.TRANSFER_KEY)))}
+
+
+def migrate_table(local_conn, remote_session, model, progress, chunk_size, use_copy, save):
+    """
+    分块迁移一张表
+
+    Args:
+        local_conn: 源库连接
+        remote_session: 目标库会话
+        model: 模型类
+        progress: 该表的检查点 {'last_id', 'read', 'inserted'}（原地更新）
+        chunk_size: 每块的行数
+        use_copy: 是否使用 COPY（仅 PostgreSQL）
+        save: 每块提交后调用的检查点保存函数
+
+    Returns:
+        (本次读取行数, 本次新增行数, 耗时秒)
+    """
+    table = model.__tablename__
+    columns = bulk_io.data_columns(model)
+    key = upsert.NATURAL_KEYS[table]
+    key_index = [columns.index(k) for k in key]
+    has_unique_key = any(ix.unique for ix in model.__table__.indexes)
+    seen = None if has_unique_key else _existing_transfer_keys(remote_session)
+
+    read = inserted = 0
+    started = time.perf_counter()
+    for chunk in bulk_io.iter_chunks(local_conn, model, chunk_size, after_id=progress['last_id']):
+        # 块内按自然键去重（保留最后一条）；无唯一索引的表再排除目标库已有的行
+        unique = {}
+        for row in chunk:
+            unique[tuple(row[1:][i] for i in key_index)] = row[1:]
+        if seen is not None:
+            unique = {k: v for k, v in unique.items() if k not in seen}
+            seen.update(unique)
+        rows = list(unique.values())
+
+        if use_copy:
+            count = bulk_io.copy_insert(remote_session, model, columns, rows, key if has_unique_key else None)
+        else:
+            count = upsert.insert_new(remote_session, model, [dict(zip(columns, r)) for r in rows], key)
         remote_session.commit()
-        print("\n✅ 恭喜！数据同步成功。")
-        print("现在刷新您的云端 Streamlit 页面，数据应该已经全都在那了。")
+
+        read += len(chunk)
+        inserted += count
+        progress.update(last_id=chunk[-1][0], read=progress['read'] + len(chunk),
+                        inserted=progress['inserted'] + count)
+        save()
+
+        elapsed = time.perf_counter() - started
+        print(f"   {table}: 已读取 {read:,} 行，新增 {inserted:,} 行  ({read / elapsed:,.0f} 行/秒)")
+    return read, inserted, time.perf_counter() - started
+
+
+def migrate(source='local_ledger.db', target=None, chunk_size=bulk_io.DEFAULT_CHUNK_SIZE,
+            checkpoint_path=DEFAULT_CHECKPOINT, restart=False):
+    """
+    流式迁移快照、转账、价格到目标库
+
+    Args:
+        source: 源库（SQLite 路径或数据库 URL）
+        target: 目标库（数据库 URL 或 SQLite 路径）
+        chunk_size: 每块的行数
+        checkpoint_path: 检查点文件
+        restart: 忽略已有检查点，从头开始（已迁移的行仍按自然键跳过）
+
+    Returns:
+        是否成功
+    """
+    if '://' not in source and not os.path.exists(source):
+        print(f"❌ 错误: 未找到 {source}")
+        return False
+
+    local_engine = get_engine(source)
+    remote_engine = get_engine(target)
+    use_copy = remote_engine.dialect.name == 'postgresql'
+    print(f"\n📤 源: {_redact(source)}")
+    print(f"📥 目标: {_redact(target)}（{'COPY FROM STDIN' if use_copy else '多行 INSERT'}，每块 {chunk_size:,} 行）")
+
+    migrations.upgrade(remote_engine)  # 建表 + 自然键唯一索引（ON CONFLICT 依赖）
+
+    tables = {} if restart else load_checkpoint(checkpoint_path, source, target)
+    if tables:
+        print(f"⏩ 从检查点继续: " + ', '.join(f"{t} id > {p['last_id']}" for t, p in tables.items()))
+
+    local_conn = local_engine.connect()
+    remote_session = get_session(remote_engine)
+    total_read = total_inserted = 0
+    started = time.perf_counter()
+    try:
+        icons = {'snapshots': '📦', 'transfers': '💸', 'price_history': '📈'}
+        for model in bulk_io.CORE_MODELS:
+            table = model.__tablename__
+            progress = tables.setdefault(table, {'last_id': 0, 'read': 0, 'inserted': 0})
+            print(f"\n{icons[table]} 正在迁移 {table}...")
+            read, inserted, elapsed = migrate_table(
+                local_conn, remote_session, model, progress, chunk_size, use_copy,
+                lambda: save_checkpoint(checkpoint_path, source, target, tables)
+            )
+            rate = f"{read / elapsed:,.0f} 行/秒" if read else "无新数据"
+            print(f"✓ {table}: 读取 {read:,} 行，新增 {inserted:,} 行，跳过重复 {read - inserted:,} 行（{rate}）")
+            total_read += read
+            total_inserted += inserted
+
+        if total_inserted:
+            print("\n🧮 正在重建目标库的每日估值...")
+            count = valuation.refresh_daily_valuation(remote_session)
+            remote_session.commit()
+            print(f"✓ daily_valuation: {count:,} 行")
+
+        elapsed = time.perf_counter() - started
+        print(f"\n✅ 迁移完成: 读取 {total_read:,} 行，新增 {total_inserted:,} 行，"
+              f"耗时 {elapsed:.1f} 秒（{total_read / elapsed if elapsed else 0:,.0f} 行/秒）")
+        return True
 
     except Exception as e:
+        remote_session.rollback()
         print(f"\n❌ 迁移失败: {e}")
+        print(f"   已提交的进度保存在 {checkpoint_path}，重新运行即可继续")
+        return False
     finally:
-        local_session.close()
+        local_conn.close()
         remote_session.close()
 
+
+def main():
+    parser = argparse.ArgumentParser(description="流式迁移数据到 Supabase / 其他数据库")
+    parser.add_argument('--source', default='local_ledger.db', help="源数据库（SQLite 路径或 URL）")
+    parser.add_argument('--target', help="目标数据库 URL 或 SQLite 路径（不填则交互输入）")
+    parser.add_argument('--chunk-size', type=int, default=bulk_io.DEFAULT_CHUNK_SIZE, help="每块的行数")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="检查点文件")
+    parser.add_argument('--restart', action='store_true', help="忽略检查点，从头开始")
+    args = parser.parse_args()
+
+    print("--- 🚀 MyLedger 数据一键搬家 ---")
+    target = args.target or input("请输入您的 Supabase DB_URL (即您填在 Secrets 里的那个): ").strip()
+    if not target:
+        print("❌ 错误: 未提供有效的连接地址")
+        sys.exit(1)
+
+    ok = migrate(args.source, target, chunk_size=args.chunk_size,
+                 checkpoint_path=args.checkpoint, restart=args.restart)
+    if ok:
+        print("现在刷新您的云端 Streamlit 页面，数据应该已经全都在那了。")
+    sys.exit(0 if ok else 1)
+
+
 if __name__ == "__main__":
-    migrate()
+    main()
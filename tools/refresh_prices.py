@@ -0,0 +1,59 @@
+"""
+Price Refresher
+独立进程运行后台价格刷新：按固定间隔获取当前持有、且半个间隔内没有更新过的资产的最新价格并写入数据库（批量 upsert + 重算当日估值）。
+与 Streamlit 应用内的刷新线程（PRICE_REFRESH_MINUTES）二选一即可；应用中的缓存会在 TTL 到期后读到新价格。
+
+用法（在项目根目录）:
+    python tools/refresh_prices.py                    # 每 15 分钟刷新一次，Ctrl+C 退出
+    python tools/refresh_prices.py --interval 5       # 每 5 分钟
+    python tools/refresh_prices.py --once             # 只刷新一次
+    python tools/refresh_prices.py --db DB_URL
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models import get_engine, get_session
+from src import migrations
+from src import valuation
+from src.price_refresher import PriceRefresher, DEFAULT_INTERVAL_MINUTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后台价格刷新")
+    parser.add_argument('--db', default=os.getenv('DB_URL', 'local_ledger.db'), help="数据库 URL 或 SQLite 路径")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL_MINUTES, help="刷新间隔（分钟）")
+    parser.add_argument('--once', action='store_true', help="只刷新一次后退出")
+    args = parser.parse_args()
+
+    engine = get_engine(args.db)
+    migrations.upgrade(engine)
+    session = get_session(engine)
+    try:
+        valuation.ensure_daily_valuation(session)
+    finally:
+        session.close()
+    refresher = PriceRefresher(engine, interval_minutes=args.interval)
+
+    if args.once:
+        refresher.run_once()
+        status = refresher.status()
+        print(f"{'❌' if status['last_error'] else '✅'} 获取 {status['last_symbols']} 个资产（跳过 {status['last_skipped']} 个），"
+              f"写入 {status['last_rows']} 条价格")
+        sys.exit(1 if status['last_error'] else 0)
+
+    print(f"🔄 价格刷新已启动：每 {refresher.interval / 60:.0f} 分钟一次（Ctrl+C 退出）")
+    refresher.start()
+    try:
+        while refresher.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n⏹️  正在停止...")
+        refresher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ Database Reset Tool
 """
 import sys
 sys.path.insert(0, '..')
-from src.models import get_engine, get_session, Snapshot, Transfer, PriceHistory
+from src.models import get_engine, get_session, Snapshot, Transfer, PriceHistory, DailyValuation
 
 def reset_database():
     """清空所有表的数据"""
@@ -47,6 +47,7 @@ def reset_database():
         session.query(Snapshot).delete()
         session.query(Transfer).delete()
         session.query(PriceHistory).delete()
+        session.query(DailyValuation).delete()
         
         session.commit()
         
@@ -1,55 +1,78 @@
 """
 Smart Price Update Tool
+
+用法:
+    python update_prices.py                # 拉取仍持有、且 15 分钟内没有更新过的资产的今日价格
+    python update_prices.py --max-age 60   # 价格有效期改为 60 分钟
+    python update_prices.py --all          # 拉取快照中出现过的全部资产
+    python update_prices.py --backfill     # 回填历史快照日期缺失的价格
+    python update_prices.py --backfill --benchmarks BTC SPY   # 同时回填对比基准（不要求持有）
 """
+import argparse
 import sys
 sys.path.insert(0, '..')
-from src.models import get_engine, get_session, Snapshot, PriceHistory
-from datetime import date, datetime
-from sqlalchemy import and_
+from src.models import get_engine, get_session
+from datetime import date
 from src import price_service
+from src import price_refresher
+from src import valuation
+from src import upsert
+from src import migrations
+from src.symbol_registry import SymbolRegistry
+
+def update_prices_smart(max_age_minutes=price_refresher.DEFAULT_MAX_AGE_MINUTES, include_all=False):
+    """
+    智能价格更新：按刷新计划自动拉取 + 手动补充
 
-def update_prices_smart():
-    """智能价格更新：自动拉取 + 手动补充"""
+    Args:
+        max_age_minutes: 价格有效期（分钟），之内更新过的资产跳过
+        include_all: 拉取快照中出现过的全部资产（不做过滤）
+    """
     
     print("=" * 60)
     print("💰 智能价格更新工具")
     print("=" * 60)
     
     engine = get_engine()
+    migrations.upgrade(engine)
     session = get_session(engine)
+    valuation.ensure_daily_valuation(session)
     
-    # 1. 获取快照中的所有资产
-    snapshots = session.query(Snapshot.symbol).distinct().all()
-    symbols = sorted([s[0] for s in snapshots])
-    
-    if not symbols:
+    # 1. 刷新计划：仍持有且价格已过期的资产
+    plan = price_refresher.plan_refresh(session, max_age_minutes=max_age_minutes)
+    if not plan.held and not plan.not_held:
         print("\n❌ 没有找到快照记录")
         print("   请先使用 Streamlit 录入快照数据")
         session.close()
         return
     
-    print(f"\n📋 从快照中找到 {len(symbols)} 个资产:")
+    print()
+    plan.print_summary()
+    symbols = sorted(plan.held + plan.not_held) if include_all else plan.fetch
+    if not symbols:
+        print(f"\n✅ 所有持有资产的价格都在 {max_age_minutes:g} 分钟内更新过，无需拉取")
+        session.close()
+        return
+    
+    print(f"\n📋 将拉取 {len(symbols)} 个资产:")
     for i, sym in enumerate(symbols, 1):
-        print(f"   {i}. {sym}")
+        last = plan.latest.get(sym)
+        print(f"   {i}. {sym:10s} 最新价格: {last[0] if last else '无'}")
+    if plan.fresh and not include_all:
+        print(f"   ⏭️  已是最新: {', '.join(plan.fresh)}")
+    if plan.not_held and not include_all:
+        print(f"   ⏭️  已不再持有: {', '.join(plan.not_held)}")
     
     # 2. 自动拉取价格
     print(f"\n🚀 开始自动拉取价格...")
     print("-" * 60)
     
-    service = price_service.PriceService()
-    failed_symbols = []
-    success_prices = {}
-    
-    for symbol in symbols:
-        try:
-            price = service.fetch_price(symbol)
-            if price and price > 0:
-                success_prices[symbol] = price
-            else:
-                failed_symbols.append(symbol)
-        except Exception as e:
-            print(f"❌ {symbol}: 获取失败 ({str(e)[:50]}...)")
-            failed_symbols.append(symbol)
+    # 一次 fetch_quotes：批量接口 + 并发逐个获取，并记录实际提供价格的数据源
+    service = price_service.PriceService(registry=SymbolRegistry(engine))
+    quotes = service.fetch_quotes(symbols)
+    success_prices = {sym: q[0] for sym, q in quotes.items() if q is not None and q[0] > 0}
+    sources = {sym: quotes[sym][1] for sym in success_prices}
+    failed_symbols = [sym for sym in quotes if sym not in success_prices]
     
     print("-" * 60)
     print(f"\n✅ 成功: {len(success_prices)}/{len(symbols)} 个资产")
@@ -91,36 +114,15 @@ def update_prices_smart():
         print(f"\n💾 保存 {len(success_prices)} 个价格到数据库...")
         
         price_date = date.today()
-        saved_count = 0
-        
-        for symbol, price in success_prices.items():
-            try:
-                # 检查是否已存在
-                existing = session.query(PriceHistory).filter(
-                    and_(
-                        PriceHistory.date == price_date,
-                        PriceHistory.symbol == symbol
-                    )
-                ).first()
-                
-                if existing:
-                    existing.price_usd = price
-                    existing.source = 'manual' if symbol in failed_symbols else 'auto'
-                    existing.created_at = datetime.utcnow()
-                else:
-                    new_price = PriceHistory(
-                        date=price_date,
-                        symbol=symbol,
-                        price_usd=price,
-                        source='manual' if symbol in failed_symbols else 'auto'
-                    )
-                    session.add(new_price)
-                
-                saved_count += 1
-                
-            except Exception as e:
-                print(f"  ❌ {symbol} 保存失败: {e}")
+        saved_count = upsert.upsert_price_history(session, [{
+            'date': price_date,
+            'symbol': symbol,
+            'price_usd': price,
+            'source': sources.get(symbol, 'manual')
+        } for symbol, price in success_prices.items()])
         
+        session.commit()
+        valuation.refresh_daily_valuation(session, since=price_date, symbols=success_prices.keys())
         session.commit()
         print(f"✅ 成功保存 {saved_count} 个价格！")
     
@@ -137,5 +139,31 @@ def update_prices_smart():
     print("=" * 60)
 
 
+def backfill_prices(benchmarks=()):
+    """回填历史快照日期缺失的价格（每个资产一次区间请求），benchmarks 为同时回填的对比基准"""
+    
+    print("=" * 60)
+    print("🕰️  历史价格回填工具")
+    print("=" * 60)
+    
+    result = price_service.backfill_price_history(engine=get_engine(), benchmarks=benchmarks)
+    if result['rows']:
+        print(f"✅ 已回填 {result['rows']} 条价格，估值已从 {result['since']} 起重算")
+    else:
+        print("✅ 没有需要回填的价格")
+
+
 if __name__ == '__main__':
-    update_prices_smart()
+    parser = argparse.ArgumentParser(description="价格更新")
+    parser.add_argument('--backfill', action='store_true', help="回填历史快照日期缺失的价格")
+    parser.add_argument('--benchmarks', nargs='*', default=[], metavar='SYMBOL',
+                        help="与 --backfill 一起使用：同时回填这些对比基准的历史价格")
+    parser.add_argument('--all', action='store_true', help="拉取快照中出现过的全部资产")
+    parser.add_argument('--max-age', type=float, default=price_refresher.DEFAULT_MAX_AGE_MINUTES,
+                        help="价格有效期（分钟），之内更新过的资产跳过")
+    args = parser.parse_args()
+    
+    if args.backfill:
+        backfill_prices(args.benchmarks)
+    else:
+        update_prices_smart(max_age_minutes=args.max_age, include_all=args.all)